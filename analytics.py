@@ -0,0 +1,456 @@
+"""
+Аналитика посещаемости по всему центру на снимке данных
+Отметки периодически выгружаются в колоночные массивы NumPy (ученик, кружок,
+номер дня, код статуса), справочники кодируются словарями; отчеты считаются
+векторно по файлам, открытым через mmap, без запросов к рабочей БД
+
+Снимок - каталог snapshot-<время> в ANALYTICS_DIR, текущий указан в файле CURRENT:
+  student.npy, circle.npy, day.npy, status.npy  - отметки (номера строк справочников,
+                                                  день от 1970-01-01, код STATUSES)
+  student_circle/school/grade/gender.npy        - ученики (кружок и коды справочников)
+  dims.json                                     - имена и словари значений
+  meta.json                                     - время построения, число отметок, версия данных
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import date, datetime
+from itertools import chain
+
+from sqlalchemy import text
+
+from attendance_matrix import ABSENT, PRESENT, STATUS_CODES
+from change_tracking import data_stamp
+from models import db, Attendance, Circle, Student
+
+CURRENT_FILE = 'CURRENT'
+SNAPSHOT_PREFIX = 'snapshot-'
+MARK_COLUMNS = {'student': 'int32', 'circle': 'int32', 'day': 'int32', 'status': 'int8'}
+STUDENT_COLUMNS = ('circle', 'school', 'grade', 'gender')
+EPOCH = date(1970, 1, 1)
+FETCH_ROWS = 100000
+
+# Пустое значение справочника
+UNKNOWN = 'Не указано'
+
+# Хронический пропуск: не меньше CHRONIC_MIN_MARKS отметок, из них пропусков без
+# уважительной причины не меньше CHRONIC_ABSENCE_SHARE
+CHRONIC_MIN_MARKS = 4
+CHRONIC_ABSENCE_SHARE = 0.2
+REPORT_LIMIT = 50
+
+# Отток: сколько разных учеников приходили за последние LOSS_WINDOW_DAYS дней
+# по сравнению с таким же окном перед ними
+LOSS_WINDOW_DAYS = 28
+
+
+def day_number(day):
+    return (day - EPOCH).days
+
+
+def term_start(today):
+    """Начало учебного года (1 сентября), в который попадает дата"""
+    return date(today.year if today.month >= 9 else today.year - 1, 9, 1)
+
+
+def _label(value):
+    return ' '.join(str(value).split()) if value else ''
+
+
+def _grade_label(value):
+    # '5 а' и '5А' - один класс
+    return _label(value).replace(' ', '').upper()
+
+
+def _encode(values):
+    """Словарное кодирование: (словарь значений, коды int32)"""
+    import numpy as np
+
+    dictionary = sorted(set(values))
+    position = {value: code for code, value in enumerate(dictionary)}
+    return [value or UNKNOWN for value in dictionary], np.fromiter(
+        (position[value] for value in values), dtype=np.int32, count=len(values)
+    )
+
+
+# ===== ПОСТРОЕНИЕ СНИМКА =====
+
+def build_snapshot(directory):
+    """Выгружает отметки и справочники в новый каталог снимка и делает его текущим.
+
+    Возвращает путь к снимку. Рабочая БД читается потоком по FETCH_ROWS строк.
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    stamp = data_stamp()
+    os.makedirs(directory, exist_ok=True)
+    name = SNAPSHOT_PREFIX + datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    tmp_path = os.path.join(directory, name + '.tmp')
+    os.makedirs(tmp_path)
+    try:
+        circles = db.session.query(Circle.id, Circle.name, Circle.direction).order_by(Circle.id).all()
+        circle_ids = np.array([c.id for c in circles], dtype=np.int64)
+        directions, circle_direction = _encode([_label(c.direction) for c in circles])
+
+        students = db.session.query(
+            Student.id, Student.full_name, Student.circle_id, Student.school, Student.grade, Student.gender
+        ).order_by(Student.id).all()
+        student_ids = np.array([s.id for s in students], dtype=np.int64)
+        schools, student_school = _encode([_label(s.school) for s in students])
+        grades, student_grade = _encode([_grade_label(s.grade) for s in students])
+        genders, student_gender = _encode([_label(s.gender).capitalize() for s in students])
+        student_circle = _lookup(circle_ids, np.array([s.circle_id or 0 for s in students], dtype=np.int64))
+        for column, values in (('circle', student_circle), ('school', student_school),
+                               ('grade', student_grade), ('gender', student_gender)):
+            np.save(os.path.join(tmp_path, f'student_{column}.npy'), values.astype(np.int32))
+
+        count = _export_marks(tmp_path, student_ids, circle_ids)
+
+        with open(os.path.join(tmp_path, 'dims.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'student_ids': student_ids.tolist(),
+                'student_names': [s.full_name for s in students],
+                'circle_ids': circle_ids.tolist(),
+                'circle_names': [c.name for c in circles],
+                'circle_direction': circle_direction.tolist(),
+                'directions': directions,
+                'schools': schools,
+                'grades': grades,
+                'genders': genders,
+            }, f, ensure_ascii=False)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'built_at': datetime.now().isoformat(timespec='seconds'),
+                'build_seconds': round(time.perf_counter() - started, 2),
+                'stamp': stamp,
+                'marks': count,
+                'students': len(students),
+                'circles': len(circles),
+            }, f)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    path = os.path.join(directory, name)
+    os.rename(tmp_path, path)
+    _publish(directory, name)
+    return path
+
+
+def _lookup(sorted_ids, ids):
+    """Номера строк справочника по id (-1, если id нет в справочнике)"""
+    import numpy as np
+
+    if not len(sorted_ids):
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, ids).clip(0, len(sorted_ids) - 1)
+    return np.where(sorted_ids[positions] == ids, positions, -1)
+
+
+def _export_marks(path, student_ids, circle_ids):
+    """Пишет колонки отметок в .npy через memmap; возвращает число отметок.
+
+    Отметки удаленных учеников и кружков пропускаются.
+    """
+    import numpy as np
+
+    table = Attendance.__tablename__
+    status_case = ' '.join(f"WHEN '{status}' THEN {code}" for status, code in STATUS_CODES.items())
+    connection = db.session.connection()
+    max_id = connection.execute(text(f'SELECT COALESCE(MAX(id), 0) FROM {table}')).scalar()
+    capacity = connection.execute(text(f'SELECT COUNT(*) FROM {table} WHERE id <= :max_id'),
+                                  {'max_id': max_id}).scalar()
+
+    columns = {
+        column: np.lib.format.open_memmap(os.path.join(path, f'{column}.npy'), mode='w+',
+                                          dtype=dtype, shape=(capacity,))
+        for column, dtype in MARK_COLUMNS.items()
+    }
+    # День и код статуса считает SQLite: в Python приходят только целые числа
+    result = connection.execute(text(
+        f"SELECT student_id, circle_id, CAST(julianday(date) - julianday('1970-01-01') AS INTEGER), "
+        f"CASE status {status_case} ELSE 0 END FROM {table} WHERE id <= :max_id"
+    ), {'max_id': max_id})
+    count = 0
+    while True:
+        rows = result.fetchmany(FETCH_ROWS)
+        if not rows:
+            break
+        # np.array() над строками SQLAlchemy в разы медленнее плоского итератора чисел
+        chunk = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 4).reshape(-1, 4)
+        student = _lookup(student_ids, chunk[:, 0])
+        circle = _lookup(circle_ids, chunk[:, 1])
+        keep = (student >= 0) & (circle >= 0)
+        size = min(int(keep.sum()), capacity - count)
+        for column, values in (('student', student), ('circle', circle),
+                               ('day', chunk[:, 2]), ('status', chunk[:, 3])):
+            columns[column][count:count + size] = values[keep][:size]
+        count += size
+
+    for values in columns.values():
+        values.flush()
+    if count < capacity:
+        # Отметки удалены во время выгрузки или принадлежат удаленным ученикам
+        trimmed = {column: np.array(values[:count]) for column, values in columns.items()}
+        columns.clear()
+        for column, values in trimmed.items():
+            np.save(os.path.join(path, f'{column}.npy'), values)
+    return count
+
+
+def _publish(directory, name):
+    """Делает снимок текущим и удаляет старые (предыдущий остается для открытых mmap)"""
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(name)
+    os.replace(pointer + '.tmp', pointer)
+
+    snapshots = sorted(entry for entry in os.listdir(directory)
+                       if entry.startswith(SNAPSHOT_PREFIX) and not entry.endswith('.tmp'))
+    for old in snapshots[:-2]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+
+def current_snapshot_name(directory):
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# ===== ОТЧЕТЫ =====
+
+class Snapshot:
+    """Открытый снимок: колонки отметок через mmap, справочники в памяти"""
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, 'dims.json'), encoding='utf-8') as f:
+            self.dims = json.load(f)
+        self.marks = {column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+                      for column in MARK_COLUMNS}
+        self.students = {column: np.load(os.path.join(path, f'student_{column}.npy'))
+                         for column in STUDENT_COLUMNS}
+        self.circle_direction = np.array(self.dims['circle_direction'], dtype=np.int32)
+
+    @property
+    def stamp(self):
+        return self.meta['stamp']
+
+    def report(self, first_day, last_day):
+        """Все отчеты страницы аналитики за период"""
+        import numpy as np
+
+        day = self.marks['day']
+        mask = (day >= day_number(first_day)) & (day <= day_number(last_day))
+        period = {column: np.asarray(values[mask]) for column, values in self.marks.items()}
+
+        student_count = len(self.dims['student_ids'])
+        # Итоги на ученика; разрезы по справочникам складываются из них, а не из отметок
+        total = np.bincount(period['student'], minlength=student_count)
+        present = np.bincount(period['student'][period['status'] == PRESENT], minlength=student_count)
+        absent = np.bincount(period['student'][period['status'] == ABSENT], minlength=student_count)
+        chronic = (total >= CHRONIC_MIN_MARKS) & (absent >= total * CHRONIC_ABSENCE_SHARE)
+
+        present_marks = int(present.sum())
+        return {
+            'marks': len(period['status']),
+            'present': present_marks,
+            'rate': _percent(present_marks, len(period['status'])),
+            'students': int((total > 0).sum()),
+            'chronic_count': int(chronic.sum()),
+            'chronic': self._chronic_absentees(total, absent, chronic),
+            'breakdowns': {
+                title: self._breakdown(column, total, present, chronic)
+                for column, title in (('school', 'Школа'), ('grade', 'Класс'), ('gender', 'Пол'))
+            },
+            'trends': self._direction_trends(period),
+            'losing': self._losing_circles(last_day),
+        }
+
+    def _chronic_absentees(self, total, absent, chronic):
+        import numpy as np
+
+        candidates = np.flatnonzero(chronic)
+        share = absent[candidates] / total[candidates]
+        order = candidates[np.lexsort((-absent[candidates], -share))][:REPORT_LIMIT]
+        names = self.dims['student_names']
+        return [
+            {
+                'name': names[i],
+                'circle': self._circle_name(self.students['circle'][i]),
+                'school': self.dims['schools'][self.students['school'][i]],
+                'grade': self.dims['grades'][self.students['grade'][i]],
+                'absent': int(absent[i]),
+                'total': int(total[i]),
+                'absent_percent': _percent(absent[i], total[i]),
+            }
+            for i in order.tolist()
+        ]
+
+    def _breakdown(self, column, student_total, student_present, chronic):
+        """Посещаемость по значениям справочника учеников (школа, класс, пол)"""
+        import numpy as np
+
+        labels = self.dims[{'school': 'schools', 'grade': 'grades', 'gender': 'genders'}[column]]
+        codes = self.students[column]
+        total = np.bincount(codes, weights=student_total, minlength=len(labels)).astype(np.int64)
+        present = np.bincount(codes, weights=student_present, minlength=len(labels)).astype(np.int64)
+        students = np.bincount(codes[student_total > 0], minlength=len(labels))
+        chronic_students = np.bincount(codes[chronic], minlength=len(labels))
+        rows = [
+            {
+                'label': labels[code],
+                'students': int(students[code]),
+                'marks': int(total[code]),
+                'rate': _percent(present[code], total[code]),
+                'chronic': int(chronic_students[code]),
+            }
+            for code in np.flatnonzero(total).tolist()
+        ]
+        return sorted(rows, key=lambda row: (-row['students'], row['label']))
+
+    def _direction_trends(self, period):
+        """Процент присутствия по направлениям кружков помесячно"""
+        import numpy as np
+
+        if not len(period['day']):
+            return {'months': [], 'rows': []}
+        months = period['day'].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        first_month = int(months.min())
+        month_count = int(months.max()) - first_month + 1
+        directions = self.dims['directions']
+        cells = self.circle_direction[period['circle']].astype(np.int64) * month_count + (months - first_month)
+        size = len(directions) * month_count
+        total = np.bincount(cells, minlength=size).reshape(len(directions), month_count)
+        present = np.bincount(cells[period['status'] == PRESENT], minlength=size).reshape(len(directions), month_count)
+
+        rows = []
+        for code in np.flatnonzero(total.sum(axis=1)).tolist():
+            rates = [_percent(p, t) if t else None for p, t in zip(present[code].tolist(), total[code].tolist())]
+            known = [rate for rate in rates if rate is not None]
+            rows.append({
+                'label': directions[code],
+                'rates': rates,
+                'rate': _percent(present[code].sum(), total[code].sum()),
+                'change': round(known[-1] - known[0], 1) if len(known) > 1 else None,
+            })
+        return {
+            'months': [date(1970 + m // 12, m % 12 + 1, 1) for m in range(first_month, first_month + month_count)],
+            'rows': sorted(rows, key=lambda row: row['label']),
+        }
+
+    def _losing_circles(self, last_day):
+        """Кружки, в которые за последние LOSS_WINDOW_DAYS дней пришло меньше разных учеников"""
+        import numpy as np
+
+        end = day_number(last_day)
+        day = self.marks['day']
+        circle_count = len(self.dims['circle_ids'])
+        student_count = max(len(self.dims['student_ids']), 1)
+
+        def attending(first, last):
+            mask = (day >= first) & (day <= last)
+            present = mask & (self.marks['status'] == PRESENT)
+            pairs = np.unique(self.marks['circle'][present].astype(np.int64) * student_count + self.marks['student'][present])
+            return np.bincount(pairs // student_count, minlength=circle_count)
+
+        recent = attending(end - LOSS_WINDOW_DAYS + 1, end)
+        previous = attending(end - 2 * LOSS_WINDOW_DAYS + 1, end - LOSS_WINDOW_DAYS)
+        enrolled = np.bincount(self.students['circle'][self.students['circle'] >= 0], minlength=circle_count)
+        losing = np.flatnonzero(recent < previous)
+        drop = (previous[losing] - recent[losing]) / previous[losing]
+        order = losing[np.lexsort((-(previous[losing] - recent[losing]), -drop))][:REPORT_LIMIT]
+        directions = self.dims['directions']
+        return [
+            {
+                'name': self.dims['circle_names'][i],
+                'direction': directions[self.circle_direction[i]],
+                'enrolled': int(enrolled[i]),
+                'previous': int(previous[i]),
+                'recent': int(recent[i]),
+                'drop_percent': _percent(previous[i] - recent[i], previous[i]),
+            }
+            for i in order.tolist()
+        ]
+
+    def _circle_name(self, index):
+        return self.dims['circle_names'][index] if index >= 0 else UNKNOWN
+
+
+def _percent(part, whole):
+    return round(float(part) / float(whole) * 100, 1) if whole else 0.0
+
+
+# ===== СНИМОК ПРОЦЕССА =====
+
+class AnalyticsStore:
+    """Текущий снимок процесса. Снимок старше ANALYTICS_REFRESH секунд при изменившихся
+    данных перестраивается в фоновом потоке, отчеты тем временем считаются по старому."""
+
+    def __init__(self):
+        self.app = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._building = False
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['analytics'] = self
+
+    @property
+    def directory(self):
+        return self.app.config['ANALYTICS_DIR']
+
+    def current(self):
+        """Снимок для отчетов; первый снимок строится сразу"""
+        name = current_snapshot_name(self.directory)
+        if name is None:
+            self.refresh()
+            return self._snapshot
+
+        with self._lock:
+            if self._snapshot is None or self._snapshot.name != name:
+                self._snapshot = Snapshot(os.path.join(self.directory, name))
+            snapshot = self._snapshot
+
+        age = time.time() - os.path.getmtime(os.path.join(snapshot.path, 'meta.json'))
+        if age > self.app.config['ANALYTICS_REFRESH'] and data_stamp() != snapshot.stamp:
+            self._refresh_in_background()
+        return snapshot
+
+    def refresh(self):
+        """Строит новый снимок (один поток процесса за раз) и открывает его"""
+        with self._build_lock:
+            path = build_snapshot(self.directory)
+        snapshot = Snapshot(path)
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+
+        def run():
+            with self.app.app_context():
+                try:
+                    self.refresh()
+                except Exception:
+                    self.app.logger.exception('Analytics snapshot build failed')
+                finally:
+                    self._building = False
+
+        threading.Thread(target=run, name='analytics-snapshot', daemon=True).start()
@@ -2,24 +2,52 @@
 Flask приложение для системы учета посещаемости
 Центр инновационного творчества школьников
 """
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, make_response
+from flask import Flask, Blueprint, Response, current_app, render_template, redirect, url_for, request, session, flash, jsonify, make_response, send_file, abort
+from jinja2 import FileSystemBytecodeCache
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import check_password_hash, generate_password_hash
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone, MINYEAR, MAXYEAR
+from functools import lru_cache
 from sqlalchemy import func, extract, case
-import calendar
-from io import BytesIO
-
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import os
+import shutil
+import time
+from io import BytesIO
 
-from models import db, User, Circle, Student, Attendance, Schedule
+from models import db, User, Circle, Student, Attendance, AttendanceDaily, Schedule, Job, create_missing_columns, create_missing_indexes
+from attendance_rollup import refresh_daily_rollup, rollup_keys_for, rollup_keys_for_students
+from result_cache import ResultCache
+from schedule_grid import DAYS_ORDER, build_schedule_grid, lesson_dates, month_bounds
+from attendance_grid import build_attendance_grid, build_day_rows, build_journal_grid, grid_period, schedule_weekdays
+from attendance_matrix import AttendanceMatrix
+from export_cache import ExportCache, data_version
+from jobs import JobQueue, job_status
+from sqlite_tuning import engine_options, init_sqlite, sqlite_config_from_env
+from keyset import keyset_page, decode_cursor
+from identity import load_identity
+from password_hashing import HasherBusy, PasswordHasher
+from student_search import create_search_index, search_students, unindex_students
+from change_tracking import install_change_tracking, month_key, scope_versions
+from analytics import AnalyticsStore, term_start
+
+# Допустимые статусы посещения
+ATTENDANCE_STATUSES = ('present', 'absent', 'excused')
+
+# Максимальное число ячеек в одном пакетном запросе
+BULK_ATTENDANCE_LIMIT = 1000
+
+# Размер страницы списка учеников
+STUDENTS_PER_PAGE = 50
+STUDENTS_PER_PAGE_MAX = 200
+
+# Сортировки списка учеников: выражения ключа (последнее уникально) и значения ключа строки
+STUDENT_SORTS = {
+    'name': ([Student.full_name, Student.id], lambda s: (s.full_name, s.id)),
+    'grade': ([func.coalesce(Student.grade, ''), Student.full_name, Student.id],
+              lambda s: (s.grade or '', s.full_name, s.id)),
+    'circle': ([func.coalesce(Circle.name, ''), Student.full_name, Student.id],
+               lambda s: (s.circle_name or '', s.full_name, s.id)),
+}
 
 # Русские названия месяцев
 MONTH_NAMES_RU = {
@@ -28,77 +56,357 @@ MONTH_NAMES_RU = {
     9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
 }
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'cit-attendance-secret-key-2024'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///attendance.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Обработчики фоновых задач по виду; очередь создается для каждого приложения в create_app
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Регистрирует обработчик задачи: handler(params, out, progress) -> имя файла"""
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+# Все страницы приложения; регистрируются в create_app
+bp = Blueprint('main', __name__)
+
+
+def create_app(config=None):
+    """Создает и настраивает приложение.
+    
+    config - объект/имя модуля настроек или словарь; применяется поверх значений
+    по умолчанию и модуля из переменной окружения APP_CONFIG.
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'cit-attendance-secret-key-2024'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URI', 'sqlite:///attendance.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(int(os.environ.get('DB_POOL_SIZE', 10)))
+    app.config.update(sqlite_config_from_env())  # PRAGMA соединений SQLite
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))  # секунд
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 30))  # секунд
+    app.config['EXPORT_CACHE_DIR'] = os.environ.get('EXPORT_CACHE_DIR', os.path.join(app.instance_path, 'export_cache'))
+    app.config['EXPORT_CACHE_MAX_BYTES'] = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+    # Процессов для PDF на один процесс сервера (у каждого процесса gunicorn свой пул)
+    app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', min(2, os.cpu_count() or 1)))
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))  # потоков фоновых задач
+    app.config['JOB_RESULTS_DIR'] = os.environ.get('JOB_RESULTS_DIR', os.path.join(app.instance_path, 'job_results'))
+    app.config['JOB_RESULT_TTL'] = int(os.environ.get('JOB_RESULT_TTL', 24 * 3600))  # секунд
+    app.config['JOB_STALE_AFTER'] = int(os.environ.get('JOB_STALE_AFTER', 3600))  # секунд, для задач без владельца
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')  # например pbkdf2:sha256:600000
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 1) // 2)))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 64))  # ожидающих проверок
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # секунд
+    app.config['JINJA_CACHE_DIR'] = os.environ.get('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    app.config['ANALYTICS_DIR'] = os.environ.get('ANALYTICS_DIR', os.path.join(app.instance_path, 'analytics'))
+    app.config['ANALYTICS_REFRESH'] = int(os.environ.get('ANALYTICS_REFRESH', 15 * 60))  # секунд
+    
+    # Модуль настроек окружения (например, config_production) перекрывает значения выше
+    if os.environ.get('APP_CONFIG'):
+        app.config.from_object(os.environ['APP_CONFIG'])
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    
+    db.init_app(app)
+    with app.app_context():
+        init_sqlite(app, db.engine)
+    
+    # Состояние процесса хранится в app.extensions: у каждого приложения свое
+    login_manager = LoginManager()
+    login_manager.login_view = 'main.login'
+    login_manager.user_loader(load_user)
+    login_manager.init_app(app)
+    # Кэш данных админ дашборда (сбрасывается при изменении посещений, кружков, учеников)
+    app.extensions['dashboard_cache'] = ResultCache()
+    # Кэш данных вошедших пользователей (сбрасывается при смене пароля, удалении, изменении кружков)
+    app.extensions['identity_cache'] = ResultCache()
+    # Фоновые задачи для тяжелых экспортов
+    JobQueue(JOB_HANDLERS).init_app(app)
+    # Хэширование и проверка паролей в ограниченном пуле
+    PasswordHasher().init_app(app)
+    # Снимок отметок для аналитики по центру
+    AnalyticsStore().init_app(app)
+    
+    # Дисковый кэш PDF экспортов (ключ включает версию данных, поэтому явный сброс не нужен)
+    app.extensions['export_cache'] = ExportCache(
+        app.config['EXPORT_CACHE_DIR'], app.config['EXPORT_CACHE_MAX_BYTES']
+    )
+    
+    # Скомпилированные шаблоны на диске: новые воркеры не компилируют журналы заново.
+    # Окружение Jinja создается при первом обращении, поэтому настройка до регистрации страниц
+    if app.config['JINJA_CACHE_DIR']:
+        os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+        app.jinja_options = {
+            **app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR'])
+        }
+    
+    app.register_blueprint(bp)
+    return app
+
+
+def get_export_cache():
+    return current_app.extensions['export_cache']
+
+
+def get_dashboard_cache():
+    return current_app.extensions['dashboard_cache']
 
-db.init_app(app)
 
-# Flask-Login настройка
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+def get_job_queue():
+    return current_app.extensions['job_queue']
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def get_analytics_store():
+    return current_app.extensions['analytics']
 
 
-@login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return get_identity(int(user_id))
+
+
+def get_identity(user_id):
+    """Identity пользователя из кэша процесса. В других процессах изменения
+    видны не позже чем через USER_CACHE_TTL секунд."""
+    return get_identity_cache().get_or_compute(
+        user_id, lambda: load_identity(user_id), current_app.config['USER_CACHE_TTL']
+    )
+
+
+# ===== УСЛОВНЫЕ ЗАПРОСЫ (ETag / Last-Modified) =====
+
+@lru_cache(maxsize=None)
+def render_version(root_path):
+    """Отпечаток кода страниц: после обновления шаблонов или app.py ETag меняются"""
+    paths = [os.path.join(root_path, 'app.py')]
+    for directory, _, files in os.walk(os.path.join(root_path, 'templates')):
+        paths.extend(os.path.join(directory, name) for name in files)
+    mtimes = sorted((path, os.path.getmtime(path)) for path in paths)
+    return data_version(mtimes), max(mtime for _, mtime in mtimes)
+
+
+def page_validators(scopes, *extra):
+    """ETag и Last-Modified страницы по версиям областей данных (change_tracking).
+    
+    В ETag входят также адрес с параметрами, пользователь, текущая дата и версия
+    кода. Возвращает None, если страницу нельзя кэшировать (есть flash сообщения).
+    """
+    if session.get('_flashes'):
+        return None
+    versions, changed_at = scope_versions(scopes)
+    code_version, code_mtime = render_version(current_app.root_path)
+    etag = data_version(
+        request.endpoint, request.view_args, sorted(request.args.items(multi=True)),
+        current_user.get_id(), date.today(), code_version, versions, *extra
+    )
+    # Last-Modified не раньше начала дня и обновления кода (на случай If-Modified-Since без ETag)
+    last_modified = max(
+        changed_at or datetime.min.replace(tzinfo=timezone.utc),
+        datetime.combine(date.today(), datetime.min.time()).astimezone(timezone.utc),
+        datetime.fromtimestamp(int(code_mtime), timezone.utc),
+    )
+    return etag, last_modified
+
+
+def not_modified(validators):
+    """Ответ 304, если у клиента актуальная версия; иначе None"""
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    else:
+        fresh = request.if_modified_since is not None and last_modified <= request.if_modified_since
+    if not fresh:
+        return None
+    return with_validators(Response(status=304), validators)
+
+
+def with_validators(response, validators):
+    """Добавляет ETag/Last-Modified; браузер перепроверяет страницу при каждом открытии"""
+    if validators is None:
+        return response
+    etag, last_modified = validators
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = False
+    response.cache_control.max_age = None
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
 # ===== АУТЕНТИФИКАЦИЯ =====
 
-@app.route('/')
+def requested_month():
+    """(год, месяц) из параметров year/month, по умолчанию текущий месяц.
+    None, если месяц вне 1-12 или год вне диапазона дат."""
+    today = date.today()
+    year = request.args.get('year', type=int, default=today.year)
+    month = request.args.get('month', type=int, default=today.month)
+    if not (1 <= month <= 12 and MINYEAR <= year < MAXYEAR):
+        return None
+    return year, month
+
+
+@bp.route('/')
 def index():
     """Главная страница - О нашем центре"""
     if current_user.is_authenticated:
         if current_user.is_admin():
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('main.admin_dashboard'))
         else:
-            return redirect(url_for('teacher_dashboard'))
+            return redirect(url_for('main.teacher_dashboard'))
     return render_template('index.html')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Страница входа"""
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if request.method == 'POST':
+        started = time.perf_counter()
         username = request.form.get('username')
-        password = request.form.get('password')
+        password = request.form.get('password') or ''
         
         user = User.query.filter_by(username=username).first()
+        hasher = get_password_hasher()
+        
+        try:
+            valid = user is not None and hasher.verify(user.password, password)
+            if valid and hasher.needs_rehash(user.password):
+                # Метод или стоимость хэша изменились в настройках - обновляем хэш
+                user.password = hasher.hash(password)
+                db.session.commit()
+        except HasherBusy:
+            hasher.observe_login(time.perf_counter() - started, 'busy')
+            flash('Сервер занят, попробуйте войти через несколько секунд', 'error')
+            return render_template('login.html'), 503
         
-        if user and check_password_hash(user.password, password):
-            login_user(user)
+        hasher.observe_login(time.perf_counter() - started, 'ok' if valid else 'failed')
+        if valid:
+            login_user(get_identity(user.id))
             next_page = request.args.get('next')
-            return redirect(next_page or url_for('index'))
+            return redirect(next_page or url_for('main.index'))
         else:
             flash('Неверный логин или пароль', 'error')
     
     return render_template('login.html')
 
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     """Выход"""
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 
 # ===== АДМИН ПАНЕЛЬ =====
 
-@app.route('/admin/dashboard')
+@bp.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
     """Админ дашборд с статистикой (оптимизированный)"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
+    
+    # Данные кэшируются; пересчет выполняет только один поток
+    dashboard_data = get_dashboard_cache().get_or_compute(
+        ('admin_dashboard', date.today()),
+        build_admin_dashboard_data,
+        current_app.config['DASHBOARD_CACHE_TTL']
+    )
+    return render_template('admin/dashboard.html', **dashboard_data)
+
+
+@bp.route('/admin/dashboard/cache-stats')
+@login_required
+def admin_dashboard_cache_stats():
+    """Счетчики кэша дашборда"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return jsonify(get_dashboard_cache().stats())
+
+
+@bp.route('/admin/login-stats')
+@login_required
+def admin_login_stats():
+    """Распределение задержек входа и очередь проверки паролей (JSON)"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Access denied'}), 403
+    return jsonify(get_password_hasher().stats())
+
+
+@bp.route('/admin/analytics')
+@login_required
+def admin_analytics():
+    """Аналитика посещаемости по всему центру (по снимку отметок)"""
+    if not current_user.is_admin():
+        flash('Доступ запрещен', 'error')
+        return redirect(url_for('main.index'))
     
+    today = date.today()
+    try:
+        first_day = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+    except ValueError:
+        first_day = term_start(today)
+    try:
+        last_day = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        last_day = today
+    
+    snapshot = get_analytics_store().current()
+    
+    # Отчет меняется только вместе со снимком
+    validators = page_validators([], snapshot.name)
+    cached = not_modified(validators)
+    if cached:
+        return cached
+    
+    started = time.perf_counter()
+    report = snapshot.report(first_day, last_day)
+    report_ms = (time.perf_counter() - started) * 1000
+    
+    html = render_template('admin/analytics.html',
+                           report=report,
+                           snapshot=snapshot.meta,
+                           report_ms=report_ms,
+                           first_day=first_day,
+                           last_day=last_day,
+                           month_names_ru=MONTH_NAMES_RU)
+    return with_validators(make_response(html), validators)
+
+
+@bp.route('/admin/analytics/refresh', methods=['POST'])
+@login_required
+def admin_analytics_refresh():
+    """Построить снимок аналитики заново"""
+    if not current_user.is_admin():
+        flash('Доступ запрещен', 'error')
+        return redirect(url_for('main.index'))
+    
+    snapshot = get_analytics_store().refresh()
+    flash(f'Снимок обновлен: {snapshot.meta["marks"]} отметок за {snapshot.meta["build_seconds"]} с', 'success')
+    return redirect(url_for('main.admin_analytics', **request.args))
+
+
+def build_admin_dashboard_data():
+    """Вычисляет все показатели админ дашборда"""
     # Общая статистика (оптимизированные запросы)
     total_students = db.session.query(func.count(Student.id)).scalar()
     total_circles = db.session.query(func.count(Circle.id)).scalar()
@@ -108,18 +416,17 @@ def admin_dashboard():
     today = date.today()
     first_day = today.replace(day=1)
     
-    # Оптимизированный запрос со счетчиками
+    # Счетчики за месяц из сводной таблицы (строка на кружок × день)
     month_stats = db.session.query(
-        func.count(Attendance.id).label('total'),
-        func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present'),
-        func.sum(case((Attendance.status == 'absent', 1), else_=0)).label('absent'),
-        func.sum(case((Attendance.status == 'excused', 1), else_=0)).label('excused')
-    ).filter(Attendance.date >= first_day).first()
+        func.sum(AttendanceDaily.present).label('present'),
+        func.sum(AttendanceDaily.absent).label('absent'),
+        func.sum(AttendanceDaily.excused).label('excused')
+    ).filter(AttendanceDaily.date >= first_day).first()
     
-    total_marks = month_stats.total or 0
     present_count = int(month_stats.present or 0)
     absent_count = int(month_stats.absent or 0)
     excused_count = int(month_stats.excused or 0)
+    total_marks = present_count + absent_count + excused_count
     
     attendance_rate = round((present_count / total_marks * 100) if total_marks > 0 else 0, 1)
     
@@ -128,27 +435,29 @@ def admin_dashboard():
     date_from = today - timedelta(days=days_back)
     
     daily_stats = db.session.query(
-        Attendance.date,
-        func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present'),
-        func.sum(case((Attendance.status == 'absent', 1), else_=0)).label('absent')
+        AttendanceDaily.date,
+        func.sum(AttendanceDaily.present).label('present'),
+        func.sum(AttendanceDaily.absent).label('absent')
     ).filter(
-        Attendance.date >= date_from
-    ).group_by(Attendance.date).order_by(Attendance.date).all()
+        AttendanceDaily.date >= date_from
+    ).group_by(AttendanceDaily.date).order_by(AttendanceDaily.date).all()
     
     chart_labels = [stat.date.strftime('%d.%m') for stat in daily_stats]
     chart_present = [int(stat.present) for stat in daily_stats]
     chart_absent = [int(stat.absent) for stat in daily_stats]
     
     # ТОП-5 кружков по посещаемости
+    circle_total = func.sum(AttendanceDaily.present + AttendanceDaily.absent + AttendanceDaily.excused)
+    circle_present = func.sum(AttendanceDaily.present)
     top_circles = db.session.query(
         Circle.name,
-        func.count(Attendance.id).label('total'),
-        func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present')
-    ).join(Attendance, Attendance.circle_id == Circle.id)\
-     .filter(Attendance.date >= first_day)\
+        circle_total.label('total'),
+        circle_present.label('present')
+    ).join(AttendanceDaily, AttendanceDaily.circle_id == Circle.id)\
+     .filter(AttendanceDaily.date >= first_day)\
      .group_by(Circle.id, Circle.name)\
-     .having(func.count(Attendance.id) > 10)\
-     .order_by((func.cast(func.sum(case((Attendance.status == 'present', 1), else_=0)), db.Float) / func.count(Attendance.id)).desc())\
+     .having(circle_total > 10)\
+     .order_by((func.cast(circle_present, db.Float) / circle_total).desc())\
      .limit(5).all()
     
     top_circle_names = [c.name[:30] for c in top_circles]
@@ -167,37 +476,36 @@ def admin_dashboard():
     direction_labels = [d.direction[:20] if d.direction else 'Другое' for d in direction_stats]
     direction_values = [d.students for d in direction_stats]
     
-    return render_template('admin/dashboard.html',
-                         total_students=total_students,
-                         total_circles=total_circles,
-                         total_teachers=total_teachers,
-                         attendance_rate=attendance_rate,
-                         present_count=present_count,
-                         absent_count=absent_count,
-                         excused_count=excused_count,
-                         total_marks=total_marks,
-                         chart_labels=chart_labels,
-                         chart_present=chart_present,
-                         chart_absent=chart_absent,
-                         top_circle_names=top_circle_names,
-                         top_circle_rates=top_circle_rates,
-                         direction_labels=direction_labels,
-                         direction_values=direction_values)
-
-
-@app.route('/admin/teachers')
+    return dict(total_students=total_students,
+                total_circles=total_circles,
+                total_teachers=total_teachers,
+                attendance_rate=attendance_rate,
+                present_count=present_count,
+                absent_count=absent_count,
+                excused_count=excused_count,
+                total_marks=total_marks,
+                chart_labels=chart_labels,
+                chart_present=chart_present,
+                chart_absent=chart_absent,
+                top_circle_names=top_circle_names,
+                top_circle_rates=top_circle_rates,
+                direction_labels=direction_labels,
+                direction_values=direction_values)
+
+
+@bp.route('/admin/teachers')
 @login_required
 def admin_teachers():
     """Управление преподавателями"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     teachers = User.query.filter_by(role='teacher').all()
     return render_template('admin/teachers.html', teachers=teachers)
 
 
-@app.route('/admin/teachers/add', methods=['POST'])
+@bp.route('/admin/teachers/add', methods=['POST'])
 @login_required
 def admin_add_teacher():
     """Добавить преподавателя"""
@@ -210,11 +518,17 @@ def admin_add_teacher():
     
     if User.query.filter_by(username=username).first():
         flash('Пользователь с таким логином уже существует', 'error')
-        return redirect(url_for('admin_teachers'))
+        return redirect(url_for('main.admin_teachers'))
+    
+    try:
+        password_hash = get_password_hasher().hash(password)
+    except HasherBusy:
+        flash('Сервер занят, попробуйте через несколько секунд', 'error')
+        return redirect(url_for('main.admin_teachers'))
     
     teacher = User(
         username=username,
-        password=generate_password_hash(password),
+        password=password_hash,
         plain_password=password,
         full_name=full_name,
         role='teacher'
@@ -222,12 +536,56 @@ def admin_add_teacher():
     
     db.session.add(teacher)
     db.session.commit()
+    get_dashboard_cache().invalidate()
     
     flash(f'Преподаватель {username} успешно добавлен', 'success')
-    return redirect(url_for('admin_teachers'))
+    return redirect(url_for('main.admin_teachers'))
+
+
+@bp.route('/admin/teachers/provision', methods=['POST'])
+@login_required
+def admin_provision_teachers():
+    """Массовое создание преподавателей / сброс паролей из CSV или Excel"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Access denied'}), 403
+    
+    roster = request.files.get('roster')
+    if not roster or not roster.filename:
+        flash('Файл не выбран', 'error')
+        return redirect(url_for('main.admin_teachers'))
+    
+    # openpyxl загружается только здесь
+    from teacher_provisioning import (
+        ProvisioningError, read_roster, provision_teachers, write_credentials_csv, write_credentials_xlsx
+    )
+    try:
+        credentials = provision_teachers(
+            read_roster(roster.stream, roster.filename),
+            reset_existing=request.form.get('reset_existing') == '1'
+        )
+    except ProvisioningError as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+        return redirect(url_for('main.admin_teachers'))
+    
+    get_dashboard_cache().invalidate()
+    get_identity_cache().invalidate()
+    
+    # Лист с учетными данными сразу отдается на скачивание
+    out = BytesIO()
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if request.form.get('format') == 'csv':
+        write_credentials_csv(credentials, out)
+        mimetype, download_name = 'text/csv', f'teachers_credentials_{stamp}.csv'
+    else:
+        write_credentials_xlsx(credentials, out)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        download_name = f'teachers_credentials_{stamp}.xlsx'
+    out.seek(0)
+    return send_file(out, mimetype=mimetype, as_attachment=True, download_name=download_name, max_age=0)
 
 
-@app.route('/admin/teachers/<int:teacher_id>/delete', methods=['POST'])
+@bp.route('/admin/teachers/<int:teacher_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_teacher(teacher_id):
     """Удалить преподавателя"""
@@ -238,19 +596,21 @@ def admin_delete_teacher(teacher_id):
     
     if teacher.role != 'teacher':
         flash('Нельзя удалить этого пользователя', 'error')
-        return redirect(url_for('admin_teachers'))
+        return redirect(url_for('main.admin_teachers'))
     
     # Обнуляем teacher_id у всех кружков
     Circle.query.filter_by(teacher_id=teacher_id).update({'teacher_id': None})
     
     db.session.delete(teacher)
     db.session.commit()
+    get_dashboard_cache().invalidate()
+    get_identity_cache().discard(teacher_id)
     
     flash('Преподаватель удален', 'success')
-    return redirect(url_for('admin_teachers'))
+    return redirect(url_for('main.admin_teachers'))
 
 
-@app.route('/admin/teachers/<int:teacher_id>/reset-password', methods=['POST'])
+@bp.route('/admin/teachers/<int:teacher_id>/reset-password', methods=['POST'])
 @login_required
 def admin_reset_password(teacher_id):
     """Сбросить пароль преподавателя"""
@@ -260,28 +620,33 @@ def admin_reset_password(teacher_id):
     teacher = User.query.get_or_404(teacher_id)
     new_password = request.form.get('new_password')
     
-    teacher.password = generate_password_hash(new_password)
+    try:
+        teacher.password = get_password_hasher().hash(new_password)
+    except HasherBusy:
+        flash('Сервер занят, попробуйте через несколько секунд', 'error')
+        return redirect(url_for('main.admin_teachers'))
     teacher.plain_password = new_password
     db.session.commit()
+    get_identity_cache().discard(teacher.id)
     
     flash(f'Пароль для {teacher.username} изменен', 'success')
-    return redirect(url_for('admin_teachers'))
+    return redirect(url_for('main.admin_teachers'))
 
 
-@app.route('/admin/circles')
+@bp.route('/admin/circles')
 @login_required
 def admin_circles():
     """Управление кружками"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     circles = Circle.query.all()
     teachers = User.query.filter_by(role='teacher').all()
     return render_template('admin/circles.html', circles=circles, teachers=teachers)
 
 
-@app.route('/admin/circles/add', methods=['POST'])
+@bp.route('/admin/circles/add', methods=['POST'])
 @login_required
 def admin_add_circle():
     """Добавить кружок"""
@@ -300,12 +665,14 @@ def admin_add_circle():
     
     db.session.add(circle)
     db.session.commit()
+    get_dashboard_cache().invalidate()
+    get_identity_cache().discard(circle.teacher_id)
     
     flash(f'Кружок "{name}" успешно добавлен', 'success')
-    return redirect(url_for('admin_circles'))
+    return redirect(url_for('main.admin_circles'))
 
 
-@app.route('/admin/circles/<int:circle_id>/edit', methods=['POST'])
+@bp.route('/admin/circles/<int:circle_id>/edit', methods=['POST'])
 @login_required
 def admin_edit_circle(circle_id):
     """Редактировать кружок"""
@@ -317,15 +684,20 @@ def admin_edit_circle(circle_id):
     circle.name = request.form.get('name')
     circle.direction = request.form.get('direction')
     teacher_id = request.form.get('teacher_id')
+    old_teacher_id = circle.teacher_id
     circle.teacher_id = int(teacher_id) if teacher_id else None
     
     db.session.commit()
+    get_dashboard_cache().invalidate()
+    # Кружки прежнего и нового преподавателя изменились
+    get_identity_cache().discard(old_teacher_id)
+    get_identity_cache().discard(circle.teacher_id)
     
     flash(f'Кружок "{circle.name}" обновлен', 'success')
-    return redirect(url_for('admin_circles'))
+    return redirect(url_for('main.admin_circles'))
 
 
-@app.route('/admin/circles/<int:circle_id>/delete', methods=['POST'])
+@bp.route('/admin/circles/<int:circle_id>/delete', methods=['POST'])
 @login_required
 def admin_delete_circle(circle_id):
     """Удалить кружок"""
@@ -334,624 +706,431 @@ def admin_delete_circle(circle_id):
     
     circle = Circle.query.get_or_404(circle_id)
     
-    # Удаляем всех студентов кружка
+    # Удаляем всех студентов кружка вместе с их отметками и сводкой
+    student_ids = [row.id for row in db.session.query(Student.id).filter_by(circle_id=circle_id)]
+    rollup_keys = rollup_keys_for_students(student_ids)
+    Attendance.query.filter(
+        (Attendance.circle_id == circle_id) | Attendance.student_id.in_(student_ids)
+    ).delete(synchronize_session=False)
     Student.query.filter_by(circle_id=circle_id).delete()
+    unindex_students(student_ids)
+    AttendanceDaily.query.filter_by(circle_id=circle_id).delete()
+    refresh_daily_rollup(key for key in rollup_keys if key[0] != circle_id)
     
+    teacher_id = circle.teacher_id
     db.session.delete(circle)
     db.session.commit()
+    get_dashboard_cache().invalidate()
+    get_identity_cache().discard(teacher_id)
     
     flash('Кружок удален', 'success')
-    return redirect(url_for('admin_circles'))
+    return redirect(url_for('main.admin_circles'))
+
+
+def student_list_query(circle_id=None, group=None):
+    """Запрос строк списка учеников админки и запрос их числа (фильтр по кружку и группе).
+    
+    Только колонки таблицы; название кружка - в том же запросе.
+    """
+    query = db.session.query(
+        Student.id, Student.full_name, Student.iin, Student.gender, Student.grade,
+        Student.school, Student.applicant_phone, Student.group_number,
+        Circle.name.label('circle_name')
+    ).outerjoin(Circle, Student.circle_id == Circle.id)
+    count_query = db.session.query(func.count(Student.id))
+    if circle_id:
+        query = query.filter(Student.circle_id == circle_id)
+        count_query = count_query.filter(Student.circle_id == circle_id)
+        if group:
+            query = query.filter(Student.group_number == group)
+            count_query = count_query.filter(Student.group_number == group)
+    return query, count_query
 
 
-@app.route('/admin/students')
+@bp.route('/admin/students')
 @login_required
 def admin_students():
-    """Список всех студентов"""
+    """Список всех студентов (постранично, с сортировкой и фильтрами)"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     circle_id = request.args.get('circle_id', type=int)
+    group = request.args.get('group') or None
+    sort = request.args.get('sort') if request.args.get('sort') in STUDENT_SORTS else 'name'
+    descending = request.args.get('dir') == 'desc'
+    per_page = min(max(request.args.get('per_page', type=int, default=STUDENTS_PER_PAGE), 1), STUDENTS_PER_PAGE_MAX)
     
+    query, count_query = student_list_query(circle_id, group)
+    
+    circle = None
+    groups = []
     if circle_id:
-        students = Student.query.filter_by(circle_id=circle_id).all()
-        circle = Circle.query.get(circle_id)
-    else:
-        students = Student.query.all()
-        circle = None
+        circle = db.session.query(Circle.id, Circle.name).filter(Circle.id == circle_id).first()
+        groups = [g for (g,) in db.session.query(Student.group_number).filter(
+            Student.circle_id == circle_id, Student.group_number.isnot(None)
+        ).distinct().order_by(Student.group_number)]
+    
+    sort_columns, sort_key = STUDENT_SORTS[sort]
+    students, next_cursor, prev_cursor = keyset_page(
+        query, sort_columns, sort_key, per_page,
+        after=decode_cursor(request.args.get('after'), len(sort_columns)),
+        before=decode_cursor(request.args.get('before'), len(sort_columns)),
+        descending=descending
+    )
     
-    circles = Circle.query.all()
+    # Параметры списка для ссылок сортировки и страниц
+    list_args = {'circle_id': circle_id, 'group': group, 'sort': sort,
+                 'dir': 'desc' if descending else None,
+                 'per_page': per_page if per_page != STUDENTS_PER_PAGE else None}
+    list_args = {k: v for k, v in list_args.items() if v}
+    
+    circles = db.session.query(Circle.id, Circle.name).order_by(Circle.name).all()
     
-    return render_template('admin/students.html', students=students, circles=circles, selected_circle=circle)
+    return render_template('admin/students.html',
+                         students=students,
+                         total_students=count_query.scalar(),
+                         circles=circles,
+                         selected_circle=circle,
+                         groups=groups,
+                         selected_group=group,
+                         sort=sort,
+                         descending=descending,
+                         list_args=list_args,
+                         next_url=url_for('main.admin_students', after=next_cursor, **list_args) if next_cursor else None,
+                         prev_url=url_for('main.admin_students', before=prev_cursor, **list_args) if prev_cursor else None,
+                         first_url=url_for('main.admin_students', **list_args) if prev_cursor else None)
 
 
-@app.route('/admin/schedule')
+@bp.route('/admin/students/search')
+@login_required
+def admin_students_search():
+    """Быстрый поиск учеников для подсказок (JSON)"""
+    if not current_user.is_admin():
+        return jsonify({'error': 'Access denied'}), 403
+    
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', type=int, default=10), 1), 50)
+    
+    return jsonify([{
+        'id': row.id,
+        'full_name': row.full_name,
+        'iin': row.iin,
+        'school': row.school,
+        'circle_name': row.circle_name,
+        'group_number': row.group_number,
+        'url': url_for('main.teacher_edit_student', student_id=row.id) if row.circle_id else None,
+    } for row in search_students(query, limit)])
+
+
+@bp.route('/admin/schedule')
 @login_required
 def admin_schedule():
     """Расписание всех кружков - отдельная таблица для каждого кружка"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
-    # Дни недели на казахском
-    days_order = ['Дүйсенбі', 'Сейсенбі', 'Сәрсенбі', 'Бейсенбі', 'Жұма', 'Сенбі']
-    
-    # Получаем все кружки с расписанием
-    circles = Circle.query.order_by(Circle.name).all()
-    
-    # Функция парсинга времени
-    def parse_time(time_str):
-        """Парсит время из строки типа '9:00-10:20' или '8:30 -10:00'"""
-        if not time_str:
-            return (0, 0)
-        time_part = time_str.split('-')[0].strip()
-        try:
-            parts = time_part.replace(' ', '').split(':')
-            if len(parts) == 2:
-                return (int(parts[0]), int(parts[1]))
-        except:
-            pass
-        return (0, 0)
-    
-    # Группируем расписание по кружкам
-    circles_schedules = []
-    
-    for circle in circles:
-        schedules = Schedule.query.filter_by(circle_id=circle.id).all()
-        
-        if not schedules:
-            continue
-        
-        # Группируем по дням и времени
-        schedule_dict = {}
-        for schedule in schedules:
-            day = schedule.day_of_week
-            if not day:
-                continue
-                
-            if day not in schedule_dict:
-                schedule_dict[day] = {}
-            
-            time_slot = schedule.time_slot or ''
-            if time_slot not in schedule_dict[day]:
-                schedule_dict[day][time_slot] = []
-            
-            schedule_dict[day][time_slot].append({
-                'group': schedule.group_number or '',
-                'room': schedule.room or '',
-                'floor': schedule.floor or '',
-                'time': time_slot,
-            })
-        
-        # Получаем все временные слоты для этого кружка
-        all_times = set()
-        for day_schedules in schedule_dict.values():
-            all_times.update(day_schedules.keys())
-        
-        sorted_times = sorted(all_times, key=parse_time)
-        
-        circles_schedules.append({
-            'circle': circle,
-            'schedule_dict': schedule_dict,
-            'sorted_times': sorted_times,
-            'teacher': circle.teacher.full_name if circle.teacher else 'Не назначен'
-        })
+    circles_schedules = build_schedule_grid()
     
     return render_template('admin/schedule.html',
                          circles_schedules=circles_schedules,
-                         days_order=days_order)
+                         days_order=DAYS_ORDER)
 
 
-@app.route('/admin/schedule/export-pdf')
+@bp.route('/admin/schedule/export-pdf')
 @login_required
 def admin_schedule_export_pdf():
     """Экспорт расписания кружков в PDF"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('index'))
-    
-    # Регистрируем шрифт с поддержкой кириллицы
-    font_name = 'Helvetica'  # По умолчанию
-    font_name_bold = 'Helvetica-Bold'
-    
-    try:
-        # Пробуем найти шрифт с поддержкой кириллицы
-        font_paths = [
-            # macOS
-            '/System/Library/Fonts/Supplemental/Arial Unicode.ttf',
-            '/Library/Fonts/Arial Unicode.ttf',
-            # Ubuntu/Linux
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-            '/usr/share/fonts/TTF/DejaVuSans.ttf',
-        ]
-        
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                pdfmetrics.registerFont(TTFont('CyrillicFont', font_path))
-                font_name = 'CyrillicFont'
-                font_name_bold = 'CyrillicFont'
-                break
-        
-    except Exception as e:
-        pass
-    
-    # Дни недели на казахском
-    days_order = ['Дүйсенбі', 'Сейсенбі', 'Сәрсенбі', 'Бейсенбі', 'Жұма', 'Сенбі']
-    
-    # Получаем все кружки с расписанием (та же логика что и в admin_schedule)
-    circles = Circle.query.order_by(Circle.name).all()
-    
-    def parse_time(time_str):
-        if not time_str:
-            return (0, 0)
-        time_part = time_str.split('-')[0].strip()
-        try:
-            parts = time_part.replace(' ', '').split(':')
-            if len(parts) == 2:
-                return (int(parts[0]), int(parts[1]))
-        except:
-            pass
-        return (0, 0)
-    
-    circles_schedules = []
-    for circle in circles:
-        schedules = Schedule.query.filter_by(circle_id=circle.id).all()
-        if not schedules:
-            continue
-        
-        schedule_dict = {}
-        for schedule in schedules:
-            day = schedule.day_of_week
-            if not day:
-                continue
-            if day not in schedule_dict:
-                schedule_dict[day] = {}
-            time_slot = schedule.time_slot or ''
-            if time_slot not in schedule_dict[day]:
-                schedule_dict[day][time_slot] = []
-            schedule_dict[day][time_slot].append({
-                'group': schedule.group_number or '',
-                'room': schedule.room or '',
-                'floor': schedule.floor or '',
-                'time': time_slot,
-            })
-        
-        all_times = set()
-        for day_schedules in schedule_dict.values():
-            all_times.update(day_schedules.keys())
-        sorted_times = sorted(all_times, key=parse_time)
-        
-        circles_schedules.append({
-            'circle': circle,
-            'schedule_dict': schedule_dict,
-            'sorted_times': sorted_times,
-            'teacher': circle.teacher.full_name if circle.teacher else 'Не назначен'
-        })
+        return redirect(url_for('main.index'))
     
-    # Создаем PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), 
-                           rightMargin=15*mm, leftMargin=15*mm,
-                           topMargin=15*mm, bottomMargin=15*mm)
-    
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Используем зарегистрированные имена шрифтов
-    font_name_normal = font_name
-    
-    # Стили с поддержкой кириллицы
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontName=font_name_bold,
-        fontSize=18,
-        textColor=colors.HexColor('#0d6efd'),
-        spaceAfter=8,
-        alignment=1,  # CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontName=font_name_bold,
-        fontSize=14,
-        textColor=colors.HexColor('#0d6efd'),
-        spaceAfter=4,
-    )
+    if wants_background():
+        return enqueue_export('schedule_pdf', {})
     
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontName=font_name_normal,
-        fontSize=10,
-    )
+    validators = page_validators(['circles', 'schedules'])
+    cached = not_modified(validators)
+    if cached:
+        return cached
     
-    # Заголовок документа
-    story.append(Paragraph("Расписание кружков", title_style))
-    story.append(Paragraph(f"Дата экспорта: {datetime.now().strftime('%d.%m.%Y %H:%M')}", normal_style))
-    story.append(Spacer(1, 8*mm))
-    
-    # Для каждого кружка создаем таблицу
-    for circle_data in circles_schedules:
-        circle = circle_data['circle']
-        schedule_dict = circle_data['schedule_dict']
-        sorted_times = circle_data['sorted_times']
-        teacher = circle_data['teacher']
-        
-        # Заголовок кружка
-        circle_title = f"{circle.name}"
-        if circle.direction:
-            circle_title += f" ({circle.direction})"
-        story.append(Paragraph(circle_title, heading_style))
-        story.append(Paragraph(f"<b>Преподаватель:</b> {teacher}", normal_style))
-        story.append(Spacer(1, 6*mm))
-        
-        if sorted_times:
-            # Создаем стили для ячеек таблицы с поддержкой кириллицы
-            cell_style_normal = ParagraphStyle(
-                'CellNormal',
-                fontName=font_name_normal,
-                fontSize=7,
-                leading=8,
-                alignment=1,  # CENTER
-            )
-            
-            cell_style_bold = ParagraphStyle(
-                'CellBold',
-                fontName=font_name_bold,
-                fontSize=7,
-                leading=8,
-                alignment=1,  # CENTER
-            )
-            
-            cell_style_time = ParagraphStyle(
-                'CellTime',
-                fontName=font_name_bold,
-                fontSize=8,
-                leading=10,
-                alignment=1,  # CENTER
-            )
-            
-            # Заголовок таблицы с Paragraph для кириллицы
-            header_row = [Paragraph('<b>Время</b>', cell_style_time)]
-            for day in days_order:
-                header_row.append(Paragraph(f'<b>{day}</b>', cell_style_bold))
-            table_data = [header_row]
-            
-            # Данные таблицы
-            for time_slot in sorted_times:
-                row = [Paragraph(time_slot, cell_style_time)]
-                for day in days_order:
-                    if day in schedule_dict and time_slot in schedule_dict[day]:
-                        cell_parts = []
-                        for item in schedule_dict[day][time_slot]:
-                            parts = []
-                            if item['group']:
-                                parts.append(f"<b>Гр. {item['group']}</b>")
-                            if item['room']:
-                                room_info = f"Каб. {item['room']}"
-                                if item['floor']:
-                                    room_info += f"<br/>({item['floor']})"
-                                parts.append(room_info)
-                            cell_parts.append("<br/>".join(parts))
-                        cell_text = "<br/><br/>".join(cell_parts)
-                        row.append(Paragraph(cell_text, cell_style_normal))
-                    else:
-                        row.append(Paragraph("—", cell_style_normal))
-                table_data.append(row)
-            
-            # Создаем таблицу с улучшенным дизайном
-            table = Table(table_data, colWidths=[28*mm] + [32*mm] * len(days_order))
-            table.setStyle(TableStyle([
-                # Заголовок таблицы
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0d6efd')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('TOPPADDING', (0, 0), (-1, 0), 12),
-                # Данные таблицы
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dee2e6')),
-                ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#0d6efd')),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-                ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-                # Выделение колонки времени
-                ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#e7f3ff')),
-                ('LINEAFTER', (0, 0), (0, -1), 1.5, colors.HexColor('#0d6efd')),
-            ]))
-            
-            story.append(table)
-        else:
-            story.append(Paragraph("Расписание не заполнено", normal_style))
-        
-        story.append(Spacer(1, 10*mm))
-        
-        # Разрыв страницы между кружками (кроме последнего)
-        if circle_data != circles_schedules[-1]:
-            story.append(PageBreak())
-    
-    # Строим PDF
-    doc.build(story)
-    
-    # Возвращаем PDF как ответ
-    buffer.seek(0)
-    response = make_response(buffer.read())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=raspisanie_kruzhkov_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+    path, download_name = build_schedule_export()
+    return send_export(path, download_name, validators=validators)
+
+
+def build_schedule_export():
+    """Строит PDF расписания (или берет из кэша). Возвращает (путь, имя файла)."""
+    days_order = DAYS_ORDER
+    circles_schedules = build_schedule_grid()
     
-    return response
+    # Если расписание не менялось, отдаем ранее построенный файл
+    version = data_version([
+        (item['circle'], item['schedule_dict'], item['teacher']) for item in circles_schedules
+    ])
+    cached = get_export_cache().lookup('schedule', None, None, None, version)
+    if cached:
+        path, created = cached
+    else:
+        # PDF строится в пуле процессов и пишется в файл кэша (ReportLab загружается только для экспорта)
+        from center_export import render_in_pool
+        from pdf_export import render_schedule_bytes
+        path, created = get_export_cache().store(
+            'schedule', None, None, None, version,
+            lambda out: out.write(render_in_pool(render_schedule_bytes, circles_schedules, days_order,
+                                                 max_workers=current_app.config['EXPORT_WORKERS']))
+        )
+    return path, f'raspisanie_kruzhkov_{created.strftime("%Y%m%d_%H%M%S")}.pdf'
 
 
-@app.route('/admin/attendance/export-pdf')
+@bp.route('/admin/attendance/export-pdf')
 @login_required
 def admin_attendance_export_pdf():
     """Экспорт посещаемости кружка в PDF"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     # Получаем параметры
     circle_id = request.args.get('circle_id', type=int)
-    year = request.args.get('year', type=int, default=date.today().year)
-    month = request.args.get('month', type=int, default=date.today().month)
+    period = requested_month()
     
     if not circle_id:
         flash('Кружок не выбран', 'error')
-        return redirect(url_for('admin_attendance'))
+        return redirect(url_for('main.admin_attendance'))
+    if period is None:
+        return invalid_month_export()
+    year, month = period
     
     circle = Circle.query.get_or_404(circle_id)
     
-    # Получаем расписание кружка
-    schedules = Schedule.query.filter_by(circle_id=circle_id).all()
+    if wants_background():
+        return enqueue_export('attendance_pdf', {'circle_id': circle.id, 'year': year, 'month': month})
     
-    # Определяем дни недели, когда есть занятия
-    schedule_days = set()
-    day_mapping = {
-        'Дүйсенбі': 0,
-        'Сейсенбі': 1,
-        'Сәрсенбі': 2,
-        'Бейсенбі': 3,
-        'Жұма': 4,
-        'Сенбі': 5,
-    }
+    # Журнал не менялся - у клиента уже есть этот файл
+    validators = page_validators([f'circle:{circle.id}', f'attendance:{circle.id}:{year:04d}-{month:02d}'])
+    cached = not_modified(validators)
+    if cached:
+        return cached
     
-    for schedule in schedules:
-        if schedule.day_of_week and schedule.day_of_week in day_mapping:
-            schedule_days.add(day_mapping[schedule.day_of_week])
+    path, download_name = build_attendance_export(circle, year, month)
+    return send_export(path, download_name, validators=validators)
+
+
+def build_attendance_export(circle, year, month):
+    """Строит PDF журнала кружка за месяц (или берет из кэша). Возвращает (путь, имя файла)."""
+    circle_id = circle.id
     
-    # Получаем данные за месяц
-    first_day = date(year, month, 1)
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
-    
-    # Генерируем только дни с занятиями
-    dates_to_show = []
-    current_date = first_day
-    while current_date <= last_day:
-        if current_date.weekday() in schedule_days:
-            dates_to_show.append(current_date)
-        current_date += timedelta(days=1)
-    
-    students = Student.query.filter_by(circle_id=circle_id).order_by(Student.full_name).all()
-    
-    # Получаем все посещения за месяц
-    attendances = Attendance.query.filter(
-        Attendance.circle_id == circle_id,
-        Attendance.date >= first_day,
-        Attendance.date <= last_day
-    ).all()
+    # Даты занятий кружка за месяц
+    first_day, last_day = month_bounds(year, month)
+    dates_to_show = lesson_dates(first_day, last_day, schedule_weekdays(circle_id))
+    matrix = AttendanceMatrix.load(circle_id, dates_to_show)
     
-    # Группируем по студентам и датам
-    attendance_dict = {}
-    for a in attendances:
-        if a.student_id not in attendance_dict:
-            attendance_dict[a.student_id] = {}
-        attendance_dict[a.student_id][a.date] = a
+    # Если данные журнала не менялись, отдаем ранее построенный файл
+    download_name = f'attendance_circle_{circle_id}_{year}_{month:02d}.pdf'
+    version = data_version(
+        circle.name,
+        [tuple(s) for s in matrix.students],
+        dates_to_show,
+        matrix.fingerprint()
+    )
+    cached = get_export_cache().lookup('attendance', circle_id, year, month, version)
+    if cached:
+        return cached[0], download_name
+    
+    # PDF строится в пуле процессов и пишется в файл кэша (в имени файла только латинские символы)
+    from center_export import render_in_pool
+    from pdf_export import render_journal_bytes
+    journal = (circle.name, f"{MONTH_NAMES_RU[month]} {year}", build_journal_grid(matrix))
+    path, _ = get_export_cache().store(
+        'attendance', circle_id, year, month, version,
+        lambda out: out.write(render_in_pool(render_journal_bytes, journal,
+                                             max_workers=current_app.config['EXPORT_WORKERS']))
+    )
+    return path, download_name
+
+
+@bp.route('/admin/attendance/export-all')
+@login_required
+def admin_attendance_export_all():
+    """Экспорт журналов всех кружков за месяц: ZIP архив или один PDF"""
+    if not current_user.is_admin():
+        flash('Доступ запрещен', 'error')
+        return redirect(url_for('main.index'))
     
-    # Русские названия дней недели
-    weekdays_ru = {
-        0: 'Понедельник',
-        1: 'Вторник',
-        2: 'Среда',
-        3: 'Четверг',
-        4: 'Пятница',
-        5: 'Суббота',
-        6: 'Воскресенье'
-    }
+    period = requested_month()
+    if period is None:
+        return invalid_month_export()
+    year, month = period
+    export_format = 'pdf' if request.args.get('format') == 'pdf' else 'zip'
     
-    # Регистрируем шрифт с поддержкой кириллицы
-    font_name = 'Helvetica'
-    font_name_bold = 'Helvetica-Bold'
+    if wants_background():
+        return enqueue_export('attendance_all', {'year': year, 'month': month, 'format': export_format})
     
-    try:
-        font_paths = [
-            # macOS
-            '/System/Library/Fonts/Supplemental/Arial Unicode.ttf',
-            '/Library/Fonts/Arial Unicode.ttf',
-            # Ubuntu/Linux
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-            '/usr/share/fonts/TTF/DejaVuSans.ttf',
-        ]
-        
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                pdfmetrics.registerFont(TTFont('CyrillicFont', font_path))
-                font_name = 'CyrillicFont'
-                font_name_bold = 'CyrillicFont'
-                break
-    except Exception as e:
-        pass
-    
-    # Создаем PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4),
-                           rightMargin=10*mm, leftMargin=10*mm,
-                           topMargin=15*mm, bottomMargin=15*mm)
-    
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Стили
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontName=font_name_bold,
-        fontSize=16,
-        textColor=colors.HexColor('#0d6efd'),
-        spaceAfter=6,
-        alignment=1,
-    )
+    validators = page_validators(['circles', 'students', 'schedules', f'attendance:{year:04d}-{month:02d}'])
+    cached = not_modified(validators)
+    if cached:
+        return cached
     
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontName=font_name,
-        fontSize=9,
-    )
+    from center_export import load_month_journals, iter_rendered, stream_zip
+    journals = load_month_journals(year, month, f"{MONTH_NAMES_RU[month]} {year}")
+    if not journals:
+        flash('Нет доступных кружков', 'error')
+        return redirect(url_for('main.admin_attendance'))
     
-    cell_style = ParagraphStyle(
-        'CellStyle',
-        fontName=font_name,
-        fontSize=7,
-        leading=8,
-        alignment=1,
-    )
+    if export_format == 'pdf':
+        path, download_name = build_merged_export(journals, year, month)
+        return send_export(path, download_name, validators=validators)
     
-    cell_style_bold = ParagraphStyle(
-        'CellBold',
-        fontName=font_name_bold,
-        fontSize=8,
-        leading=9,
-        alignment=1,
+    # ZIP отдается потоком: файлы уходят клиенту по мере построения
+    archive = stream_zip(
+        iter_rendered(journals, current_app.config['EXPORT_WORKERS']),
+        lambda circle_id: f'attendance_circle_{circle_id}_{year}_{month:02d}.pdf'
     )
-    
-    # Заголовок
-    story.append(Paragraph(f"Журнал посещаемости", title_style))
-    story.append(Paragraph(f"Кружок: {circle.name}", normal_style))
-    story.append(Paragraph(f"{MONTH_NAMES_RU[month]} {year}", normal_style))
-    story.append(Spacer(1, 6*mm))
-    
-    if students and dates_to_show:
-        # Заголовок таблицы
-        header_row = [Paragraph('<b>ФИО</b>', cell_style_bold)]
-        for day_date in dates_to_show:
-            header_text = f"<b>{day_date.strftime('%d')}</b><br/>{weekdays_ru[day_date.weekday()][:3]}"
-            header_row.append(Paragraph(header_text, cell_style_bold))
-        header_row.append(Paragraph('<b>Всего</b>', cell_style_bold))
-        header_row.append(Paragraph('<b>%</b>', cell_style_bold))
-        
-        table_data = [header_row]
-        
-        # Данные студентов
-        for student in students:
-            present_count = 0
-            total_count = 0
-            
-            # Подсчитываем статистику
-            for day_date in dates_to_show:
-                if student.id in attendance_dict and day_date in attendance_dict[student.id]:
-                    total_count += 1
-                    if attendance_dict[student.id][day_date].status == 'present':
-                        present_count += 1
-            
-            # Строка студента
-            student_name = student.full_name
-            if student.grade:
-                student_name += f" ({student.grade})"
-            row = [Paragraph(student_name, cell_style)]
-            
-            # Ячейки посещаемости
-            for day_date in dates_to_show:
-                if student.id in attendance_dict and day_date in attendance_dict[student.id]:
-                    att = attendance_dict[student.id][day_date]
-                    if att.status == 'present':
-                        row.append(Paragraph('✓', cell_style))
-                    elif att.status == 'absent':
-                        row.append(Paragraph('✗', cell_style))
-                    elif att.status == 'excused':
-                        row.append(Paragraph('У', cell_style))
-                    else:
-                        row.append(Paragraph('-', cell_style))
-                else:
-                    row.append(Paragraph('-', cell_style))
-            
-            # Итоги
-            row.append(Paragraph(f"{present_count}/{total_count}", cell_style_bold))
-            if total_count > 0:
-                percentage = round((present_count / total_count * 100), 1)
-                row.append(Paragraph(f"{percentage}%", cell_style_bold))
-            else:
-                row.append(Paragraph('-', cell_style))
-            
-            table_data.append(row)
-        
-        # Создаем таблицу
-        col_widths = [60*mm] + [15*mm] * len(dates_to_show) + [20*mm, 15*mm]
-        table = Table(table_data, colWidths=col_widths)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0d6efd')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dee2e6')),
-            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#0d6efd')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-            ('LEFTPADDING', (0, 0), (-1, -1), 4),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 1), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),  # ФИО слева
-        ]))
-        
-        story.append(table)
-        
-        # Легенда
-        story.append(Spacer(1, 4*mm))
-        story.append(Paragraph("✓ - Присутствовал, ✗ - Отсутствовал, У - Уважительная", normal_style))
+    response = Response(archive, mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename=attendance_all_{year}_{month:02d}.zip'
+    return with_validators(response, validators)
+
+
+def build_merged_export(journals, year, month):
+    """Один PDF на весь центр, кэшируется как обычный экспорт. Возвращает (путь, имя файла)."""
+    version = data_version(journals)
+    cached = get_export_cache().lookup('attendance_all', None, year, month, version)
+    if cached:
+        path = cached[0]
     else:
-        story.append(Paragraph("Нет данных для отображения", normal_style))
+        from center_export import render_merged
+        path, _ = get_export_cache().store(
+            'attendance_all', None, year, month, version,
+            lambda out: out.write(render_merged(journals, current_app.config['EXPORT_WORKERS']))
+        )
+    return path, f'attendance_all_{year}_{month:02d}.pdf'
+
+
+def send_export(path, download_name, mimetype='application/pdf', validators=None):
+    """Отдает файл экспорта с диска как вложение (с ETag версии данных, если задан)"""
+    response = send_file(path, mimetype=mimetype, as_attachment=True,
+                         download_name=download_name, max_age=0)
+    return with_validators(response, validators)
+
+
+# ===== ФОНОВЫЕ ЗАДАЧИ =====
+
+def wants_background():
+    """Экспорт запрошен как фоновая задача (кнопки экспорта с JavaScript)"""
+    return request.args.get('background') == '1'
+
+
+def invalid_month_export():
+    """Ответ экспорта на неверный месяц: 400 для фоновой задачи, иначе сообщение в журнале"""
+    if wants_background():
+        return jsonify({'error': 'Неверный месяц'}), 400
+    flash('Неверный месяц', 'error')
+    return redirect(url_for('main.admin_attendance'))
+
+
+def enqueue_export(kind, params):
+    """Ставит экспорт в очередь и возвращает JSON со ссылками на статус и результат"""
+    job = get_job_queue().enqueue(kind, params, current_user.id)
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('main.job_status_view', job_id=job.id),
+        'download_url': url_for('main.job_download', job_id=job.id),
+    }), 202
+
+
+def get_own_job_or_404(job_id):
+    job = Job.query.get_or_404(job_id)
+    if not current_user.is_admin() and job.created_by != current_user.id:
+        abort(404)
+    return job
+
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status_view(job_id):
+    """Статус и прогресс фоновой задачи"""
+    job = get_own_job_or_404(job_id)
+    get_job_queue().fail_if_lost(job)
+    data = job_status(job)
+    if job.status == 'done':
+        data['download_url'] = url_for('main.job_download', job_id=job.id)
+    return jsonify(data)
+
+
+@bp.route('/jobs/<int:job_id>/download')
+@login_required
+def job_download(job_id):
+    """Скачивание результата фоновой задачи"""
+    job = get_own_job_or_404(job_id)
+    if job.status != 'done' or not job.result_path or not os.path.exists(job.result_path):
+        return jsonify({'error': 'Result is not ready', 'status': job.status}), 409
+    
+    mimetype = 'application/zip' if job.result_name.endswith('.zip') else 'application/pdf'
+    return send_export(job.result_path, job.result_name, mimetype)
+
+
+def copy_file(path, out):
+    with open(path, 'rb') as f:
+        shutil.copyfileobj(f, out)
+
+
+@job_handler('schedule_pdf')
+def schedule_pdf_job(params, out, progress):
+    path, download_name = build_schedule_export()
+    copy_file(path, out)
+    return download_name
+
+
+@job_handler('attendance_pdf')
+def attendance_pdf_job(params, out, progress):
+    circle = db.session.get(Circle, params['circle_id'])
+    if circle is None:
+        raise ValueError('Кружок не найден')
+    path, download_name = build_attendance_export(circle, params['year'], params['month'])
+    copy_file(path, out)
+    return download_name
+
+
+@job_handler('attendance_all')
+def attendance_all_job(params, out, progress):
+    from center_export import load_month_journals, iter_rendered, stream_zip
+    year, month = params['year'], params['month']
+    journals = load_month_journals(year, month, f"{MONTH_NAMES_RU[month]} {year}")
     
-    # Строим PDF
-    doc.build(story)
+    if params['format'] == 'pdf':
+        path, download_name = build_merged_export(journals, year, month)
+        copy_file(path, out)
+        return download_name
     
-    # Возвращаем PDF
-    buffer.seek(0)
-    response = make_response(buffer.read())
-    response.headers['Content-Type'] = 'application/pdf'
-    # Используем только латинские символы в имени файла
-    safe_circle_name = f"circle_{circle_id}"
-    response.headers['Content-Disposition'] = f'attachment; filename=attendance_{safe_circle_name}_{year}_{month:02d}.pdf'
+    # Прогресс - доля уже построенных журналов
+    def rendered_with_progress():
+        for done, item in enumerate(iter_rendered(journals, current_app.config['EXPORT_WORKERS']), start=1):
+            progress(done * 100 / len(journals))
+            yield item
     
-    return response
+    for chunk in stream_zip(
+        rendered_with_progress(),
+        lambda circle_id: f'attendance_circle_{circle_id}_{year}_{month:02d}.pdf'
+    ):
+        out.write(chunk)
+    return f'attendance_all_{year}_{month:02d}.zip'
 
 
-@app.route('/admin/attendance')
+@bp.route('/admin/attendance')
 @login_required
 def admin_attendance():
     """Журнал посещаемости всех кружков для админа"""
     if not current_user.is_admin():
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     # Получаем параметры
     circle_id = request.args.get('circle_id', type=int)
-    year = request.args.get('year', type=int, default=date.today().year)
-    month = request.args.get('month', type=int, default=date.today().month)
+    period = requested_month()
+    if period is None:
+        flash('Неверный месяц', 'error')
+        return redirect(url_for('main.admin_attendance', circle_id=circle_id))
+    year, month = period
     
     circles = Circle.query.all()
     
@@ -965,128 +1144,136 @@ def admin_attendance():
     
     if not circle:
         flash('Нет доступных кружков', 'error')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
-    # Получаем расписание кружка
-    schedules = Schedule.query.filter_by(circle_id=circle_id).all()
-    
-    # Определяем дни недели, когда есть занятия
-    schedule_days = set()
-    day_mapping = {
-        'Дүйсенбі': 0,  # Понедельник
-        'Сейсенбі': 1,  # Вторник
-        'Сәрсенбі': 2,  # Среда
-        'Бейсенбі': 3,  # Четверг
-        'Жұма': 4,      # Пятница
-        'Сенбі': 5,     # Суббота
-    }
-    
-    for schedule in schedules:
-        if schedule.day_of_week and schedule.day_of_week in day_mapping:
-            schedule_days.add(day_mapping[schedule.day_of_week])
-    
-    # Получаем данные за месяц
-    first_day = date(year, month, 1)
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
-    
-    # Генерируем только дни с занятиями
-    dates_to_show = []
-    current_date = first_day
-    while current_date <= last_day:
-        if current_date.weekday() in schedule_days:
-            dates_to_show.append(current_date)
-        current_date += timedelta(days=1)
-    
-    students = Student.query.filter_by(circle_id=circle_id).order_by(Student.full_name).all()
-    
-    # Получаем все посещения за месяц
-    attendances = Attendance.query.filter(
-        Attendance.circle_id == circle_id,
-        Attendance.date >= first_day,
-        Attendance.date <= last_day
-    ).all()
+    # Журнал не менялся с прошлой загрузки - 304 без запросов и шаблона
+    validators = page_validators(
+        ['circles', f'circle:{circle_id}', f'attendance:{circle_id}:{year:04d}-{month:02d}']
+    )
+    cached = not_modified(validators)
+    if cached:
+        return cached
     
-    # Группируем по студентам и датам
-    attendance_dict = {}
-    for a in attendances:
-        if a.student_id not in attendance_dict:
-            attendance_dict[a.student_id] = {}
-        attendance_dict[a.student_id][a.date] = a
+    # Дни месяца, в которые у кружка есть занятия
+    first_day, last_day = month_bounds(year, month)
+    dates_to_show = lesson_dates(first_day, last_day, schedule_weekdays(circle_id))
     
-    # Русские названия дней недели
-    weekdays_ru = {
-        0: 'Понедельник',
-        1: 'Вторник',
-        2: 'Среда',
-        3: 'Четверг',
-        4: 'Пятница',
-        5: 'Суббота',
-        6: 'Воскресенье'
-    }
+    # Ячейки и итоги считаются по матрице, шаблон только выводит готовые строки
+    grid = build_journal_grid(AttendanceMatrix.load(circle_id, dates_to_show), today=date.today())
     
-    return render_template('admin/attendance.html',
-                         circle=circle,
-                         circles=circles,
-                         students=students,
-                         attendance_dict=attendance_dict,
-                         year=year,
-                         month=month,
-                         dates_to_show=dates_to_show,
-                         weekdays_ru=weekdays_ru,
-                         month_name_ru=MONTH_NAMES_RU[month],
-                         today=date.today())
+    html = render_template('admin/attendance.html',
+                           circle=circle,
+                           circles=circles,
+                           grid=grid,
+                           year=year,
+                           month=month,
+                           month_name_ru=MONTH_NAMES_RU[month])
+    return with_validators(make_response(html), validators)
 
 
 # ===== ПРЕПОДАВАТЕЛЬ =====
 
-@app.route('/teacher/dashboard')
+@bp.route('/teacher/dashboard')
 @login_required
 def teacher_dashboard():
     """Дашборд преподавателя"""
     if current_user.is_admin():
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
-    # Получаем кружки преподавателя
-    circles = Circle.query.filter_by(teacher_id=current_user.id).all()
+    data = build_teacher_dashboard_data(current_user.id, date.today().replace(day=1))
+    return render_template('teacher/dashboard.html', **data)
+
+
+def attendance_rate_percent(present, total):
+    return round((present / total * 100) if total > 0 else 0, 1)
+
+
+def build_teacher_dashboard_data(teacher_id, first_day):
+    """Показатели дашборда преподавателя: итоги, разбивка по кружкам и группам.
     
-    # Статистика
-    total_students = sum(len(circle.students) for circle in circles)
+    Считается агрегатными запросами (GROUP BY кружок, группа) без загрузки
+    учеников и отметок в виде объектов.
+    """
+    circles = db.session.query(Circle.id, Circle.name, Circle.direction)\
+        .filter(Circle.teacher_id == teacher_id).order_by(Circle.name).all()
+    circle_ids = [c.id for c in circles]
     
-    today = date.today()
-    first_day = today.replace(day=1)
+    # Группа и кружок -> счетчики; группа None - ученики без группы
+    groups = {}
     
-    # Посещаемость за месяц
-    circle_ids = [c.id for c in circles]
-    attendances_this_month = Attendance.query.filter(
+    def group_stats(circle_id, group_number):
+        return groups.setdefault((circle_id, group_number), {
+            'group': group_number, 'students': 0, 'present': 0, 'absent': 0, 'excused': 0
+        })
+    
+    # Число учеников по кружкам и группам (покрывающий индекс по circle_id, group_number)
+    for circle_id, group_number, students_count in db.session.query(
+        Student.circle_id, Student.group_number, func.count(Student.id)
+    ).filter(Student.circle_id.in_(circle_ids)).group_by(Student.circle_id, Student.group_number):
+        group_stats(circle_id, group_number)['students'] = students_count
+    
+    # Отметки за месяц по кружкам и группам учеников
+    for row in db.session.query(
+        Attendance.circle_id,
+        Student.group_number,
+        func.sum(case((Attendance.status == 'present', 1), else_=0)).label('present'),
+        func.sum(case((Attendance.status == 'absent', 1), else_=0)).label('absent'),
+        func.sum(case((Attendance.status == 'excused', 1), else_=0)).label('excused')
+    ).join(Student, Attendance.student_id == Student.id).filter(
         Attendance.circle_id.in_(circle_ids),
         Attendance.date >= first_day
-    ).all()
+    ).group_by(Attendance.circle_id, Student.group_number):
+        stats = group_stats(row.circle_id, row.group_number)
+        stats['present'], stats['absent'], stats['excused'] = int(row.present), int(row.absent), int(row.excused)
+    
+    # Расписание всех кружков одним запросом
+    schedules = {}
+    for schedule in db.session.query(
+        Schedule.circle_id, Schedule.day_of_week, Schedule.group_number, Schedule.time_slot, Schedule.room
+    ).filter(Schedule.circle_id.in_(circle_ids)).order_by(Schedule.circle_id, Schedule.id):
+        schedules.setdefault(schedule.circle_id, []).append(schedule)
+    
+    circles_stats = []
+    for circle in circles:
+        circle_groups = sorted(
+            (stats for (circle_id, _), stats in groups.items() if circle_id == circle.id),
+            key=lambda g: (g['group'] is None, g['group'] or '')
+        )
+        totals = {key: sum(g[key] for g in circle_groups) for key in ('students', 'present', 'absent', 'excused')}
+        totals['marks'] = totals['present'] + totals['absent'] + totals['excused']
+        totals['rate'] = attendance_rate_percent(totals['present'], totals['marks'])
+        for g in circle_groups:
+            g['marks'] = g['present'] + g['absent'] + g['excused']
+            g['rate'] = attendance_rate_percent(g['present'], g['marks'])
+        circles_stats.append({
+            'circle': circle,
+            'schedules': schedules.get(circle.id, []),
+            'groups': circle_groups,
+            **totals
+        })
     
-    present_count = sum(1 for a in attendances_this_month if a.status == 'present')
-    total_marks = len(attendances_this_month)
-    attendance_rate = round((present_count / total_marks * 100) if total_marks > 0 else 0, 1)
+    present_count = sum(c['present'] for c in circles_stats)
+    total_marks = sum(c['marks'] for c in circles_stats)
     
-    return render_template('teacher/dashboard.html',
-                         circles=circles,
-                         total_students=total_students,
-                         attendance_rate=attendance_rate,
-                         present_count=present_count,
-                         total_marks=total_marks)
+    return {
+        'circles': circles_stats,
+        'total_students': sum(c['students'] for c in circles_stats),
+        'attendance_rate': attendance_rate_percent(present_count, total_marks),
+        'present_count': present_count,
+        'total_marks': total_marks,
+    }
 
 
-@app.route('/teacher/circle/<int:circle_id>')
+@bp.route('/teacher/circle/<int:circle_id>')
 @login_required
 def teacher_circle(circle_id):
     """Страница кружка с возможностью отметки посещаемости (режимы: день, неделя, месяц)"""
     circle = Circle.query.get_or_404(circle_id)
     
     # Проверяем права доступа
-    if not current_user.is_admin() and circle.teacher_id != current_user.id:
+    if not current_user.can_access_circle(circle.id):
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     
     # Получаем параметры
     view_mode = request.args.get('mode', 'day')  # day, week, month
@@ -1166,80 +1353,30 @@ def teacher_circle(circle_id):
     if not selected_schedule and current_schedule:
         selected_schedule = current_schedule
     
+    # Отметки недели могут попасть в два месяца; выбранное занятие зависит от времени
+    week_start = selected_date - timedelta(days=selected_date.weekday())
+    months = sorted({month_key(selected_date), month_key(week_start), month_key(week_start + timedelta(days=6))})
+    validators = page_validators(
+        [f'circle:{circle_id}'] + [f'attendance:{circle_id}:{month}' for month in months],
+        selected_schedule.id if selected_schedule else None,
+        current_schedule.id if current_schedule else None
+    )
+    cached = not_modified(validators)
+    if cached:
+        return cached
+    
     # Фильтруем студентов по группе, если выбрано занятие с группой
-    if selected_schedule and selected_schedule.group_number:
-        students = Student.query.filter_by(
-            circle_id=circle_id, 
-            group_number=selected_schedule.group_number
-        ).order_by(Student.full_name).all()
-    else:
-        students = Student.query.filter_by(circle_id=circle_id).order_by(Student.full_name).all()
+    group = selected_schedule.group_number if selected_schedule else None
     
-    # Генерируем даты в зависимости от режима
-    dates_to_show = []
-    
-    if view_mode == 'day':
-        dates_to_show = [selected_date]
-    elif view_mode == 'week':
-        # Находим начало недели (понедельник)
-        days_since_monday = selected_date.weekday()
-        week_start = selected_date - timedelta(days=days_since_monday)
-        # Показываем только дни с занятиями в этой неделе
-        for i in range(7):
-            check_date = week_start + timedelta(days=i)
-            if check_date.weekday() in schedule_days:
-                dates_to_show.append(check_date)
-    elif view_mode == 'month':
-        # Показываем все дни месяца, когда есть занятия
-        year = selected_date.year
-        month = selected_date.month
-        first_day = date(year, month, 1)
-        if month == 12:
-            last_day = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            last_day = date(year, month + 1, 1) - timedelta(days=1)
-        
-        current_date = first_day
-        while current_date <= last_day:
-            if current_date.weekday() in schedule_days:
-                dates_to_show.append(current_date)
-            current_date += timedelta(days=1)
-    
-    # Получаем посещаемость для всех дат
-    attendances_dict = {}
-    if dates_to_show:
-        attendances_list = Attendance.query.filter(
-            Attendance.circle_id == circle_id,
-            Attendance.date.in_(dates_to_show)
-        ).all()
-        
-        for a in attendances_list:
-            if a.date not in attendances_dict:
-                attendances_dict[a.date] = {}
-            attendances_dict[a.date][a.student_id] = a
-    
-    # Вычисляем навигационные даты для шаблона
-    nav_dates = {}
-    if view_mode == 'week':
-        if dates_to_show:
-            nav_dates['prev'] = (dates_to_show[0] - timedelta(days=7)).strftime('%Y-%m-%d')
-            nav_dates['next'] = (dates_to_show[-1] + timedelta(days=1)).strftime('%Y-%m-%d')
-            nav_dates['week_start'] = dates_to_show[0]
-            nav_dates['week_end'] = dates_to_show[-1]
-    elif view_mode == 'month':
-        # Предыдущий месяц
-        if selected_date.month == 1:
-            prev_month = date(selected_date.year - 1, 12, 1)
-        else:
-            prev_month = date(selected_date.year, selected_date.month - 1, 1)
-        nav_dates['prev'] = prev_month.strftime('%Y-%m-%d')
-        
-        # Следующий месяц
-        if selected_date.month == 12:
-            next_month = date(selected_date.year + 1, 1, 1)
-        else:
-            next_month = date(selected_date.year, selected_date.month + 1, 1)
-        nav_dates['next'] = next_month.strftime('%Y-%m-%d')
+    students = []
+    grid = None
+    if view_mode in ('week', 'month'):
+        # Неделя и месяц: сетка в компактном JSON, таблицу строит браузер
+        grid = attendance_grid_payload(circle_id, view_mode, selected_date, schedule_days, group)
+    else:
+        view_mode = 'day'
+        # Ученики с отметкой и примечанием выбранного дня
+        students = build_day_rows(circle_id, selected_date, group)
     
     # Русские названия дней недели
     weekdays_ru = {
@@ -1252,42 +1389,80 @@ def teacher_circle(circle_id):
         6: 'Воскресенье'
     }
     
-    # Русские названия месяцев
-    months_ru = {
-        1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
-        5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
-        9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
-    }
-    
     # Группируем расписание для отображения
     schedule_grouped = {}
-    days_order = ['Дүйсенбі', 'Сейсенбі', 'Сәрсенбі', 'Бейсенбі', 'Жұма', 'Сенбі']
+    days_order = DAYS_ORDER
     for day_name in days_order:
         if day_name in day_mapping:
             day_num = day_mapping[day_name]
             if day_num in schedule_by_day:
                 schedule_grouped[day_name] = schedule_by_day[day_num]
     
-    return render_template('teacher/circle.html',
-                         circle=circle,
-                         students=students,
-                         attendances_dict=attendances_dict,
-                         dates_to_show=dates_to_show,
-                         selected_date=selected_date,
-                         view_mode=view_mode,
-                         schedule_days=schedule_days,
-                         nav_dates=nav_dates,
-                         weekdays_ru=weekdays_ru,
-                         months_ru=months_ru,
-                         today=date.today(),
-                         schedules=schedules,
-                         schedule_grouped=schedule_grouped,
-                         selected_schedule=selected_schedule,
-                         current_schedule=current_schedule,
-                         days_order=days_order)
-
-
-@app.route('/teacher/mark-attendance', methods=['POST'])
+    html = render_template('teacher/circle.html',
+                           circle=circle,
+                           students=students,
+                           grid=grid,
+                           selected_date=selected_date,
+                           view_mode=view_mode,
+                           schedule_days=schedule_days,
+                           weekdays_ru=weekdays_ru,
+                           today=date.today(),
+                           schedules=schedules,
+                           schedule_grouped=schedule_grouped,
+                           selected_schedule=selected_schedule,
+                           current_schedule=current_schedule,
+                           days_order=days_order)
+    return with_validators(make_response(html), validators)
+
+
+def attendance_grid_payload(circle_id, view_mode, selected_date, weekdays, group):
+    """Сетка кружка за неделю/месяц с заголовком и датами соседних периодов"""
+    first_day, last_day, prev_day, next_day = grid_period(view_mode, selected_date)
+    payload = build_attendance_grid(circle_id, lesson_dates(first_day, last_day, weekdays), group)
+    if view_mode == 'month':
+        title = f'{MONTH_NAMES_RU[first_day.month]} {first_day.year}'
+    else:
+        title = f'{first_day.strftime("%d.%m")} - {last_day.strftime("%d.%m.%Y")}'
+    payload.update({
+        'mode': view_mode,
+        'start': first_day.isoformat(),
+        'title': title,
+        'prev': prev_day.isoformat(),
+        'next': next_day.isoformat(),
+        'today': date.today().isoformat(),
+    })
+    return payload
+
+
+@bp.route('/teacher/circle/<int:circle_id>/grid')
+@login_required
+def teacher_circle_grid(circle_id):
+    """Сетка посещаемости кружка за неделю или месяц (JSON для страницы кружка)"""
+    circle = Circle.query.get_or_404(circle_id)
+    if not current_user.can_access_circle(circle.id):
+        return jsonify({'error': 'Access denied'}), 403
+    
+    view_mode = 'month' if request.args.get('mode') == 'month' else 'week'
+    try:
+        selected_date = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        selected_date = date.today()
+    group = request.args.get('group') or None
+    
+    first_day, last_day, _, _ = grid_period(view_mode, selected_date)
+    validators = page_validators(
+        [f'circle:{circle.id}'] +
+        [f'attendance:{circle.id}:{month}' for month in sorted({month_key(first_day), month_key(last_day)})]
+    )
+    cached = not_modified(validators)
+    if cached:
+        return cached
+    
+    payload = attendance_grid_payload(circle.id, view_mode, selected_date, schedule_weekdays(circle.id), group)
+    return with_validators(jsonify(payload), validators)
+
+
+@bp.route('/teacher/mark-attendance', methods=['POST'])
 @login_required
 def mark_attendance():
     """Отметить посещаемость"""
@@ -1303,105 +1478,203 @@ def mark_attendance():
     if not student_id or not circle_id or not date_str or not status:
         return jsonify({'error': 'Missing required fields'}), 400
     
+    if status not in ATTENDANCE_STATUSES:
+        return jsonify({'error': f'Invalid status: {status}'}), 400
+    
     try:
         attendance_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     except (ValueError, TypeError) as e:
         return jsonify({'error': f'Invalid date format: {e}'}), 400
     
-    # Проверяем права
+    try:
+        student_id = int(student_id)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'Invalid student: {e}'}), 400
+    
     circle = Circle.query.get_or_404(circle_id)
-    if not current_user.is_admin() and circle.teacher_id != current_user.id:
-        return jsonify({'error': 'Access denied'}), 403
+    try:
+        save_attendance_marks(circle.id, [{
+            'student_id': student_id,
+            'date': attendance_date,
+            'status': status,
+            'note': note,
+        }], current_user)
+    except AttendanceDenied as e:
+        return jsonify({'error': str(e)}), e.status_code
+    db.session.commit()
+    get_dashboard_cache().invalidate()
     
-    # Ищем существующую запись
-    attendance = Attendance.query.filter_by(
-        student_id=student_id,
-        date=attendance_date
-    ).first()
-    
-    if attendance:
-        # Обновляем
-        attendance.status = status
-        attendance.note = note
-        attendance.marked_by = current_user.id
-    else:
-        # Создаем новую
-        attendance = Attendance(
-            student_id=student_id,
-            circle_id=circle_id,
-            date=attendance_date,
-            status=status,
-            note=note,
-            marked_by=current_user.id
-        )
-        db.session.add(attendance)
+    return jsonify({'success': True})
+
+
+@bp.route('/teacher/mark-attendance/bulk', methods=['POST'])
+@login_required
+def mark_attendance_bulk():
+    """Пакетная отметка посещаемости (несколько ячеек одного кружка за один запрос)"""
+    data = request.get_json(silent=True) or {}
+    
+    circle_id = data.get('circle_id')
+    cells = data.get('cells')
+    
+    if not circle_id or not isinstance(cells, list) or not cells:
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    if len(cells) > BULK_ATTENDANCE_LIMIT:
+        return jsonify({'error': f'Too many cells (max {BULK_ATTENDANCE_LIMIT})'}), 400
     
+    circle = Circle.query.get_or_404(circle_id)
+    
+    # Валидация ячеек; при повторе одной и той же ячейки побеждает последнее значение
+    marks = {}
+    for cell in cells:
+        if not isinstance(cell, dict):
+            return jsonify({'error': 'Invalid cell'}), 400
+        
+        student_id = cell.get('student_id')
+        date_str = cell.get('date')
+        status = cell.get('status')
+        
+        if not student_id or not date_str or status not in ATTENDANCE_STATUSES:
+            return jsonify({'error': 'Missing required fields'}), 400
+        
+        try:
+            attendance_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            student_id = int(student_id)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': f'Invalid cell: {e}'}), 400
+        
+        marks[(student_id, attendance_date)] = {
+            'student_id': student_id,
+            'date': attendance_date,
+            'status': status,
+            'note': cell.get('note') or '',
+        }
+    
+    try:
+        save_attendance_marks(circle.id, list(marks.values()), current_user)
+    except AttendanceDenied as e:
+        return jsonify({'error': str(e)}), e.status_code
     db.session.commit()
+    get_dashboard_cache().invalidate()
+    
+    return jsonify({'success': True, 'saved': len(marks)})
+
+
+class AttendanceDenied(ValueError):
+    """Отметки нельзя сохранить: нет доступа к кружку или ученик не из кружка"""
+    
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def save_attendance_marks(circle_id, marks, user):
+    """Атомарный upsert отметок по ограничению _student_date_uc.
+    
+    Единственный путь записи отметок: проверяет доступ пользователя к кружку
+    и что все ученики из этого кружка (иначе AttendanceDenied).
+    Один INSERT ... ON CONFLICT DO UPDATE вместо SELECT + INSERT, поэтому
+    два одновременных клика по одной ячейке не приводят к IntegrityError.
+    Сводка attendance_daily обновляется в той же транзакции.
+    Коммит выполняет вызывающий код.
+    """
+    if not user.can_access_circle(circle_id):
+        raise AttendanceDenied('Access denied', 403)
+    if not marks:
+        return
+    
+    # Все ученики должны принадлежать кружку
+    student_ids = {mark['student_id'] for mark in marks}
+    known_ids = {row.id for row in db.session.query(Student.id).filter(
+        Student.circle_id == circle_id,
+        Student.id.in_(student_ids)
+    )}
+    if student_ids - known_ids:
+        raise AttendanceDenied('Student does not belong to circle', 400)
+    
+    marked_by = user.id
+    now = datetime.utcnow()
+    rows = [{
+        'student_id': mark['student_id'],
+        'circle_id': circle_id,
+        'date': mark['date'],
+        'status': mark['status'],
+        'note': mark['note'],
+        'marked_by': marked_by,
+        'created_at': now,
+    } for mark in marks]
+    
+    stmt = sqlite_insert(Attendance).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['student_id', 'date'],
+        set_={
+            'status': stmt.excluded.status,
+            'note': stmt.excluded.note,
+            'marked_by': stmt.excluded.marked_by,
+        }
+    )
+    db.session.execute(stmt)
     
-    return jsonify({'success': True})
+    # Пересчитываем сводку в той же транзакции. Существующая отметка могла
+    # принадлежать другому кружку (circle_id при обновлении не меняется),
+    # поэтому затронутые пары берем из самой таблицы посещений
+    refresh_daily_rollup(rollup_keys_for(
+        {row['student_id'] for row in rows},
+        {row['date'] for row in rows}
+    ))
 
 
-@app.route('/teacher/attendance-history/<int:circle_id>')
+@bp.route('/teacher/attendance-history/<int:circle_id>')
 @login_required
 def attendance_history(circle_id):
     """История посещаемости кружка"""
     circle = Circle.query.get_or_404(circle_id)
     
     # Проверяем права
-    if not current_user.is_admin() and circle.teacher_id != current_user.id:
+    if not current_user.can_access_circle(circle.id):
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     
     # Получаем месяц и год из параметров
-    year = request.args.get('year', type=int, default=date.today().year)
-    month = request.args.get('month', type=int, default=date.today().month)
+    period = requested_month()
+    if period is None:
+        flash('Неверный месяц', 'error')
+        return redirect(url_for('main.attendance_history', circle_id=circle.id))
+    year, month = period
+    
+    # Прошлые месяцы почти не меняются - обычно ответ 304
+    validators = page_validators([f'circle:{circle_id}', f'attendance:{circle_id}:{year:04d}-{month:02d}'])
+    cached = not_modified(validators)
+    if cached:
+        return cached
     
     # Получаем данные за месяц
-    first_day = date(year, month, 1)
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
-    
-    students = Student.query.filter_by(circle_id=circle_id).order_by(Student.full_name).all()
-    
-    # Получаем все посещения за месяц
-    attendances = Attendance.query.filter(
-        Attendance.circle_id == circle_id,
-        Attendance.date >= first_day,
-        Attendance.date <= last_day
-    ).all()
-    
-    # Группируем по студентам и датам
-    attendance_dict = {}
-    for a in attendances:
-        if a.student_id not in attendance_dict:
-            attendance_dict[a.student_id] = {}
-        attendance_dict[a.student_id][a.date.day] = a
+    first_day, last_day = month_bounds(year, month)
+    dates = [first_day + timedelta(days=offset) for offset in range(last_day.day)]
     
-    # Получаем дни месяца
-    days_in_month = calendar.monthrange(year, month)[1]
+    grid = build_journal_grid(AttendanceMatrix.load(circle_id, dates))
     
-    return render_template('teacher/attendance_history.html',
-                         circle=circle,
-                         students=students,
-                         attendance_dict=attendance_dict,
-                         year=year,
-                         month=month,
-                         days_in_month=days_in_month,
-                         month_name_ru=MONTH_NAMES_RU[month])
+    html = render_template('teacher/attendance_history.html',
+                           circle=circle,
+                           grid=grid,
+                           year=year,
+                           month=month,
+                           prev_month=(first_day - timedelta(days=1)).replace(day=1),
+                           next_month=last_day + timedelta(days=1),
+                           month_name_ru=MONTH_NAMES_RU[month])
+    return with_validators(make_response(html), validators)
 
 
-@app.route('/teacher/students/<int:circle_id>')
+@bp.route('/teacher/students/<int:circle_id>')
 @login_required
 def teacher_students(circle_id):
     """Страница управления учениками кружка"""
     circle = Circle.query.get_or_404(circle_id)
     
     # Проверяем права
-    if not current_user.is_admin() and circle.teacher_id != current_user.id:
+    if not current_user.can_access_circle(circle.id):
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     
     # Получаем группы из расписания
     groups = list(set(s.group_number for s in circle.schedules if s.group_number))
@@ -1422,7 +1695,7 @@ def teacher_students(circle_id):
                          group_filter=group_filter)
 
 
-@app.route('/teacher/student/<int:student_id>', methods=['GET', 'POST'])
+@bp.route('/teacher/student/<int:student_id>', methods=['GET', 'POST'])
 @login_required
 def teacher_edit_student(student_id):
     """Редактирование ученика"""
@@ -1430,9 +1703,9 @@ def teacher_edit_student(student_id):
     circle = student.circle
     
     # Проверяем права
-    if not current_user.is_admin() and circle.teacher_id != current_user.id:
+    if not current_user.can_access_circle(circle.id):
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     
     # Получаем группы из расписания
     groups = list(set(s.group_number for s in circle.schedules if s.group_number))
@@ -1448,8 +1721,9 @@ def teacher_edit_student(student_id):
         student.applicant_phone = request.form.get('applicant_phone', student.applicant_phone)
         
         db.session.commit()
+        get_dashboard_cache().invalidate()
         flash('Данные ученика обновлены', 'success')
-        return redirect(url_for('teacher_students', circle_id=circle.id))
+        return redirect(url_for('main.teacher_students', circle_id=circle.id))
     
     return render_template('teacher/edit_student.html',
                          student=student,
@@ -1457,16 +1731,16 @@ def teacher_edit_student(student_id):
                          groups=groups)
 
 
-@app.route('/teacher/student/add/<int:circle_id>', methods=['GET', 'POST'])
+@bp.route('/teacher/student/add/<int:circle_id>', methods=['GET', 'POST'])
 @login_required
 def teacher_add_student(circle_id):
     """Добавление нового ученика"""
     circle = Circle.query.get_or_404(circle_id)
     
     # Проверяем права
-    if not current_user.is_admin() and circle.teacher_id != current_user.id:
+    if not current_user.can_access_circle(circle.id):
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     
     # Получаем группы из расписания
     groups = list(set(s.group_number for s in circle.schedules if s.group_number))
@@ -1485,8 +1759,9 @@ def teacher_add_student(circle_id):
         )
         db.session.add(student)
         db.session.commit()
+        get_dashboard_cache().invalidate()
         flash('Ученик добавлен', 'success')
-        return redirect(url_for('teacher_students', circle_id=circle_id))
+        return redirect(url_for('main.teacher_students', circle_id=circle_id))
     
     return render_template('teacher/edit_student.html',
                          student=None,
@@ -1494,7 +1769,7 @@ def teacher_add_student(circle_id):
                          groups=groups)
 
 
-@app.route('/teacher/student/delete/<int:student_id>', methods=['POST'])
+@bp.route('/teacher/student/delete/<int:student_id>', methods=['POST'])
 @login_required
 def teacher_delete_student(student_id):
     """Удаление ученика"""
@@ -1502,64 +1777,87 @@ def teacher_delete_student(student_id):
     circle = student.circle
     
     # Проверяем права
-    if not current_user.is_admin() and circle.teacher_id != current_user.id:
+    if not current_user.can_access_circle(circle.id):
         flash('Доступ запрещен', 'error')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     
+    rollup_keys = rollup_keys_for_students([student.id])
     db.session.delete(student)
+    db.session.flush()
+    refresh_daily_rollup(rollup_keys)
     db.session.commit()
+    get_dashboard_cache().invalidate()
     flash('Ученик удален', 'success')
-    return redirect(url_for('teacher_students', circle_id=circle.id))
+    return redirect(url_for('main.teacher_students', circle_id=circle.id))
 
 
-@app.route('/teacher/change-password', methods=['GET', 'POST'])
+@bp.route('/teacher/change-password', methods=['GET', 'POST'])
 @login_required
 def teacher_change_password():
     """Смена пароля преподавателем"""
     if current_user.is_admin():
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     
     if request.method == 'POST':
         current_password = request.form.get('current_password', '')
         new_password = request.form.get('new_password', '')
         confirm_password = request.form.get('confirm_password', '')
         
+        # current_user - Identity без пароля, поэтому берем запись из БД
+        user = db.session.get(User, current_user.id)
+        
         # Проверяем текущий пароль
-        if not check_password_hash(current_user.password, current_password):
+        try:
+            valid = get_password_hasher().verify(user.password, current_password)
+        except HasherBusy:
+            flash('Сервер занят, попробуйте через несколько секунд', 'error')
+            return redirect(url_for('main.teacher_change_password'))
+        if not valid:
             flash('Неверный текущий пароль', 'error')
-            return redirect(url_for('teacher_change_password'))
+            return redirect(url_for('main.teacher_change_password'))
         
         # Проверяем совпадение паролей
         if new_password != confirm_password:
             flash('Пароли не совпадают', 'error')
-            return redirect(url_for('teacher_change_password'))
+            return redirect(url_for('main.teacher_change_password'))
         
         # Проверяем длину
         if len(new_password) < 4:
             flash('Пароль должен быть минимум 4 символа', 'error')
-            return redirect(url_for('teacher_change_password'))
+            return redirect(url_for('main.teacher_change_password'))
         
         # Меняем пароль
-        current_user.password = generate_password_hash(new_password)
-        current_user.plain_password = new_password  # Сохраняем для админа
+        try:
+            user.password = get_password_hasher().hash(new_password)
+        except HasherBusy:
+            flash('Сервер занят, попробуйте через несколько секунд', 'error')
+            return redirect(url_for('main.teacher_change_password'))
+        user.plain_password = new_password  # Сохраняем для админа
         db.session.commit()
+        get_identity_cache().discard(user.id)
         
         flash('Пароль успешно изменен', 'success')
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     
     return render_template('teacher/change_password.html')
 
 
 # ===== СОЗДАНИЕ БД =====
 
-def init_db():
+def init_db(app):
     """Инициализация БД"""
     with app.app_context():
         db.create_all()
+        create_missing_columns()
+        create_missing_indexes()
+        create_search_index()
+        install_change_tracking()
+        db.session.commit()
         print("База данных создана!")
 
 
 if __name__ == '__main__':
-    init_db()
+    app = create_app()
+    init_db(app)
     app.run(debug=True, host='0.0.0.0', port=5004)
 
@@ -1,25 +1,53 @@
 """
-Production версия приложения
+Production версия приложения (WSGI точка входа)
+
+Запуск: gunicorn -c gunicorn.conf.py app_production:app
+или просто: python app_production.py
+Плавный перезапуск после обновления кода: kill -HUP <pid мастера>
 """
-from app import app
+import os
+import sys
+
+os.environ.setdefault('APP_CONFIG', 'config_production')
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db
+
+# Приложение создается здесь, а не при импорте app: модуль app_production загружают
+# только рабочие процессы gunicorn
+app = create_app()
+
+
+def warm_up():
+    """Прогрев процесса до приема запросов: соединение с БД, шаблоны, шрифты PDF"""
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+        db.session.remove()
+
+    # Компилируем шаблоны заранее, чтобы первые запросы не ждали Jinja
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+    from pdf_export import get_fonts, get_styles
+    get_fonts()
+    get_styles()
+
 
 if __name__ == '__main__':
-    # Production настройки
-    app.config['DEBUG'] = False
-    
-    # Запуск с логированием
+    import config_production
+
     print("="*70)
     print("  СИСТЕМА УЧЕТА ПОСЕЩАЕМОСТИ - PRODUCTION MODE")
     print("="*70)
-    print(f"Host: 0.0.0.0")
-    print(f"Port: 5004")
-    print(f"Public URL: http://85.92.110.85:5004")
+    print(f"Host: {config_production.HOST}")
+    print(f"Port: {config_production.PORT}")
+    print(f"Workers: {config_production.WEB_WORKERS} x {config_production.WEB_THREADS} threads")
     print("="*70)
-    
-    app.run(
-        debug=False,
-        host='0.0.0.0',
-        port=5004,
-        threaded=True
-    )
 
+    # Передаем управление gunicorn (мастер-процесс + рабочие процессы)
+    gunicorn_conf = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    os.execvp(sys.executable, [
+        sys.executable, '-m', 'gunicorn', '-c', gunicorn_conf, 'app_production:app'
+    ])
@@ -0,0 +1,120 @@
+"""
+Сетка посещаемости кружка (ученики × даты занятий) в компактном колоночном виде
+Страница кружка получает ее в JSON и строит таблицу в браузере;
+журналы и PDF получают готовые строки с итогами (все по AttendanceMatrix)
+"""
+from datetime import timedelta
+
+from attendance_matrix import DATES_AXIS, STATUSES, AttendanceMatrix
+from models import db, Schedule
+from schedule_grid import DAY_NUMBERS, month_bounds
+
+
+def schedule_weekdays(circle_id):
+    """Номера дней недели (date.weekday()), в которые у кружка есть занятия"""
+    rows = db.session.query(Schedule.day_of_week).filter(Schedule.circle_id == circle_id)
+    return {DAY_NUMBERS[day] for (day,) in rows if day in DAY_NUMBERS}
+
+
+def grid_period(view_mode, selected_date):
+    """Диапазон дат режима и начала соседних периодов: (first, last, prev, next)"""
+    if view_mode == 'month':
+        first_day, last_day = month_bounds(selected_date.year, selected_date.month)
+        prev_day = (first_day - timedelta(days=1)).replace(day=1)
+        next_day = last_day + timedelta(days=1)
+        return first_day, last_day, prev_day, next_day
+    if view_mode == 'week':
+        week_start = selected_date - timedelta(days=selected_date.weekday())
+        return week_start, week_start + timedelta(days=6), week_start - timedelta(days=7), week_start + timedelta(days=7)
+    return selected_date, selected_date, selected_date - timedelta(days=1), selected_date + timedelta(days=1)
+
+
+def build_attendance_grid(circle_id, dates, group=None):
+    """Сетка кружка за даты занятий.
+
+    students - колонки id/name/grade, dates - ISO даты, cells - строка кодов
+    статусов на ученика (cells[i][j] - ученик i, дата j, коды из statuses),
+    notes - только непустые примечания: [i, j, текст].
+    """
+    matrix = AttendanceMatrix.load(circle_id, dates, group, with_notes=True)
+    students = matrix.students
+    return {
+        'circle_id': circle_id,
+        'group': group or None,
+        'students': {
+            'id': [s.id for s in students],
+            'name': [s.full_name for s in students],
+            'grade': [s.grade or '' for s in students],
+        },
+        'dates': [day.isoformat() for day in dates],
+        'statuses': STATUSES,
+        'cells': matrix.rows_text(),
+        'notes': [list(note) for note in matrix.notes],
+    }
+
+
+def build_day_rows(circle_id, day, group=None):
+    """Ученики и их отметки за один день (режим «День» страницы кружка)"""
+    matrix = AttendanceMatrix.load(circle_id, [day], group, with_notes=True)
+    notes = {i: note for i, _, note in matrix.notes}
+    return [
+        {
+            'id': student.id,
+            'full_name': student.full_name,
+            'grade': student.grade,
+            'status': STATUSES[code],
+            'note': notes.get(i, ''),
+        }
+        for i, (student, code) in enumerate(zip(matrix.students, matrix.codes[:, 0].tolist()))
+    ]
+
+
+# ===== ЖУРНАЛ (журнал администратора, история, PDF) =====
+
+WEEKDAYS_SHORT = ['Пон', 'Вто', 'Сре', 'Чет', 'Пят', 'Суб', 'Вос']
+
+# С какой серии пропусков подряд журнал выделяет ученика
+ABSENCE_STREAK_ALERT = 3
+
+
+def attendance_level(percent):
+    """Цвет процента посещаемости"""
+    return 'success' if percent >= 80 else 'warning' if percent >= 60 else 'danger'
+
+
+def build_journal_grid(matrix, today=None):
+    """Журнал для шаблона _journal.html и PDF: заголовки дат и готовые строки учеников.
+
+    В строке: cells - коды статусов по датам (STATUSES), present/total,
+    percent и level (цвет процента) - None, если отметок нет, absent_streak -
+    текущая серия пропусков, если она не короче ABSENCE_STREAK_ALERT.
+    В колонке: present - сколько учеников присутствовало.
+    """
+    present = matrix.present().tolist()
+    total = matrix.marked().tolist()
+    percent = matrix.rates().tolist()
+    streaks, _ = matrix.absence_streaks()
+    present_by_date = matrix.present(DATES_AXIS).tolist()
+
+    rows = [
+        {
+            'name': student.full_name,
+            'grade': student.grade,
+            'cells': cells,
+            'present': present[i],
+            'total': total[i],
+            'percent': percent[i] if total[i] else None,
+            'level': attendance_level(percent[i]) if total[i] else None,
+            'absent_streak': streak if streak >= ABSENCE_STREAK_ALERT else None,
+        }
+        for i, (student, cells, streak) in enumerate(zip(matrix.students, matrix.codes.tolist(), streaks.tolist()))
+    ]
+    return {
+        'columns': [
+            {'day': day.day, 'weekday': WEEKDAYS_SHORT[day.weekday()], 'today': day == today,
+             'present': present_by_date[j]}
+            for j, day in enumerate(matrix.dates)
+        ],
+        'today_column': matrix.date_index.get(today),
+        'rows': rows,
+    }
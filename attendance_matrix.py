@@ -0,0 +1,129 @@
+"""
+Матрица посещаемости кружка (ученики × даты) на массиве NumPy int8
+Общая основа журнала, истории, страницы кружка и PDF: итоги, проценты
+и серии пропусков считаются по всей матрице сразу, без объектов ORM
+"""
+from models import db, Student, Attendance
+
+# Код статуса в матрице: 0 - нет отметки
+STATUSES = ['', 'present', 'absent', 'excused']
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES) if status}
+PRESENT = STATUS_CODES['present']
+ABSENT = STATUS_CODES['absent']
+
+# Ученики по строкам: итоги на ученика; даты по колонкам: итоги на дату
+STUDENTS_AXIS = 1
+DATES_AXIS = 0
+
+
+class AttendanceMatrix:
+    """Статусы отметок кружка за даты.
+
+    students - строки с id, full_name, grade (порядок строк матрицы),
+    dates - даты колонок, marks - (student_id, date, status[, note]); отметки
+    учеников и дат вне списков пропускаются. codes[i, j] - код статуса
+    ученика i на дату j, student_index/date_index - номера строк и колонок.
+    """
+
+    def __init__(self, students, dates, marks=(), with_notes=False):
+        # numpy загружается при первом журнале, а не при импорте приложения
+        import numpy as np
+
+        self.students = list(students)
+        self.dates = list(dates)
+        self.student_index = {student.id: i for i, student in enumerate(self.students)}
+        self.date_index = {day: j for j, day in enumerate(self.dates)}
+        # Примечания (только непустые, если в marks есть четвертая колонка note): [(i, j, текст)]
+        self.notes = []
+
+        # Отметки раскладываются в плоский буфер одним проходом, массив - представление над ним
+        width = len(self.dates)
+        cells = bytearray(len(self.students) * width)
+        for mark in marks:
+            i = self.student_index.get(mark[0])
+            j = self.date_index.get(mark[1])
+            if i is None or j is None:
+                continue
+            cells[i * width + j] = STATUS_CODES.get(mark[2], 0)
+            if with_notes and mark[3]:
+                self.notes.append((i, j, mark[3]))
+        self.codes = np.frombuffer(cells, dtype=np.int8).reshape(len(self.students), width)
+
+    @classmethod
+    def load(cls, circle_id, dates, group=None, with_notes=False):
+        """Матрица кружка: ученики по ФИО (группы group, если указана) и отметки за даты.
+
+        Загружаются только нужные колонки, без объектов ORM.
+        """
+        students = cls.students_query(circle_id, group).all()
+        marks = cls.marks_query(circle_id, dates, with_notes).all() if students and dates else []
+        return cls(students, dates, marks, with_notes)
+
+    @staticmethod
+    def students_query(circle_id, group=None):
+        """Строки матрицы: ученики кружка (группы) по ФИО"""
+        query = db.session.query(Student.id, Student.full_name, Student.grade).filter(
+            Student.circle_id == circle_id
+        )
+        if group:
+            query = query.filter(Student.group_number == group)
+        return query.order_by(Student.full_name)
+
+    @staticmethod
+    def marks_query(circle_id, dates, with_notes=False):
+        """Отметки кружка с первой по последнюю дату"""
+        columns = [Attendance.student_id, Attendance.date, Attendance.status]
+        if with_notes:
+            columns.append(Attendance.note)
+        return db.session.query(*columns).filter(
+            Attendance.circle_id == circle_id,
+            Attendance.date >= min(dates),
+            Attendance.date <= max(dates)
+        )
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def count(self, code, axis=STUDENTS_AXIS):
+        """Число отметок с кодом code на ученика (axis=STUDENTS_AXIS) или на дату (DATES_AXIS)"""
+        return (self.codes == code).sum(axis=axis)
+
+    def marked(self, axis=STUDENTS_AXIS):
+        """Число отметок любого статуса"""
+        return (self.codes != 0).sum(axis=axis)
+
+    def present(self, axis=STUDENTS_AXIS):
+        return self.count(PRESENT, axis)
+
+    def rates(self, axis=STUDENTS_AXIS):
+        """Процент присутствия от числа отметок, округленный до 0.1; NaN, если отметок нет"""
+        import numpy as np
+
+        marked = self.marked(axis)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = self.present(axis) * 100.0 / marked
+        return np.round(np.where(marked > 0, rates, np.nan), 1)
+
+    def absence_streaks(self):
+        """Серии пропусков на ученика: (текущая, самая длинная).
+
+        Дни без отметки серию не прерывают; текущая - серия на последнюю дату.
+        """
+        import numpy as np
+
+        current = np.zeros(len(self.students), dtype=np.int32)
+        longest = np.zeros(len(self.students), dtype=np.int32)
+        for column in self.codes.T:
+            current = np.where(column == ABSENT, current + 1, np.where(column == 0, current, 0))
+            np.maximum(longest, current, out=longest)
+        return current, longest
+
+    def rows_text(self):
+        """Строка цифр кодов на ученика: '0121...' (для JSON сетки)"""
+        digits = self.codes.astype('uint8') + ord('0')
+        return [row.tobytes().decode('ascii') for row in digits]
+
+    def fingerprint(self):
+        """Отметки в виде байтов для версии экспорта"""
+        return self.codes.tobytes()
@@ -0,0 +1,76 @@
+"""
+Поддержка сводной таблицы посещаемости attendance_daily
+Сводка пересчитывается в той же транзакции, что и изменение отметок
+"""
+from collections import defaultdict
+
+from sqlalchemy import select, insert, delete, func, case
+
+from models import db, Attendance, AttendanceDaily
+
+
+def _daily_counts():
+    """SELECT (circle_id, date, present, absent, excused) по таблице посещений"""
+    return select(
+        Attendance.circle_id,
+        Attendance.date,
+        func.sum(case((Attendance.status == 'present', 1), else_=0)),
+        func.sum(case((Attendance.status == 'absent', 1), else_=0)),
+        func.sum(case((Attendance.status == 'excused', 1), else_=0)),
+    ).group_by(Attendance.circle_id, Attendance.date)
+
+
+ROLLUP_COLUMNS = ['circle_id', 'date', 'present', 'absent', 'excused']
+
+
+def refresh_daily_rollup(keys):
+    """Пересчитывает строки сводки для набора пар (circle_id, date).
+    
+    Коммит выполняет вызывающий код.
+    """
+    dates_by_circle = defaultdict(set)
+    for circle_id, day in keys:
+        dates_by_circle[circle_id].add(day)
+    
+    for circle_id, dates in dates_by_circle.items():
+        dates = list(dates)
+        db.session.execute(delete(AttendanceDaily).where(
+            AttendanceDaily.circle_id == circle_id,
+            AttendanceDaily.date.in_(dates)
+        ))
+        db.session.execute(insert(AttendanceDaily).from_select(
+            ROLLUP_COLUMNS,
+            _daily_counts().where(
+                Attendance.circle_id == circle_id,
+                Attendance.date.in_(dates)
+            )
+        ))
+
+
+def rollup_keys_for(student_ids, dates):
+    """Пары (circle_id, date), затронутые отметками указанных учеников за указанные даты"""
+    if not student_ids or not dates:
+        return set()
+    rows = db.session.execute(select(Attendance.circle_id, Attendance.date).where(
+        Attendance.student_id.in_(list(student_ids)),
+        Attendance.date.in_(list(dates))
+    ).distinct())
+    return {tuple(row) for row in rows}
+
+
+def rollup_keys_for_students(student_ids):
+    """Пары (circle_id, date), в которых есть отметки указанных учеников"""
+    if not student_ids:
+        return set()
+    rows = db.session.execute(select(Attendance.circle_id, Attendance.date).where(
+        Attendance.student_id.in_(list(student_ids))
+    ).distinct())
+    return {tuple(row) for row in rows}
+
+
+def rebuild_daily_rollup():
+    """Полностью перестраивает сводку по таблице посещений. Возвращает число строк сводки."""
+    db.session.execute(delete(AttendanceDaily))
+    db.session.execute(insert(AttendanceDaily).from_select(ROLLUP_COLUMNS, _daily_counts()))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(AttendanceDaily).scalar()
@@ -0,0 +1,128 @@
+"""
+Бенчмарк аналитики посещаемости на синтетической БД с миллионами отметок
+Время построения снимка, отчета страницы аналитики по снимку (первый отчет после
+открытия mmap и повторный) и тех же итогов запросами GROUP BY к SQLite
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+STUDENTS = 20000
+CIRCLES = 200
+LESSON_DAYS = 100  # дней занятий за учебный год
+FIRST_DAY = date(2025, 9, 1)
+REPEATS = 5
+
+# Итоги отчета запросами к рабочей БД (для сравнения)
+SQL_REPORTS = {
+    'ученики': """
+        SELECT student_id, COUNT(*), SUM(status = 'absent') FROM attendances
+        WHERE date BETWEEN :first AND :last GROUP BY student_id""",
+    'школы': """
+        SELECT s.school, COUNT(*), SUM(a.status = 'present'), COUNT(DISTINCT a.student_id)
+        FROM attendances a JOIN students s ON s.id = a.student_id
+        WHERE a.date BETWEEN :first AND :last GROUP BY s.school""",
+    'классы': """
+        SELECT s.grade, COUNT(*), SUM(a.status = 'present'), COUNT(DISTINCT a.student_id)
+        FROM attendances a JOIN students s ON s.id = a.student_id
+        WHERE a.date BETWEEN :first AND :last GROUP BY s.grade""",
+    'направления': """
+        SELECT c.direction, strftime('%Y-%m', a.date), COUNT(*), SUM(a.status = 'present')
+        FROM attendances a JOIN circles c ON c.id = a.circle_id
+        WHERE a.date BETWEEN :first AND :last GROUP BY 1, 2""",
+}
+
+
+def fill_database(app):
+    """Кружки, ученики и отметки в несколько занятий в неделю (около 80% присутствий)"""
+    from models import db, Circle
+
+    rnd = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Circle(name=f'Кружок {i}', direction=f'Направление {i % 12}') for i in range(CIRCLES)
+        ])
+        db.session.commit()
+
+        raw = db.engine.raw_connection()
+        cursor = raw.cursor()
+        cursor.executemany(
+            'INSERT INTO students (full_name, school, grade, gender, circle_id) VALUES (?, ?, ?, ?, ?)',
+            [(f'Ученик {i}', f'СШ {i % 60}', f'{i % 11 + 1}{"АБВ"[i % 3]}', ['мужской', 'женский'][i % 2],
+              i % CIRCLES + 1) for i in range(STUDENTS)]
+        )
+        days = [(FIRST_DAY + timedelta(days=k * 2)).isoformat() for k in range(LESSON_DAYS)]
+        statuses = ['present'] * 8 + ['absent', 'excused']
+        cursor.executemany(
+            'INSERT INTO attendances (student_id, circle_id, date, status) VALUES (?, ?, ?, ?)',
+            ((student, (student - 1) % CIRCLES + 1, day, rnd.choice(statuses))
+             for student in range(1, STUDENTS + 1) for day in days)
+        )
+        raw.commit()
+        raw.close()
+    return STUDENTS * LESSON_DAYS
+
+
+def median_ms(func):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix='bench_analytics_')
+    os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    os.environ['ANALYTICS_DIR'] = os.path.join(directory, 'analytics')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        from app import create_app
+        from analytics import Snapshot, build_snapshot
+        from models import db
+
+        app = create_app()
+        started = time.perf_counter()
+        marks = fill_database(app)
+        print(f"БД: {marks} отметок, {STUDENTS} учеников, {CIRCLES} кружков "
+              f"(заполнение {time.perf_counter() - started:.0f} с)")
+
+        with app.app_context():
+            started = time.perf_counter()
+            path = build_snapshot(app.config['ANALYTICS_DIR'])
+            build_s = time.perf_counter() - started
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            print(f"Снимок: {build_s:.1f} с, {size / 1024 / 1024:.1f} МБ")
+
+            first_day, last_day = FIRST_DAY, FIRST_DAY + timedelta(days=2 * LESSON_DAYS)
+            started = time.perf_counter()
+            Snapshot(path).report(first_day, last_day)
+            cold_ms = (time.perf_counter() - started) * 1000
+            snapshot = Snapshot(path)
+            warm_ms = median_ms(lambda: snapshot.report(first_day, last_day))
+            month_ms = median_ms(lambda: snapshot.report(date(2025, 10, 1), date(2025, 10, 31)))
+            print(f"\nОтчет по снимку (учебный год): первый {cold_ms:.0f} мс, повторный {warm_ms:.0f} мс")
+            print(f"Отчет по снимку (месяц): {month_ms:.0f} мс")
+
+            params = {'first': first_day.isoformat(), 'last': last_day.isoformat()}
+            print("\nТе же итоги запросами к SQLite (учебный год):")
+            sql_total = 0
+            for title, query in SQL_REPORTS.items():
+                started = time.perf_counter()
+                db.session.execute(db.text(query), params).all()
+                elapsed = (time.perf_counter() - started) * 1000
+                sql_total += elapsed
+                print(f"  {title:<12} {elapsed:>8.0f} мс")
+            print(f"  {'всего':<12} {sql_total:>8.0f} мс (без оттока кружков и списка пропускающих)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Бенчмарк поиска кружка по названию при импорте учеников
+Индекс CircleIndex (один раз на импорт) против прежнего перебора всех кружков
+на каждую строку файла (без учета запросов к БД, которые перебор делал на строку)
+"""
+import random
+import time
+from collections import namedtuple
+
+from import_students import CircleIndex, normalize_circle_name
+
+CircleRow = namedtuple('CircleRow', 'id name')
+
+CIRCLES = 300
+APPLICATIONS = 5000
+WORDS = ['Робототехника', 'Шахматы', 'Программирование', 'Ағылшын тілі', '3D-моделирование',
+         'Вокал', 'Дизайн', 'Физика', 'Химия', 'Домбыра', 'Медиа', 'Журналистика']
+
+
+def make_names(rnd):
+    """Кружки и названия из заявок: точные, с лишними пробелами, другим регистром, опечатками"""
+    circles = [CircleRow(i, f'{WORDS[i % len(WORDS)]} {i // len(WORDS) + 1} группа "{chr(0x410 + i % 20)}"')
+               for i in range(1, CIRCLES + 1)]
+    names = []
+    for _ in range(APPLICATIONS):
+        name = rnd.choice(circles).name
+        variant = rnd.random()
+        if variant < 0.2:
+            name = '  ' + name.replace(' ', '   ') + ' '
+        elif variant < 0.3:
+            name = name.upper()
+        elif variant < 0.4:
+            position = rnd.randrange(len(name) - 1)
+            name = name[:position] + name[position + 1:]
+        elif variant < 0.45:
+            name = f'Неизвестный кружок {rnd.randrange(50)}'
+        names.append(name)
+    return circles, names
+
+
+def scan_find(circles, circle_name):
+    """Прежний поиск: нормализация всех названий и перебор на каждую строку"""
+    normalized_search = normalize_circle_name(circle_name)
+    for c in circles:
+        if c.name == circle_name or normalize_circle_name(c.name) == normalized_search:
+            return c
+    matching = [c for c in circles
+                if normalized_search in normalize_circle_name(c.name)
+                or normalize_circle_name(c.name) in normalized_search]
+    return min(matching, key=lambda c: len(normalize_circle_name(c.name))) if matching else None
+
+
+def main():
+    rnd = random.Random(42)
+    circles, names = make_names(rnd)
+
+    started = time.perf_counter()
+    found_scan = sum(1 for name in names if scan_find(circles, name))
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    index = CircleIndex(circles)
+    build_ms = (time.perf_counter() - started) * 1000
+    found_index = sum(1 for name in names if index.find(name))
+    index_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{APPLICATIONS} заявок, {CIRCLES} кружков")
+    print(f"  перебор:  {scan_ms:>8.0f} мс, найдено {found_scan}")
+    print(f"  индекс:   {index_ms:>8.0f} мс (построение {build_ms:.1f} мс), найдено {found_index}, "
+          f"неточно {len(index.inexact_matches())} разных названий")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Бенчмарк импорта расписания и учеников из Excel на синтетических файлах
+Время import_schedule и import_students (первый импорт и повторный, где все
+ученики уже есть, а часть сменила кружок) на временной БД
+"""
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+TEACHERS = 150
+CIRCLES = 300
+SCHEDULE_ROWS = 900
+APPLICATIONS = 5000
+DAYS = ['Дүйсенбі', 'Сейсенбі', 'Сәрсенбі', 'Бейсенбі', 'Жұма', 'Сенбі']
+
+
+def write_files(directory, rnd):
+    """Файлы расписания и заявок в формате, который ожидают импортеры"""
+    import pandas as pd
+
+    teachers = [(f'Преподаватель {i} Серикович', f'8701{i:07d}') for i in range(TEACHERS)]
+    circles = [(f'Кружок {i}', teachers[i % TEACHERS]) for i in range(CIRCLES)]
+    schedule = pd.DataFrame([
+        {
+            'Название кружка': name,
+            'Имя преподавателя': teacher,
+            'Телефон преподавателя': phone,
+            'День недели': DAYS[k % len(DAYS)],
+            'Группа': str(k % 3 + 1),
+            'Время занятий': '14:00-15:30',
+            'Кабинет': str(100 + k % 40),
+            'Этаж': str(k % 3 + 1),
+        }
+        for k, (name, (teacher, phone)) in enumerate(circles[i % CIRCLES] for i in range(SCHEDULE_ROWS))
+    ])
+    schedule_path = os.path.join(directory, 'schedule.xlsx')
+    schedule.to_excel(schedule_path, index=False)
+
+    def applications(moved):
+        rows = []
+        for i in range(APPLICATIONS):
+            circle = circles[(i + (1 if i < moved else 0)) % CIRCLES][0]
+            rows.append({
+                'ФИО': f'Ученик {i}', 'ИИН': f'{100000000000 + i}', 'ПОЛ': 'мужской', 'АДРЕС': 'Алматы',
+                'С КАКОЙ ШКОЛЫ': f'СШ {i % 60}', 'В КАКОМ КЛАССЕ ОБУЧАЕТСЯ': str(i % 11 + 1),
+                'ПО КАКОМУ НАПРАВЛЕНИЮ': 'Техника', 'Кружок (по расписанию)': circle,
+                'ФИО заявителя': f'Родитель {i}', 'ИИН заявителя': f'{800000000000 + i}',
+                'Логин': f'parent{i}', 'ТЕЛЕФОН заявителя': f'+7 701 {i:07d}', 'Дата подачи': '2025-08-20',
+            })
+        return pd.DataFrame(rows)
+
+    students_path = os.path.join(directory, 'students.xlsx')
+    applications(0).to_excel(students_path, index=False)
+    moved_path = os.path.join(directory, 'students_moved.xlsx')
+    applications(APPLICATIONS // 10).to_excel(moved_path, index=False)
+    return schedule_path, students_path, moved_path
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix='bench_import_')
+    os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    # Хэширование паролей не относится к записи в БД и измеряется benchmark_login.py
+    os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    try:
+        schedule_path, students_path, moved_path = write_files(directory, random.Random(42))
+
+        from app import create_app
+        from models import db, Student
+        from import_schedule import import_schedule
+        from import_students import import_students
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+
+        print(f"Расписание: {SCHEDULE_ROWS} строк, {CIRCLES} кружков, {TEACHERS} преподавателей: "
+              f"{timed(import_schedule, app, schedule_path):.1f} с")
+        print(f"Ученики, первый импорт ({APPLICATIONS} заявок): {timed(import_students, app, students_path):.1f} с")
+        print(f"Ученики, повторный импорт ({APPLICATIONS // 10} сменили кружок): "
+              f"{timed(import_students, app, moved_path):.1f} с")
+        with app.app_context():
+            print(f"Учеников в БД: {Student.query.count()}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Бенчмарк журнала посещаемости (страница админа, история преподавателя)
+Время подготовки сетки (матрица и итоги), вывода таблицы и компиляции шаблонов
+без кэша байткода Jinja и с ним (как у нового воркера gunicorn)
+"""
+import random
+import tempfile
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+from jinja2 import Environment, FileSystemBytecodeCache
+
+from app import create_app
+from attendance_grid import build_journal_grid
+from attendance_matrix import AttendanceMatrix
+
+StudentRow = namedtuple('StudentRow', 'id full_name grade')
+MarkRow = namedtuple('MarkRow', 'student_id date status')
+
+# (учеников, занятий в месяце)
+SIZES = [(40, 13), (200, 26)]
+REPEATS = 10
+TEMPLATES = ['_journal.html', 'admin/attendance.html', 'teacher/attendance_history.html', 'base.html']
+
+app = create_app()
+
+
+def make_journal(students_count, lessons_count):
+    """Синтетический журнал: ученики, даты занятий и отметки (около 80% ячеек)"""
+    students = [
+        StudentRow(i, f'Ученикова Айгерим Серикқызы {i}', f'{i % 11 + 1}')
+        for i in range(1, students_count + 1)
+    ]
+    first_day = date(2025, 9, 1)
+    dates = [first_day + timedelta(days=i) for i in range(lessons_count)]
+    marks = [
+        MarkRow(s.id, d, random.choice(['present', 'present', 'present', 'absent', 'excused']))
+        for s in students for d in dates if random.random() < 0.8
+    ]
+    return students, dates, marks
+
+
+def average_ms(func, repeats=REPEATS):
+    func()  # первый вызов загружает numpy
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - started) / repeats * 1000, result
+
+
+def compile_ms(bytecode_cache):
+    """Компиляция шаблонов журнала новым окружением Jinja"""
+    env = Environment(loader=app.jinja_loader, bytecode_cache=bytecode_cache)
+    started = time.perf_counter()
+    for name in TEMPLATES:
+        env.get_template(name)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    random.seed(42)
+    journal_table = app.jinja_env.get_template('_journal.html').module.journal_table
+
+    print(f"{'Размер':>12} {'Сетка, мс':>10} {'Таблица, мс':>12} {'HTML, КБ':>9}")
+    for students_count, lessons_count in SIZES:
+        students, dates, marks = make_journal(students_count, lessons_count)
+        grid_ms, grid = average_ms(lambda: build_journal_grid(AttendanceMatrix(students, dates, marks), today=dates[0]))
+        render_ms, html = average_ms(lambda: str(journal_table(grid)))
+        print(f"{students_count:>5} × {lessons_count:<4} {grid_ms:>10.1f} {render_ms:>12.1f} "
+              f"{len(html.encode()) / 1024:>9.0f}")
+
+    with tempfile.TemporaryDirectory(prefix='bench_jinja_') as directory:
+        cold = compile_ms(None)
+        compile_ms(FileSystemBytecodeCache(directory))  # заполняет кэш
+        cached = compile_ms(FileSystemBytecodeCache(directory))
+    print(f"\nКомпиляция шаблонов журнала: без кэша {cold:.1f} мс, из кэша байткода {cached:.1f} мс")
+
+
+if __name__ == '__main__':
+    main()
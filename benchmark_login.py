@@ -0,0 +1,119 @@
+"""
+Бенчмарк всплеска входов (утро, все преподаватели входят одновременно)
+Пока LOGINS потоков входят в систему, MARKERS потоков отмечают посещаемость;
+сравниваются задержки отметок без ограничения пула проверки паролей
+и с ограничением PASSWORD_HASH_WORKERS по умолчанию
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+LOGINS = 50
+MARKERS = 4
+STUDENTS = 30
+
+
+def run_mode(hash_workers):
+    """Прогон в отдельном процессе: приложение читает настройки из окружения при создании"""
+    if hash_workers:
+        os.environ['PASSWORD_HASH_WORKERS'] = str(hash_workers)
+    from app import create_app
+    from models import db, User, Circle, Student
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        password = app.extensions['password_hasher'].hash('bench')  # один хэш на всех, чтобы не ждать подготовку
+        teachers = [User(username=f'bench{i}', password=password, full_name=f'Bench {i}', role='teacher')
+                    for i in range(LOGINS + 1)]
+        db.session.add_all(teachers)
+        db.session.flush()
+        circle = Circle(name='Бенчмарк', teacher_id=teachers[-1].id)
+        db.session.add(circle)
+        db.session.flush()
+        db.session.add_all([Student(full_name=f'Ученик {i}', circle_id=circle.id) for i in range(STUDENTS)])
+        db.session.commit()
+        circle_id = circle.id
+        student_ids = [s.id for s in Student.query.filter_by(circle_id=circle.id)]
+
+    markers = []
+    for _ in range(MARKERS):
+        client = app.test_client()
+        client.post('/login', data={'username': f'bench{LOGINS}', 'password': 'bench'})
+        markers.append(client)
+
+    login_latencies, mark_latencies = [], []
+    lock = threading.Lock()
+    done = threading.Event()
+    start = threading.Barrier(LOGINS + MARKERS)
+
+    def login(i):
+        start.wait()
+        started = time.perf_counter()
+        app.test_client().post('/login', data={'username': f'bench{i}', 'password': 'bench'})
+        with lock:
+            login_latencies.append(time.perf_counter() - started)
+
+    def mark(client, no):
+        start.wait()
+        n = 0
+        while not done.is_set():
+            n += 1
+            payload = {
+                'circle_id': circle_id, 'student_id': student_ids[(no * 7 + n) % len(student_ids)],
+                'date': (date(2025, 9, 1) + timedelta(days=n % 28)).isoformat(), 'status': 'present',
+            }
+            started = time.perf_counter()
+            client.post('/teacher/mark-attendance', json=payload)
+            with lock:
+                mark_latencies.append(time.perf_counter() - started)
+
+    login_threads = [threading.Thread(target=login, args=(i,)) for i in range(LOGINS)]
+    mark_threads = [threading.Thread(target=mark, args=(c, i)) for i, c in enumerate(markers)]
+    began = time.perf_counter()
+    for t in login_threads + mark_threads:
+        t.start()
+    for t in login_threads:
+        t.join()
+    burst = time.perf_counter() - began
+    done.set()
+    for t in mark_threads:
+        t.join()
+    return {
+        'workers': app.config['PASSWORD_HASH_WORKERS'], 'burst': burst,
+        'login': login_latencies, 'mark': mark_latencies, 'stats': app.extensions['password_hasher'].stats(),
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0
+
+
+def main():
+    print(f"{LOGINS} входов одновременно, {MARKERS} потока отмечают посещаемость\n")
+    print(f"{'Пул проверки':<20} {'Всплеск, с':>10} {'вход p50':>9} {'вход p99':>9} "
+          f"{'отметка p50':>12} {'отметка p99':>12} {'очередь p99':>12}")
+    ctx = multiprocessing.get_context('spawn')
+    for title, workers in (('без ограничения', LOGINS), ('по умолчанию', None)):
+        directory = tempfile.mkdtemp(prefix='bench_login_')
+        os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+        try:
+            with ctx.Pool(1) as pool:
+                result = pool.apply(run_mode, (workers,))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        ms = lambda values, p: percentile(values, p) * 1000
+        print(f"{title + ' (' + str(result['workers']) + ')':<20} {result['burst']:>10.2f} "
+              f"{ms(result['login'], 0.5):>9.0f} {ms(result['login'], 0.99):>9.0f} "
+              f"{ms(result['mark'], 0.5):>12.1f} {ms(result['mark'], 0.99):>12.1f} "
+              f"{result['stats']['wait_ms']['p99']:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Бенчмарк конкурентных отметок посещаемости
+Несколько процессов (как рабочие процессы gunicorn) с потоками одновременно
+отправляют POST /teacher/mark-attendance; сравниваются настройки SQLite по
+умолчанию и PRAGMA из sqlite_tuning (WAL, busy_timeout и т.д.)
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+PROCESSES = 4
+THREADS = 4
+DURATION = 5  # секунд на режим
+STUDENTS = 60
+
+
+def setup_database():
+    """Создает БД с преподавателем, кружком и учениками"""
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from models import db, User, Circle, Student
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+        teacher = User(username='bench', password=generate_password_hash('bench'),
+                       full_name='Bench', role='teacher')
+        db.session.add(teacher)
+        db.session.flush()
+        circle = Circle(name='Бенчмарк', teacher_id=teacher.id)
+        db.session.add(circle)
+        db.session.flush()
+        db.session.add_all([
+            Student(full_name=f'Ученик {i}', circle_id=circle.id) for i in range(STUDENTS)
+        ])
+        db.session.commit()
+        student_ids = [s.id for s in Student.query.filter_by(circle_id=circle.id)]
+        return circle.id, student_ids
+
+
+def worker(args):
+    """Процесс-клиент: THREADS потоков отправляют отметки в течение DURATION секунд"""
+    circle_id, student_ids, seed = args
+    from app import create_app
+    app = create_app()
+    app.config['PROPAGATE_EXCEPTIONS'] = True  # ошибки БД видны как исключения
+
+    results = {'ok': 0, 'locked': 0, 'errors': 0, 'latencies': []}
+    lock = threading.Lock()
+    ready = threading.Barrier(THREADS)
+    deadline = []
+
+    def run(thread_no):
+        rnd = random.Random(seed * 100 + thread_no)
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': 'bench'})
+        # Замер начинается после входа всех потоков (хэширование пароля не учитывается)
+        if ready.wait() == 0:
+            deadline.append(time.perf_counter() + DURATION)
+        ready.wait()
+        while time.perf_counter() < deadline[0]:
+            payload = {
+                'circle_id': circle_id,
+                'student_id': rnd.choice(student_ids),
+                'date': (date(2025, 9, 1) + timedelta(days=rnd.randrange(30))).isoformat(),
+                'status': rnd.choice(['present', 'absent', 'excused']),
+            }
+            started = time.perf_counter()
+            try:
+                response = client.post('/teacher/mark-attendance', json=payload)
+                outcome = 'ok' if response.status_code == 200 else 'errors'
+            except Exception as e:
+                outcome = 'locked' if 'locked' in str(e) else 'errors'
+            elapsed = time.perf_counter() - started
+            with lock:
+                results[outcome] += 1
+                results['latencies'].append(elapsed)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_mode(tuned):
+    """Прогон на новой БД; PRAGMA включаются переменной SQLITE_TUNING"""
+    directory = tempfile.mkdtemp(prefix='bench_marking_')
+    os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    os.environ['SQLITE_TUNING'] = '1' if tuned else '0'
+
+    # spawn: каждый процесс импортирует приложение заново с текущим окружением
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        with ctx.Pool(1) as pool:
+            circle_id, student_ids = pool.apply(setup_database)
+        with ctx.Pool(PROCESSES) as pool:
+            parts = pool.map(worker, [(circle_id, student_ids, i) for i in range(PROCESSES)])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    total = {'ok': 0, 'locked': 0, 'errors': 0, 'latencies': []}
+    for part in parts:
+        for key in total:
+            total[key] += part[key]
+    return total
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0
+
+
+def main():
+    print(f"{PROCESSES} процесса × {THREADS} потока, {DURATION} с на режим\n")
+    print(f"{'Режим':<14} {'Успешно':>8} {'Отметок/с':>10} {'locked':>7} {'Ошибки':>7} {'p50, мс':>8} {'p99, мс':>8}")
+    for title, tuned in (('по умолчанию', False), ('sqlite_tuning', True)):
+        result = run_mode(tuned)
+        latencies = result['latencies']
+        print(f"{title:<14} {result['ok']:>8} {result['ok'] / DURATION:>10.0f} {result['locked']:>7} "
+              f"{result['errors']:>7} {percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
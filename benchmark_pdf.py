@@ -0,0 +1,73 @@
+"""
+Бенчмарк построения PDF журнала посещаемости
+Время и пиковая память на один журнал для разных размеров (ученики × занятия)
+"""
+import random
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date, timedelta
+from io import BytesIO
+
+from attendance_grid import build_journal_grid
+from attendance_matrix import AttendanceMatrix
+from pdf_export import get_fonts, get_styles, render_attendance_journal
+
+StudentRow = namedtuple('StudentRow', 'id full_name grade')
+
+# (учеников, занятий в месяце)
+SIZES = [(10, 8), (40, 13), (100, 26)]
+REPEATS = 5
+
+
+def make_journal(students_count, lessons_count):
+    """Синтетический журнал: строки журнала по ученикам и датам занятий"""
+    students = [
+        StudentRow(i, f'Ученикова Айгерим Серикқызы {i}', f'{i % 11 + 1}')
+        for i in range(1, students_count + 1)
+    ]
+    first_day = date(2025, 9, 1)
+    dates_to_show = [first_day + timedelta(days=i * 2) for i in range(lessons_count)]
+    marks = [
+        (s.id, d, random.choice(['present', 'present', 'present', 'absent', 'excused']))
+        for s in students for d in dates_to_show
+    ]
+    return build_journal_grid(AttendanceMatrix(students, dates_to_show, marks))
+
+
+def measure(grid):
+    """Возвращает (среднее время в мс, пиковая память в КБ, размер PDF в КБ)"""
+    timings = []
+    size = 0
+    for _ in range(REPEATS):
+        out = BytesIO()
+        started = time.perf_counter()
+        render_attendance_journal(out, 'Робототехника', 'Сентябрь 2025', grid)
+        timings.append(time.perf_counter() - started)
+        size = out.tell()
+
+    out = BytesIO()
+    tracemalloc.start()
+    render_attendance_journal(out, 'Робототехника', 'Сентябрь 2025', grid)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return sum(timings) / len(timings) * 1000, peak / 1024, size / 1024
+
+
+def main():
+    random.seed(42)
+
+    started = time.perf_counter()
+    get_fonts()
+    get_styles()
+    print(f"Регистрация шрифтов и стилей (один раз на процесс): {(time.perf_counter() - started) * 1000:.1f} мс\n")
+
+    print(f"{'Размер':>12} {'Время, мс':>10} {'Пик памяти, КБ':>15} {'PDF, КБ':>8}")
+    for students_count, lessons_count in SIZES:
+        elapsed_ms, peak_kb, size_kb = measure(make_journal(students_count, lessons_count))
+        print(f"{students_count:>5} × {lessons_count:<4} {elapsed_ms:>10.1f} {peak_kb:>15.0f} {size_kb:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Экспорт журналов посещаемости всех кружков центра за месяц
+Данные загружаются общими запросами, PDF строятся в пуле процессов
+"""
+import multiprocessing
+import threading
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from attendance_grid import build_journal_grid
+from attendance_matrix import AttendanceMatrix
+from models import db, Circle, Student, Attendance, Schedule
+from schedule_grid import DAY_NUMBERS, month_bounds, lesson_dates
+from pdf_export import render_journal_bytes, render_journals_merged_bytes
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _start_method():
+    """forkserver, где он есть: fork из процесса с потоками gunicorn копирует чужие блокировки"""
+    return 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def get_pool(max_workers=1):
+    """Общий пул процессов для построения PDF (создается при первом экспорте).
+
+    Пул свой в каждом процессе gunicorn, поэтому max_workers (EXPORT_WORKERS)
+    ограничивает число процессов экспорта на один процесс сервера.
+    """
+    global _pool
+    if _pool is None or _pool._broken:
+        with _pool_lock:
+            # Пул ломается, если процесс пула убит (например, по памяти) - создаем новый
+            if _pool is None or _pool._broken:
+                _pool = ProcessPoolExecutor(
+                    max_workers=max(1, max_workers),
+                    mp_context=multiprocessing.get_context(_start_method()),
+                )
+    return _pool
+
+
+def load_month_journals(year, month, period_title):
+    """Данные журналов всех кружков за месяц.
+
+    Четыре запроса на весь центр: кружки, расписание, ученики, посещения.
+    Возвращает список (circle_id, journal), где journal - аргументы render_journal_bytes.
+    """
+    first_day, last_day = month_bounds(year, month)
+
+    circles = db.session.query(Circle.id, Circle.name).order_by(Circle.name).all()
+
+    schedule_days = defaultdict(set)
+    for circle_id, day_of_week in db.session.query(Schedule.circle_id, Schedule.day_of_week):
+        if day_of_week in DAY_NUMBERS:
+            schedule_days[circle_id].add(DAY_NUMBERS[day_of_week])
+
+    students = defaultdict(list)
+    for row in db.session.query(
+        Student.circle_id, Student.id, Student.full_name, Student.grade
+    ).order_by(Student.circle_id, Student.full_name):
+        students[row.circle_id].append(row)
+
+    marks = defaultdict(list)
+    for row in db.session.query(
+        Attendance.circle_id, Attendance.student_id, Attendance.date, Attendance.status
+    ).filter(
+        Attendance.date >= first_day, Attendance.date <= last_day
+    ):
+        marks[row.circle_id].append(row[1:])
+
+    # В процессы пула уходят готовые строки журнала (обычные списки и числа)
+    journals = []
+    for circle in circles:
+        dates_to_show = lesson_dates(first_day, last_day, schedule_days.get(circle.id, ()))
+        matrix = AttendanceMatrix(students.get(circle.id, []), dates_to_show, marks.get(circle.id, ()))
+        journals.append((circle.id, (circle.name, period_title, build_journal_grid(matrix))))
+    return journals
+
+
+def iter_rendered(journals, max_workers=1):
+    """Строит PDF журналов параллельно; отдает (circle_id, pdf) по мере готовности"""
+    pool = get_pool(max_workers)
+    futures = {pool.submit(render_journal_bytes, journal): circle_id for circle_id, journal in journals}
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def render_in_pool(func, *args, max_workers=1):
+    """Один PDF в пуле процессов: ReportLab держит GIL и не должен делить
+    процесс сервера с отметками. func - точка входа из pdf_export (*_bytes)"""
+    return get_pool(max_workers).submit(func, *args).result()
+
+
+def render_merged(journals, max_workers=1):
+    """Один PDF со всеми журналами; строится в пуле, чтобы не занимать поток сервера"""
+    pool = get_pool(max_workers)
+    return pool.submit(render_journals_merged_bytes, [journal for _, journal in journals]).result()
+
+
+class _ChunkBuffer:
+    """Файлоподобный буфер без seek: zipfile пишет в него, генератор забирает куски"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(rendered, filename_for):
+    """Генератор ZIP архива: каждый PDF уходит клиенту сразу после построения.
+
+    rendered: итератор (circle_id, pdf), filename_for(circle_id) - имя файла в архиве
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for circle_id, pdf in rendered:
+            # PDF уже сжат внутри, поэтому в архиве хранится без сжатия
+            archive.writestr(filename_for(circle_id), pdf)
+            yield buffer.drain()
+    yield buffer.drain()
@@ -0,0 +1,113 @@
+"""
+Версии данных для условных GET (ETag / Last-Modified)
+Триггеры SQLite увеличивают счетчик области при любом изменении строк,
+в том числе при массовых запросах мимо ORM; страница сравнивает только счетчики
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, text
+
+from models import db
+
+VERSIONS_TABLE = 'change_versions'
+
+# Области:
+#   circles                     - список кружков и имена преподавателей
+#   students, schedules         - любые ученики / занятия (экспорты по всему центру)
+#   circle:<id>                 - кружок, его ученики и расписание
+#   attendance:<id>:<ГГГГ-ММ>   - отметки кружка за месяц
+#   attendance:<ГГГГ-ММ>        - отметки всех кружков за месяц
+# Значения - SQL выражения над строкой NEW/OLD ({row}) триггера
+TRACKED = {
+    'circles': ["'circles'", "'circle:' || {row}.id"],
+    'students': ["'students'", "'circle:' || COALESCE({row}.circle_id, 0)"],
+    'schedules': ["'schedules'", "'circle:' || {row}.circle_id"],
+    'attendances': [
+        "'attendance:' || {row}.circle_id || ':' || substr({row}.date, 1, 7)",
+        "'attendance:' || substr({row}.date, 1, 7)",
+    ],
+}
+
+# Из таблицы пользователей в журналах видно только ФИО преподавателя
+TRACKED_COLUMNS = {'users': ('full_name', ["'circles'"])}
+
+# Таблица версий создана в этих БД (по URL движка)
+_ready = set()
+
+
+def _bump(scope_sql):
+    # Не INSERT OR IGNORE: в триггере его политику конфликта перекрывает внешний
+    # запрос (например, INSERT ... ON CONFLICT DO UPDATE при отметке посещаемости)
+    return (
+        f"INSERT INTO {VERSIONS_TABLE} (scope, version, changed_at) SELECT {scope_sql}, 0, 0 "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {VERSIONS_TABLE} WHERE scope = {scope_sql}); "
+        f"UPDATE {VERSIONS_TABLE} SET version = version + 1, changed_at = CAST(strftime('%s', 'now') AS INTEGER) "
+        f"WHERE scope = {scope_sql};"
+    )
+
+
+def _trigger_statements():
+    for table, scopes in TRACKED.items():
+        for event, rows in (('INSERT', ['NEW']), ('DELETE', ['OLD']), ('UPDATE', ['OLD', 'NEW'])):
+            body = ' '.join(_bump(scope.format(row=row)) for row in rows for scope in scopes)
+            yield (f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version "
+                   f"AFTER {event} ON {table} BEGIN {body} END")
+    for table, (column, scopes) in TRACKED_COLUMNS.items():
+        body = ' '.join(_bump(scope) for scope in scopes)
+        yield (f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{column}_version "
+               f"AFTER UPDATE OF {column} ON {table} BEGIN {body} END")
+
+
+def install_change_tracking():
+    """Создает таблицу версий и триггеры, если их еще нет.
+
+    Возвращает True, если выполнялся DDL (тогда коммит выполняет вызывающий код).
+    """
+    connection = db.session.connection()
+    url = str(connection.engine.url)
+    if url in _ready:
+        return False
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': VERSIONS_TABLE}
+    ).first() is not None
+    if not exists:
+        connection.execute(text(
+            f"CREATE TABLE {VERSIONS_TABLE} ("
+            f"scope TEXT PRIMARY KEY, version INTEGER NOT NULL, changed_at INTEGER NOT NULL)"
+        ))
+    for statement in _trigger_statements():
+        connection.execute(text(statement))
+    _ready.add(url)
+    return True
+
+
+def scope_versions(scopes):
+    """Версии областей и время последнего изменения (UTC) или None, если изменений не было.
+
+    Области без записей имеют версию 0.
+    """
+    # БД, созданная до появления версий: таблица и триггеры создаются при первом запросе
+    if install_change_tracking():
+        db.session.commit()
+    scopes = list(scopes)
+    rows = dict((scope, (version, changed_at)) for scope, version, changed_at in db.session.execute(
+        text(f'SELECT scope, version, changed_at FROM {VERSIONS_TABLE} WHERE scope IN :scopes')
+        .bindparams(bindparam('scopes', expanding=True)),
+        {'scopes': scopes}
+    ))
+    versions = tuple(rows.get(scope, (0, 0))[0] for scope in scopes)
+    changed_at = max((changed for _, changed in rows.values()), default=0)
+    last_modified = datetime.fromtimestamp(changed_at, timezone.utc) if changed_at else None
+    return versions, last_modified
+
+
+def month_key(day):
+    """Ключ месяца в областях отметок: '2025-09'"""
+    return f'{day.year:04d}-{day.month:02d}'
+
+
+def data_stamp():
+    """Сумма всех счетчиков версий: растет при любом отслеживаемом изменении данных"""
+    if install_change_tracking():
+        db.session.commit()
+    return db.session.execute(text(f'SELECT COALESCE(SUM(version), 0) FROM {VERSIONS_TABLE}')).scalar()
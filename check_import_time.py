@@ -0,0 +1,65 @@
+"""
+Проверка времени импорта приложения (python -X importtime)
+Завершается с ошибкой, если импорт тянет тяжелые библиотеки экспорта/импорта
+или занимает больше бюджета
+"""
+import os
+import subprocess
+import sys
+
+# Модули, которые загружаются только при экспорте PDF или импорте Excel
+HEAVY_MODULES = ('reportlab', 'pandas', 'numpy', 'openpyxl')
+
+# Бюджет на импорт приложения, мс (лучший из нескольких запусков)
+BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500))
+RUNS = 3
+
+# Что импортируют скрипты и рабочие процессы gunicorn
+TARGETS = ['app', 'app_production']
+
+
+def measure(module):
+    """Возвращает (общее время импорта в мс, список загруженных модулей)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total_us = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        modules.append(name)
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, modules
+
+
+def main():
+    failed = False
+    for module in TARGETS:
+        timings = []
+        for _ in range(RUNS):
+            elapsed_ms, modules = measure(module)
+            timings.append(elapsed_ms)
+        best = min(timings)
+
+        heavy = sorted({name.split('.')[0] for name in modules if name.split('.')[0] in HEAVY_MODULES})
+        ok = not heavy and best <= BUDGET_MS
+        print(f"{'✓' if ok else '✗'} import {module}: {best:.0f} мс (бюджет {BUDGET_MS} мс)")
+        if heavy:
+            print(f"     загружены тяжелые модули: {', '.join(heavy)}")
+        failed = failed or not ok
+
+    if failed:
+        sys.exit(1)
+    print("\n✓ Импорт приложения не загружает библиотеки экспорта")
+
+
+if __name__ == '__main__':
+    main()
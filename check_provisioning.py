@@ -0,0 +1,84 @@
+"""
+Проверка массового создания преподавателей на временной БД
+Чтение списков, которые присылают на практике (одна колонка, cp1251, битый
+Excel), и подбор логинов рядом с логинами, указанными в списке явно
+"""
+import io
+import os
+import sys
+import tempfile
+
+from models import db, User
+from teacher_provisioning import ProvisioningError, provision_teachers, read_roster
+
+# (название, имя файла, содержимое, ожидаемые ФИО или None - ожидается ProvisioningError)
+ROSTERS = [
+    ('CSV только с ФИО', 'list.csv', 'ФИО\nИванов Петр\nСмагулова Айгерим\n'.encode('utf-8'),
+     ['Иванов Петр', 'Смагулова Айгерим']),
+    ('CSV с BOM и точкой с запятой', 'list.csv', 'ФИО;Логин\nИванов Петр;ipetr\n'.encode('utf-8-sig'),
+     ['Иванов Петр']),
+    ('CSV в cp1251', 'list.csv', 'ФИО,Логин\nИванов Петр,ipetr\n'.encode('cp1251'), ['Иванов Петр']),
+    ('поврежденный .xlsx', 'list.xlsx', b'PK\x03\x04 not a workbook', None),
+    ('не .xlsx под именем .xlsx', 'list.xlsx', 'ФИО\nИванов Петр\n'.encode('utf-8'), None),
+    ('без колонки ФИО', 'list.csv', b'name,login\nIvanov,ivanov\n', None),
+]
+
+
+def check_rosters():
+    failed = False
+    for title, filename, content, expected in ROSTERS:
+        try:
+            names = [row['full_name'] for row in read_roster(io.BytesIO(content), filename)]
+            ok = names == expected
+            result = ', '.join(names)
+        except ProvisioningError as e:
+            ok = expected is None
+            result = f'ProvisioningError: {e}'
+        except Exception as e:
+            ok = False
+            result = f'{type(e).__name__}: {e}'
+        print(f"{'✓' if ok else '✗'} {title}: {result}")
+        failed = failed or not ok
+    return failed
+
+
+def check_explicit_logins_first():
+    """Логин из списка не должен достаться строке выше, у которой логин подбирается"""
+    rows = [
+        {'full_name': 'Иванов Петр'},
+        {'full_name': 'Иванов Иван', 'username': 'ivanov'},
+    ]
+    try:
+        credentials = provision_teachers(rows)
+    except ProvisioningError as e:
+        print(f"✗ явные логины занимаются до подбора: {e}")
+        return True
+    logins = {item['full_name']: item['username'] for item in credentials}
+    ok = logins == {'Иванов Петр': 'ivanov1', 'Иванов Иван': 'ivanov'}
+    ok = ok and User.query.filter_by(role='teacher').count() == 2
+    print(f"{'✓' if ok else '✗'} явные логины занимаются до подбора: {logins}")
+    return not ok
+
+
+def main():
+    from app import create_app
+
+    failed = check_rosters()
+    with tempfile.TemporaryDirectory(prefix='provisioning_') as directory:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'provisioning.db'),
+            'JINJA_CACHE_DIR': '',
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        })
+        with app.app_context():
+            db.create_all()
+            failed = check_explicit_logins_first() or failed
+
+    if failed:
+        print("\n✗ Массовое создание преподавателей работает неверно")
+        sys.exit(1)
+    print("\n✓ Массовое создание преподавателей работает")
+
+
+if __name__ == '__main__':
+    main()
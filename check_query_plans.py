@@ -0,0 +1,143 @@
+"""
+Проверка планов выполнения горячих запросов (EXPLAIN QUERY PLAN)
+Завершается с ошибкой, если какой-либо запрос читает таблицу полным сканированием
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+from sqlalchemy import select, func, case, text
+
+from models import db, Circle, Student, Attendance, AttendanceDaily, Schedule
+
+
+FIRST_DAY = date(2025, 9, 1)
+LAST_DAY = date(2025, 9, 30)
+
+
+# Полный проход допустим только по небольшой таблице кружков,
+# когда она ведущая в соединении (ТОП кружков): сводка при этом
+# читается по первичному ключу для каждого кружка.
+# Весь список учеников по названию кружка (колонка соединенной таблицы)
+# индексом не упорядочить: страница сортирует всех учеников
+ALLOWED_SCANS = {
+    'ТОП кружков (admin_dashboard)': {'circles'},
+    'Список учеников: circle, все, первая (admin_students)': {'students'},
+    'Список учеников: circle, все, после курсора (admin_students)': {'students'},
+}
+
+
+def student_list_queries():
+    """Страницы списка учеников админки: каждая сортировка, весь список и кружок,
+    первая страница и страница после курсора - запросы строит сам view"""
+    from app import STUDENT_SORTS, STUDENTS_PER_PAGE, student_list_query
+    from keyset import keyset_query
+
+    queries = {}
+    for sort, (sort_columns, _) in STUDENT_SORTS.items():
+        cursor = ['Б'] * (len(sort_columns) - 1) + [10]
+        for circle_id, scope in ((None, 'все'), (1, 'кружок')):
+            for after, page in ((None, 'первая'), (cursor, 'после курсора')):
+                query, _ = student_list_query(circle_id)
+                query, _, _ = keyset_query(query, sort_columns, STUDENTS_PER_PAGE, after=after)
+                queries[f'Список учеников: {sort}, {scope}, {page} (admin_students)'] = query.statement
+    return queries
+
+
+def hot_queries():
+    """Запросы журнала, дашбордов и страниц кружка"""
+    from attendance_matrix import AttendanceMatrix
+    from attendance_rollup import _daily_counts
+
+    present = func.sum(case((Attendance.status == 'present', 1), else_=0))
+    dates = [FIRST_DAY, LAST_DAY]
+
+    queries = {
+        'Отметки журнала за месяц (AttendanceMatrix: журналы, сетка, PDF)':
+            AttendanceMatrix.marks_query(1, dates).statement,
+        'Отметки с примечаниями (AttendanceMatrix: страница кружка)':
+            AttendanceMatrix.marks_query(1, dates, with_notes=True).statement,
+        'Ученики кружка по ФИО (AttendanceMatrix)': AttendanceMatrix.students_query(1).statement,
+        'Ученики группы по ФИО (AttendanceMatrix)': AttendanceMatrix.students_query(1, '1').statement,
+        'Статистика за месяц (admin_dashboard)': select(
+            func.sum(AttendanceDaily.present), func.sum(AttendanceDaily.absent)
+        ).where(AttendanceDaily.date >= FIRST_DAY),
+        'График за 30 дней (admin_dashboard)': select(
+            AttendanceDaily.date, func.sum(AttendanceDaily.present)
+        ).where(AttendanceDaily.date >= FIRST_DAY)
+         .group_by(AttendanceDaily.date).order_by(AttendanceDaily.date),
+        'ТОП кружков (admin_dashboard)': select(
+            Circle.name, func.sum(AttendanceDaily.present)
+        ).join(AttendanceDaily, AttendanceDaily.circle_id == Circle.id)
+         .where(AttendanceDaily.date >= FIRST_DAY)
+         .group_by(Circle.id, Circle.name),
+        'Пересчет сводки за день (attendance_rollup)': _daily_counts().where(
+            Attendance.circle_id == 1,
+            Attendance.date.in_([FIRST_DAY])
+        ),
+        'Ученики кружка по ФИО (teacher_students)': select(Student).where(
+            Student.circle_id == 1
+        ).order_by(Student.full_name),
+        'Расписание кружка': select(Schedule).where(Schedule.circle_id == 1),
+        'Кружки преподавателя': select(Circle).where(Circle.teacher_id == 1),
+        'Ученики по кружкам и группам (teacher_dashboard)': select(
+            Student.circle_id, Student.group_number, func.count(Student.id)
+        ).where(Student.circle_id.in_([1, 2]))
+         .group_by(Student.circle_id, Student.group_number),
+        'Отметки за месяц по группам (teacher_dashboard)': select(
+            Attendance.circle_id, Student.group_number, present
+        ).join(Student, Attendance.student_id == Student.id)
+         .where(Attendance.circle_id.in_([1, 2]), Attendance.date >= FIRST_DAY)
+         .group_by(Attendance.circle_id, Student.group_number),
+    }
+    queries.update(student_list_queries())
+    return queries
+
+
+def full_scans(conn, statement, allowed=()):
+    """Возвращает строки плана с полным сканированием таблицы.
+
+    Проход по индексу тоже полный, если результат затем сортируется целиком
+    (USE TEMP B-TREE FOR ORDER BY): LIMIT не останавливает чтение раньше.
+    """
+    sql = str(statement.compile(conn, compile_kwargs={'literal_binds': True}))
+    plan = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+    details = [row[-1] for row in plan]
+    sorted_afterwards = any('TEMP B-TREE FOR ORDER BY' in d for d in details)
+    scans = [
+        d for d in details
+        if d.startswith('SCAN') and ('INDEX' not in d or sorted_afterwards) and d.split()[1] not in allowed
+    ]
+    return scans, details
+
+
+def main():
+    from app import create_app
+
+    with tempfile.TemporaryDirectory(prefix='query_plans_') as directory:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'plans.db'),
+            'JINJA_CACHE_DIR': '',
+        })
+        failed = False
+        with app.app_context():
+            db.create_all()
+            conn = db.session.connection()
+            for name, statement in hot_queries().items():
+                scans, details = full_scans(conn, statement, ALLOWED_SCANS.get(name, ()))
+                mark = '✗' if scans else '✓'
+                print(f"{mark} {name}")
+                for detail in details:
+                    print(f"     {detail}")
+                failed = failed or bool(scans)
+            db.session.rollback()
+
+    if failed:
+        print("\n✗ Найдены запросы с полным сканированием таблиц")
+        sys.exit(1)
+    print("\n✓ Все горячие запросы используют индексы")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,36 @@
 """
 Production конфигурация для сервера
+Значения можно переопределить переменными окружения
 """
+import os
+
+from dotenv import load_dotenv
+
+from sqlite_tuning import engine_options
+
+load_dotenv()  # переменные из файла .env рядом с приложением
 
 # Настройки для production
 DEBUG = False
-HOST = '0.0.0.0'  # Слушать на всех интерфейсах
-PORT = 5004
-SECRET_KEY = 'cit-production-secret-key-change-me-2024'
+HOST = os.environ.get('HOST', '0.0.0.0')  # Слушать на всех интерфейсах
+PORT = int(os.environ.get('PORT', 5004))
+SECRET_KEY = os.environ.get('SECRET_KEY', 'cit-production-secret-key-change-me-2024')
 
 # База данных
-DATABASE_URI = 'sqlite:///attendance.db'
+DATABASE_URI = os.environ.get('DATABASE_URI', 'sqlite:///attendance.db')
+SQLALCHEMY_DATABASE_URI = DATABASE_URI
 
 # Безопасность
-SESSION_COOKIE_SECURE = False  # Установить True если используете HTTPS
+SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', '0') == '1'  # '1' если используете HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
+# WSGI сервер (gunicorn.conf.py)
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', (os.cpu_count() or 1) * 2 + 1))  # процессов
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))  # потоков в каждом процессе
+WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 120))  # секунд на запрос (синхронный экспорт PDF)
+WEB_MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS', 2000))  # перезапуск процесса после N запросов
+
+# Пул соединений: по одному на поток сервера и поток фоновых задач
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(WEB_THREADS + JOB_WORKERS)
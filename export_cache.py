@@ -0,0 +1,105 @@
+"""
+Дисковый кэш сгенерированных экспортов (PDF)
+Ключ: (тип экспорта, кружок, год, месяц) + версия данных; вытеснение по LRU
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+
+def data_version(*parts):
+    """Короткий отпечаток данных, из которых строится экспорт"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:16]
+
+
+class ExportCache:
+    """Файлы кэша лежат в одном каталоге, время последнего обращения - mtime файла.
+
+    Имя файла: <тип>-<кружок>-<год>-<месяц>-<версия>-<время создания>.<расширение>
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _prefix(self, kind, circle_id, year, month):
+        return f"{kind}-{circle_id or 0}-{year or 0}-{month or 0:02d}"
+
+    def lookup(self, kind, circle_id, year, month, version, ext='pdf'):
+        """Возвращает (путь, время создания) или None, если версии нет в кэше"""
+        pattern = os.path.join(
+            self.directory, f"{self._prefix(kind, circle_id, year, month)}-{version}-*.{ext}"
+        )
+        for path in glob.glob(pattern):
+            try:
+                os.utime(path)  # отмечаем обращение для LRU
+            except OSError:
+                continue  # файл только что вытеснен другим процессом
+            stamp = os.path.basename(path).rsplit('-', 1)[1].split('.')[0]
+            return path, datetime.strptime(stamp, '%Y%m%d_%H%M%S')
+        return None
+
+    def store(self, kind, circle_id, year, month, version, write, ext='pdf'):
+        """Сохраняет экспорт, удаляет его прежние версии и вытесняет старые файлы.
+
+        write(f) пишет содержимое прямо в файл кэша, без промежуточного буфера.
+        Возвращает (путь, время создания).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = self._prefix(kind, circle_id, year, month)
+        created = datetime.now().replace(microsecond=0)
+        path = os.path.join(
+            self.directory, f"{prefix}-{version}-{created.strftime('%Y%m%d_%H%M%S')}.{ext}"
+        )
+
+        # Атомарная запись: читатели никогда не видят недописанный файл
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+        with self._lock:
+            for old_path in glob.glob(os.path.join(self.directory, f"{prefix}-*.{ext}")):
+                if old_path != path:
+                    self._remove(old_path)
+            self._evict()
+        return path, created
+
+    def _evict(self):
+        """Удаляет давно не использованные файлы, пока кэш больше max_bytes"""
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -4,10 +4,11 @@
 """
 import random
 from datetime import date, timedelta
-from app import app, db
+from app import create_app, db
 from models import Student, Circle, Attendance, User
+from attendance_rollup import rebuild_daily_rollup
 
-def generate_demo_attendance():
+def generate_demo_attendance(app):
     """Генерация рандомной посещаемости для демонстрации"""
     
     print("Начинаем генерацию демонстрационных данных посещаемости...")
@@ -90,6 +91,9 @@ def generate_demo_attendance():
             db.session.commit()
             print(f"  Обработано дней: {days_count}")
         
+        # Пересчитываем сводку для дашборда
+        rebuild_daily_rollup()
+        
         print(f"\n✅ Генерация завершена!")
         print(f"Всего создано записей посещаемости: {total_generated}")
         
@@ -110,7 +114,7 @@ def generate_demo_attendance():
 if __name__ == '__main__':
     response = input("Это удалит ВСЕ существующие записи посещаемости и создаст новые демо-данные. Продолжить? (yes/no): ")
     if response.lower() in ['yes', 'y', 'да', 'д']:
-        generate_demo_attendance()
+        generate_demo_attendance(create_app())
     else:
         print("Отменено")
 
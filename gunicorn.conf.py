@@ -0,0 +1,39 @@
+"""
+Настройки gunicorn для production
+Значения берутся из config_production (и переменных окружения через него)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('APP_CONFIG', 'config_production')
+
+import config_production
+
+bind = f"{config_production.HOST}:{config_production.PORT}"
+
+# Pre-fork: несколько процессов, в каждом пул потоков
+worker_class = 'gthread'
+workers = config_production.WEB_WORKERS
+threads = config_production.WEB_THREADS
+timeout = config_production.WEB_TIMEOUT
+graceful_timeout = 30  # сколько ждать завершения текущих запросов при перезапуске
+keepalive = 5
+
+# Периодический перезапуск процессов (с разбросом, чтобы не все сразу)
+max_requests = config_production.WEB_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+
+# Приложение загружается в каждом процессе, а не в мастере:
+# по HUP новые процессы подхватывают обновленный код, старые дорабатывают запросы
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    """Прогрев процесса до того, как он начнет принимать запросы"""
+    from app_production import warm_up
+    warm_up()
+    worker.log.info('Worker %s warmed up', worker.pid)
@@ -0,0 +1,42 @@
+"""
+Данные вошедшего пользователя для Flask-Login
+Легкий объект вместо ORM модели: роль и кружки преподавателя вычисляются
+при загрузке, поэтому проверки прав не обращаются к БД
+"""
+from flask_login import UserMixin
+
+from models import db, User, Circle
+
+
+class Identity(UserMixin):
+    """Пользователь текущего запроса (только чтение)"""
+
+    def __init__(self, id, username, full_name, role, circle_ids):
+        self.id = id
+        self.username = username
+        self.full_name = full_name
+        self.role = role
+        self.circle_ids = frozenset(circle_ids)
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def can_access_circle(self, circle_id):
+        """Админ - любой кружок, преподаватель - только свои"""
+        if self.is_admin():
+            return True
+        try:
+            return int(circle_id) in self.circle_ids
+        except (TypeError, ValueError):
+            return False
+
+
+def load_identity(user_id):
+    """Identity из БД (два запроса) или None, если пользователя нет"""
+    user = db.session.query(
+        User.id, User.username, User.full_name, User.role
+    ).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    circle_ids = [row.id for row in db.session.query(Circle.id).filter(Circle.teacher_id == user_id)]
+    return Identity(user.id, user.username, user.full_name, user.role, circle_ids)
@@ -3,12 +3,12 @@
 """
 import pandas as pd
 from datetime import datetime
-from app import app, db
+from app import create_app, db
 from models import Student, Circle, User
 from werkzeug.security import generate_password_hash
 
 
-def import_students_from_excel(filepath):
+def import_students_from_excel(app, filepath):
     """Импорт студентов из Excel файла"""
     
     print("Начинаем импорт данных...")
@@ -145,5 +145,5 @@ def import_students_from_excel(filepath):
 
 
 if __name__ == '__main__':
-    import_students_from_excel('/Users/nurlykhan/pets/cit_log/export.xlsx')
+    import_students_from_excel(create_app(), '/Users/nurlykhan/pets/cit_log/export.xlsx')
 
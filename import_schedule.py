@@ -2,9 +2,10 @@
 Скрипт импорта расписания кружков и учителей из Excel файла
 """
 import pandas as pd
-from app import app
+from app import create_app
 from models import db, User, Circle, Schedule
-from werkzeug.security import generate_password_hash
+from teacher_provisioning import hash_passwords, unique_username, username_base
+from sqlalchemy import insert
 import re
 
 
@@ -43,62 +44,13 @@ def clean_teacher_name(full_name):
     return name.strip()
 
 
-def transliterate_to_latin(text):
-    """Транслитерация казахского/русского в латиницу"""
-    # Полная таблица транслитерации
-    cyrillic_to_latin = {
-        # Русские буквы
-        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
-        'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
-        'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
-        'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
-        'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
-        
-        # Казахские специфичные буквы
-        'ә': 'a', 'і': 'i', 'ң': 'n', 'ғ': 'g', 'ү': 'u', 'ұ': 'u', 'қ': 'k', 'ө': 'o', 'һ': 'h',
-        
-        # Заглавные
-        'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Е': 'E', 'Ё': 'Yo',
-        'Ж': 'Zh', 'З': 'Z', 'И': 'I', 'Й': 'Y', 'К': 'K', 'Л': 'L', 'М': 'M',
-        'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'У': 'U',
-        'Ф': 'F', 'Х': 'H', 'Ц': 'Ts', 'Ч': 'Ch', 'Ш': 'Sh', 'Щ': 'Shch',
-        'Ъ': '', 'Ы': 'Y', 'Ь': '', 'Э': 'E', 'Ю': 'Yu', 'Я': 'Ya',
-        
-        'Ә': 'A', 'І': 'I', 'Ң': 'N', 'Ғ': 'G', 'Ү': 'U', 'Ұ': 'U', 'Қ': 'K', 'Ө': 'O', 'Һ': 'H',
-    }
-    
-    result = []
-    for char in text:
-        result.append(cyrillic_to_latin.get(char, char))
-    
-    return ''.join(result)
-
-
 def create_username(full_name):
     """Создает username из полного имени на латинице"""
-    # Очищаем имя от префиксов
-    clean_name = clean_teacher_name(full_name)
-    
-    # Берем первое слово (фамилию)
-    parts = clean_name.strip().split()
-    if not parts:
-        return 'teacher'
-    
-    surname = parts[0]
-    
-    # Транслитерируем в латиницу
-    username = transliterate_to_latin(surname).lower()
-    
-    # Убираем все нелатинские символы и оставляем только буквы
-    username = re.sub(r'[^a-z]', '', username)
-    
-    if not username:
-        return 'teacher'
-    
-    return username
+    # Очищаем имя от префиксов, берем фамилию
+    return username_base(clean_teacher_name(full_name))
 
 
-def import_schedule(excel_file):
+def import_schedule(app, excel_file):
     """Импортирует расписание из Excel файла"""
     print(f"Читаю файл {excel_file}...")
     df = pd.read_excel(excel_file)
@@ -106,88 +58,75 @@ def import_schedule(excel_file):
     print(f"\nВсего записей в файле: {len(df)}")
     print(f"Колонки: {df.columns.tolist()}\n")
     
+    # Все строки собираются в памяти, запись - одной транзакцией массовыми INSERT
+    teachers_data = df[['Имя преподавателя', 'Телефон преподавателя']].drop_duplicates()
+    teachers_data = teachers_data.dropna(subset=['Имя преподавателя'])
+    teacher_names = [str(name).strip() for name in teachers_data['Имя преподавателя']]
+    print(f"\nНайдено уникальных преподавателей: {len(teachers_data)}")
+    
+    circles_data = df.groupby(['Название кружка', 'Имя преподавателя']).first().reset_index()
+    circle_keys = [
+        (str(row['Название кружка']).strip(), str(row['Имя преподавателя']).strip())
+        for row in circles_data.to_dict('records')
+    ]
+    print(f"Найдено уникальных кружков: {len(circle_keys)}")
+    
     with app.app_context():
+        # Хэши паролей в пуле приложения до начала транзакции
+        password_hashes = hash_passwords(['12345'] * len(teacher_names))  # Дефолтный пароль
+        
         # Очищаем старые данные
         print("Очищаю старые данные...")
         Schedule.query.delete()
         Circle.query.delete()
         User.query.filter_by(role='teacher').delete()
-        db.session.commit()
-        
-        # Собираем уникальных учителей
-        teachers_data = df[['Имя преподавателя', 'Телефон преподавателя']].drop_duplicates()
-        teachers_data = teachers_data.dropna(subset=['Имя преподавателя'])
-        
-        print(f"\nНайдено уникальных преподавателей: {len(teachers_data)}")
-        
-        # Создаем учителей
-        teacher_map = {}  # {имя: user_id}
         
-        for idx, row in teachers_data.iterrows():
-            original_name = str(row['Имя преподавателя']).strip()
+        # Создаем учителей: логины подбираются по множеству занятых в памяти
+        taken = {username for (username,) in db.session.query(User.username)}
+        teacher_rows = []
+        for original_name, password_hash in zip(teacher_names, password_hashes):
             clean_name = clean_teacher_name(original_name)
-            phone = normalize_phone(row['Телефон преподавателя'])
-            
-            # Создаем username
-            base_username = create_username(original_name)
-            username = base_username
-            counter = 1
-            
-            # Проверяем уникальность username
-            while User.query.filter_by(username=username).first():
-                username = f"{base_username}{counter}"
-                counter += 1
-            
-            # Создаем учителя
-            teacher = User(
-                username=username,
-                password=generate_password_hash('12345'),  # Дефолтный пароль
-                full_name=clean_name,  # Используем очищенное имя
-                role='teacher'
-            )
-            db.session.add(teacher)
-            db.session.flush()  # Получаем ID
-            
-            # Используем original_name для маппинга, т.к. в Excel оригинальное имя
-            teacher_map[original_name] = teacher.id
+            username = unique_username(create_username(original_name), taken)
+            teacher_rows.append({
+                'username': username,
+                'password': password_hash,
+                'full_name': clean_name,  # Используем очищенное имя
+                'role': 'teacher',
+            })
             print(f"✓ Создан учитель: {clean_name} (логин: {username}, пароль: 12345)")
         
-        db.session.commit()
+        teacher_map = {}  # {имя: user_id}
+        if teacher_rows:
+            teacher_ids = db.session.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True), teacher_rows
+            ).all()
+            # Используем original_name для маппинга, т.к. в Excel оригинальное имя
+            teacher_map = dict(zip(teacher_names, teacher_ids))
         print(f"\nСоздано учителей: {len(teacher_map)}")
         
-        # Собираем уникальные кружки
-        circles_data = df.groupby(['Название кружка', 'Имя преподавателя']).first().reset_index()
-        
-        print(f"\nНайдено уникальных кружков: {len(circles_data)}")
-        
+        # Создаем кружки
         circle_map = {}  # {(название, учитель): circle_id}
-        
-        for idx, row in circles_data.iterrows():
-            circle_name = str(row['Название кружка']).strip()
-            teacher_name = str(row['Имя преподавателя']).strip()
-            
-            teacher_id = teacher_map.get(teacher_name)
-            
-            # Создаем кружок
-            circle = Circle(
-                name=circle_name,
-                direction='',  # Можно добавить позже
-                teacher_id=teacher_id
-            )
-            db.session.add(circle)
-            db.session.flush()  # Получаем ID
-            
-            circle_map[(circle_name, teacher_name)] = circle.id
+        if circle_keys:
+            circle_ids = db.session.scalars(
+                insert(Circle).returning(Circle.id, sort_by_parameter_order=True),
+                [
+                    {
+                        'name': circle_name,
+                        'direction': '',  # Можно добавить позже
+                        'teacher_id': teacher_map.get(teacher_name),
+                    }
+                    for circle_name, teacher_name in circle_keys
+                ]
+            ).all()
+            circle_map = dict(zip(circle_keys, circle_ids))
+        for circle_name, teacher_name in circle_keys:
             print(f"✓ Создан кружок: {circle_name} (преподаватель: {teacher_name})")
-        
-        db.session.commit()
         print(f"\nСоздано кружков: {len(circle_map)}")
         
         # Импортируем расписание
         print(f"\nИмпортирую расписание...")
-        schedule_count = 0
-        
-        for idx, row in df.iterrows():
+        schedule_rows = []
+        for idx, row in zip(df.index, df.to_dict('records')):
             circle_name = str(row['Название кружка']).strip()
             teacher_name = str(row['Имя преподавателя']).strip()
             
@@ -196,28 +135,19 @@ def import_schedule(excel_file):
                 print(f"! Пропуск строки {idx}: кружок не найден")
                 continue
             
-            day_of_week = str(row['День недели']).strip() if pd.notna(row['День недели']) else None
-            group_number = str(row['Группа']).strip() if pd.notna(row['Группа']) else None
-            time_slot = str(row['Время занятий']).strip() if pd.notna(row['Время занятий']) else None
-            room = str(row['Кабинет']).strip() if pd.notna(row['Кабинет']) else None
-            floor = str(row['Этаж']).strip() if pd.notna(row['Этаж']) else None
-            
-            # Создаем запись расписания
-            schedule = Schedule(
-                circle_id=circle_id,
-                day_of_week=day_of_week,
-                group_number=group_number,
-                time_slot=time_slot,
-                room=room,
-                floor=floor
-            )
-            db.session.add(schedule)
-            schedule_count += 1
-            
-            if (idx + 1) % 50 == 0:
-                print(f"  Обработано {idx + 1} записей...")
-        
+            schedule_rows.append({
+                'circle_id': circle_id,
+                'day_of_week': str(row['День недели']).strip() if pd.notna(row['День недели']) else None,
+                'group_number': str(row['Группа']).strip() if pd.notna(row['Группа']) else None,
+                'time_slot': str(row['Время занятий']).strip() if pd.notna(row['Время занятий']) else None,
+                'room': str(row['Кабинет']).strip() if pd.notna(row['Кабинет']) else None,
+                'floor': str(row['Этаж']).strip() if pd.notna(row['Этаж']) else None,
+            })
+        
+        if schedule_rows:
+            db.session.execute(insert(Schedule), schedule_rows)
         db.session.commit()
+        schedule_count = len(schedule_rows)
         print(f"\n✓ Создано записей расписания: {schedule_count}")
         
         # Итоговая статистика
@@ -237,5 +167,5 @@ def import_schedule(excel_file):
 
 
 if __name__ == '__main__':
-    import_schedule('Расписание_кружков.xlsx')
+    import_schedule(create_app(), 'Расписание_кружков.xlsx')
 
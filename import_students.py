@@ -3,10 +3,12 @@
 Связывает учеников с кружками по полям "Кружок (по расписанию)" и "Группа (по расписанию)"
 """
 import pandas as pd
-from app import app
-from models import db, Circle, Student, Schedule
+from app import create_app
+from models import db, Circle, Student
+from student_search import index_students
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, insert, update
+from collections import Counter
 import re
 
 
@@ -22,42 +24,113 @@ def normalize_circle_name(name):
     return name
 
 
-def find_circle_by_name(circle_name):
-    """Находит кружок по названию (с учетом возможных различий)"""
-    if not circle_name:
+def circle_key(name):
+    """Ключ сравнения названий: регистр, ё/е, кавычки и знаки препинания не важны"""
+    name = normalize_circle_name(name)
+    if not name:
+        return ''
+    name = name.casefold().replace('ё', 'е')
+    return ' '.join(re.sub(r'[^\w]+', ' ', name).split())
+
+
+def trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+# Как найден кружок; неточные совпадения попадают в отчет импорта
+MATCH_EXACT = 'exact'
+MATCH_NORMALIZED = 'normalized'
+MATCH_PARTIAL = 'partial'
+MATCH_FUZZY = 'fuzzy'
+INEXACT_MATCHES = {MATCH_PARTIAL: 'часть названия', MATCH_FUZZY: 'похожее название'}
+
+# Минимальное сходство триграмм (Жаккар) для похожего названия
+FUZZY_MIN_SIMILARITY = 0.5
+
+
+class CircleIndex:
+    """Названия кружков, нормализованные один раз на импорт.
+
+    Поиск: точное название, затем ключ circle_key, затем вхождение одного
+    названия в другое (самое короткое название) и похожее по триграммам (самое
+    близкое). Равные кандидаты выбираются по длине, названию и id, поэтому
+    результат не зависит от порядка строк в БД. Ответ на каждое название
+    из файла запоминается.
+    """
+
+    def __init__(self, circles):
+        self.circles = sorted(circles, key=lambda c: c.id)
+        self.keys = [circle_key(c.name) for c in self.circles]
+        self.grams = [trigrams(key) for key in self.keys]
+        self.exact = {}
+        self.by_key = {}
+        self.postings = {}
+        for i, circle in enumerate(self.circles):
+            self.exact.setdefault(normalize_circle_name(circle.name), i)
+            self.by_key.setdefault(self.keys[i], i)
+            for gram in self.grams[i]:
+                self.postings.setdefault(gram, []).append(i)
+        # Названия короче трех букв не попадают в триграммы и проверяются отдельно
+        self.short = [i for i, grams in enumerate(self.grams) if not grams]
+        self.resolved = {}
+        self.uses = Counter()
+
+    @classmethod
+    def load(cls):
+        return cls(db.session.query(Circle.id, Circle.name).all())
+
+    def find(self, circle_name):
+        """Кружок (id, name) по названию из файла или None"""
+        name = normalize_circle_name(circle_name)
+        if not name:
+            return None
+        self.uses[name] += 1
+        if name not in self.resolved:
+            self.resolved[name] = self._match(name)
+        match = self.resolved[name]
+        return self.circles[match[0]] if match else None
+
+    def inexact_matches(self):
+        """Неточные совпадения: (название в файле, кружок, способ, сходство, строк)"""
+        return sorted(
+            (name, self.circles[match[0]].name, INEXACT_MATCHES[match[1]], match[2], self.uses[name])
+            for name, match in self.resolved.items() if match and match[1] in INEXACT_MATCHES
+        )
+
+    def _tie_break(self, i):
+        return len(self.keys[i]), self.keys[i], self.circles[i].id
+
+    def _match(self, name):
+        """(номер кружка, способ, сходство) или None"""
+        if name in self.exact:
+            return self.exact[name], MATCH_EXACT, 1.0
+        key = circle_key(name)
+        if not key:
+            return None
+        if key in self.by_key:
+            return self.by_key[key], MATCH_NORMALIZED, 1.0
+
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        # Вхождение возможно, только если все триграммы одного ключа есть в другом
+        if grams:
+            candidates = [i for i, count in shared.items()
+                          if count == len(grams) or count == len(self.grams[i])] + self.short
+        else:
+            candidates = range(len(self.circles))
+        contained = [i for i in candidates if key in self.keys[i] or self.keys[i] in key]
+        if contained:
+            return min(contained, key=self._tie_break), MATCH_PARTIAL, 1.0
+
+        scored = [(count / (len(grams) + len(self.grams[i]) - count), i) for i, count in shared.items()]
+        scored = [(score, i) for score, i in scored if score >= FUZZY_MIN_SIMILARITY]
+        if scored:
+            score, i = min(scored, key=lambda item: (-item[0], self._tie_break(item[1])))
+            return i, MATCH_FUZZY, round(score, 2)
         return None
-    
-    normalized_search = normalize_circle_name(circle_name)
-    
-    # Сначала пробуем точное совпадение
-    circle = Circle.query.filter_by(name=circle_name).first()
-    if circle:
-        return circle
-    
-    # Поиск по нормализованному названию
-    all_circles = Circle.query.all()
-    for c in all_circles:
-        normalized_db = normalize_circle_name(c.name)
-        if normalized_db == normalized_search:
-            return c
-    
-    # Поиск по частичному совпадению (нормализованное)
-    matching_circles = []
-    for c in all_circles:
-        normalized_db = normalize_circle_name(c.name)
-        if normalized_search in normalized_db or normalized_db in normalized_search:
-            matching_circles.append(c)
-    
-    if len(matching_circles) == 1:
-        return matching_circles[0]
-    
-    # Если несколько совпадений, берем самое точное
-    if matching_circles:
-        # Сортируем по длине совпадения (берем самое короткое - более точное)
-        best_match = min(matching_circles, key=lambda c: len(normalize_circle_name(c.name)))
-        return best_match
-    
-    return None
 
 
 def parse_date(date_str):
@@ -92,7 +165,7 @@ def normalize_phone(phone):
     return phone_str if phone_str else None
 
 
-def import_students(excel_file):
+def import_students(app, excel_file):
     """Импортирует учеников из Excel файла"""
     print(f"Читаю файл {excel_file}...")
     df = pd.read_excel(excel_file)
@@ -110,40 +183,54 @@ def import_students(excel_file):
             'imported': 0,
             'skipped_no_circle': 0,
             'skipped_duplicate': 0,
+            'updated': 0,
             'errors': 0,
             'circles_not_found': set()
         }
         
-        # Словарь для отслеживания дубливания дубликатов
-        existing_students = {}
-        for student in Student.query.all():
-            key = (student.iin, student.full_name)
-            existing_students[key] = student
+        # Ученики в памяти по ключу (ИИН, ФИО): новые строки и смена кружка
+        # собираются целиком и записываются одной транзакцией
+        existing_students = {
+            (iin or None, full_name): (student_id, circle_id)
+            for student_id, iin, full_name, circle_id in db.session.query(
+                Student.id, Student.iin, Student.full_name, Student.circle_id
+            )
+        }
+        new_students = {}  # {(ИИН, ФИО): строка для INSERT}
+        circle_updates = {}  # {id ученика: id кружка}
+        
+        # Названия кружков нормализуются один раз, а не на каждую строку файла
+        circle_index = CircleIndex.load()
         
         print("Начинаю импорт...\n")
         
-        for idx, row in df_valid.iterrows():
+        for idx, row in zip(df_valid.index, df_valid.to_dict('records')):
             try:
                 # Основные данные ученика
                 full_name = str(row['ФИО']).strip() if pd.notna(row['ФИО']) else None
-                iin = str(row['ИИН']).strip() if pd.notna(row['ИИН']) else None
+                iin = (str(row['ИИН']).strip() or None) if pd.notna(row['ИИН']) else None
                 
                 if not full_name:
                     stats['skipped_no_circle'] += 1
                     continue
                 
-                # Проверка на дубликат
+                # Проверка на дубликат (в БД или выше в файле)
                 key = (iin, full_name)
-                if key in existing_students:
-                    # Обновляем существующего студента (если нужно)
-                    student = existing_students[key]
+                if key in existing_students or key in new_students:
                     # Проверяем, нужно ли обновить кружок
-                    circle_name = normalize_circle_name(row['Кружок (по расписанию)'])
-                    circle = find_circle_by_name(circle_name)
-                    if circle and student.circle_id != circle.id:
+                    circle = circle_index.find(row['Кружок (по расписанию)'])
+                    if key in new_students:
+                        current_circle_id = new_students[key]['circle_id']
+                    else:
+                        student_id, current_circle_id = existing_students[key]
+                        current_circle_id = circle_updates.get(student_id, current_circle_id)
+                    if circle and current_circle_id != circle.id:
                         # Обновляем кружок
-                        student.circle_id = circle.id
-                        db.session.commit()
+                        if key in new_students:
+                            new_students[key]['circle_id'] = circle.id
+                        else:
+                            circle_updates[student_id] = circle.id
+                        stats['updated'] += 1
                         print(f"✓ Обновлен кружок для: {full_name[:50]}")
                     else:
                         stats['skipped_duplicate'] += 1
@@ -151,7 +238,7 @@ def import_students(excel_file):
                 
                 # Находим кружок
                 circle_name = normalize_circle_name(row['Кружок (по расписанию)'])
-                circle = find_circle_by_name(circle_name)
+                circle = circle_index.find(circle_name)
                 
                 if not circle:
                     stats['circles_not_found'].add(circle_name)
@@ -160,45 +247,54 @@ def import_students(excel_file):
                         print(f"! Кружок не найден: {circle_name}")
                     continue
                 
-                # Создаем студента
-                student = Student(
-                    full_name=full_name,
-                    iin=iin if iin else None,
-                    gender=str(row['ПОЛ']).strip() if pd.notna(row['ПОЛ']) else None,
-                    address=str(row['АДРЕС']).strip() if pd.notna(row['АДРЕС']) else None,
-                    school=str(row['С КАКОЙ ШКОЛЫ']).strip() if pd.notna(row['С КАКОЙ ШКОЛЫ']) else None,
-                    grade=str(row['В КАКОМ КЛАССЕ ОБУЧАЕТСЯ']).strip() if pd.notna(row['В КАКОМ КЛАССЕ ОБУЧАЕТСЯ']) else None,
-                    direction=str(row['ПО КАКОМУ НАПРАВЛЕНИЮ']).strip() if pd.notna(row['ПО КАКОМУ НАПРАВЛЕНИЮ']) else None,
-                    circle_id=circle.id,
+                new_students[key] = {
+                    'full_name': full_name,
+                    'iin': iin,
+                    'gender': str(row['ПОЛ']).strip() if pd.notna(row['ПОЛ']) else None,
+                    'address': str(row['АДРЕС']).strip() if pd.notna(row['АДРЕС']) else None,
+                    'school': str(row['С КАКОЙ ШКОЛЫ']).strip() if pd.notna(row['С КАКОЙ ШКОЛЫ']) else None,
+                    'grade': str(row['В КАКОМ КЛАССЕ ОБУЧАЕТСЯ']).strip() if pd.notna(row['В КАКОМ КЛАССЕ ОБУЧАЕТСЯ']) else None,
+                    'direction': str(row['ПО КАКОМУ НАПРАВЛЕНИЮ']).strip() if pd.notna(row['ПО КАКОМУ НАПРАВЛЕНИЮ']) else None,
+                    'circle_id': circle.id,
                     # Данные заявителя
-                    applicant_name=str(row['ФИО заявителя']).strip() if pd.notna(row['ФИО заявителя']) else None,
-                    applicant_iin=str(row['ИИН заявителя']).strip() if pd.notna(row['ИИН заявителя']) else None,
-                    applicant_login=str(row['Логин']).strip() if pd.notna(row['Логин']) else None,
-                    applicant_phone=normalize_phone(row['ТЕЛЕФОН заявителя']),
-                    application_date=parse_date(row['Дата подачи'])
-                )
-                
-                db.session.add(student)
-                existing_students[key] = student
+                    'applicant_name': str(row['ФИО заявителя']).strip() if pd.notna(row['ФИО заявителя']) else None,
+                    'applicant_iin': str(row['ИИН заявителя']).strip() if pd.notna(row['ИИН заявителя']) else None,
+                    'applicant_login': str(row['Логин']).strip() if pd.notna(row['Логин']) else None,
+                    'applicant_phone': normalize_phone(row['ТЕЛЕФОН заявителя']),
+                    'application_date': parse_date(row['Дата подачи']),
+                }
                 stats['imported'] += 1
                 
-                if stats['imported'] % 50 == 0:
-                    db.session.commit()
-                    print(f"  Обработано {stats['imported']} учеников...")
-                
             except Exception as e:
                 stats['errors'] += 1
                 print(f"! Ошибка в строке {idx}: {e}")
                 continue
         
-        # Финальный коммит
+        # Запись: массовый INSERT новых учеников и UPDATE кружков по id.
+        # Они идут в обход ORM, поэтому поисковый индекс обновляется явно
+        # (версии данных для ETag обновляют триггеры SQLite)
+        if new_students:
+            inserted = db.session.execute(
+                insert(Student).returning(
+                    Student.id, Student.full_name, Student.iin, Student.school,
+                    Student.applicant_name, Student.applicant_phone
+                ),
+                list(new_students.values())
+            ).all()
+            index_students(inserted)
+        if circle_updates:
+            db.session.execute(update(Student), [
+                {'id': student_id, 'circle_id': circle_id} for student_id, circle_id in circle_updates.items()
+            ])
         db.session.commit()
+        print(f"  Записано учеников: {len(new_students)}, обновлено кружков: {len(circle_updates)}")
         
         # Итоговая статистика
         print("\n" + "="*70)
         print("ИТОГО ИМПОРТА:")
         print("="*70)
         print(f"  ✓ Импортировано новых учеников: {stats['imported']}")
+        print(f"  ↻ Обновлен кружок: {stats['updated']}")
         print(f"  ⊘ Пропущено дубликатов: {stats['skipped_duplicate']}")
         print(f"  ⊘ Пропущено без кружка: {stats['skipped_no_circle']}")
         print(f"  ✗ Ошибок: {stats['errors']}")
@@ -210,6 +306,12 @@ def import_students(excel_file):
             if len(stats['circles_not_found']) > 10:
                 print(f"     ... и еще {len(stats['circles_not_found']) - 10}")
         
+        inexact = circle_index.inexact_matches()
+        if inexact:
+            print(f"\n  ≈ Кружки найдены неточно ({len(inexact)}), исправьте названия в файле:")
+            for source, circle_name, kind, score, rows in inexact:
+                print(f"     - «{source}» → «{circle_name}» ({kind}, сходство {score}, строк: {rows})")
+        
         print("="*70)
         
         # Статистика по кружкам
@@ -226,5 +328,5 @@ def import_students(excel_file):
 
 
 if __name__ == '__main__':
-    import_students('export_ученики_под_расписание.xlsx')
+    import_students(create_app(), 'export_ученики_под_расписание.xlsx')
 
@@ -1,14 +1,24 @@
 """
 Скрипт инициализации базы данных
 """
-from app import app
-from models import db, User
+from app import create_app
+from models import db, User, create_missing_columns, create_missing_indexes
+from student_search import create_search_index
+from change_tracking import install_change_tracking
 from werkzeug.security import generate_password_hash
 
+app = create_app()
+
 with app.app_context():
     # Создаем все таблицы
     db.create_all()
-    print("✓ Все таблицы созданы")
+    create_missing_columns()
+    create_missing_indexes()
+    if create_search_index():
+        print("✓ Создан поисковый индекс учеников")
+    install_change_tracking()  # версии данных для ETag страниц журнала
+    db.session.commit()
+    print("✓ Все таблицы и индексы созданы")
     
     # Проверяем, есть ли админ
     admin = User.query.filter_by(username='admin').first()
@@ -0,0 +1,188 @@
+"""
+Фоновые задачи: таблица jobs и ограниченный пул рабочих потоков
+Тяжелые экспорты выполняются вне потоков обработки запросов
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import db, Job
+
+
+# Задачи, которые еще не завершены
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def process_alive(pid):
+    """Жив ли процесс на этой машине (сигнал 0 только проверяет существование)"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # процесс есть, но чужой
+    return True
+
+
+class JobQueue:
+    """Очередь задач процесса. Состояние задач хранится в БД,
+    поэтому статус и результат доступны из любого процесса сервера.
+
+    Задача выполняется в пуле процесса, который ее поставил (owner_pid).
+    Если этот процесс завершился (перезапуск воркера gunicorn), задача
+    помечается ошибочной при первой проверке, а не через JOB_STALE_AFTER.
+    """
+
+    def __init__(self, handlers=None):
+        self.app = None
+        self._handlers = dict(handlers or {})
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = set()  # id задач в очереди и пуле этого процесса
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_queue'] = self
+
+    def handler(self, kind):
+        """Регистрирует обработчик задачи: handler(params, out, progress) -> имя файла"""
+        def decorator(func):
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.app.config['JOB_WORKERS'], thread_name_prefix='job'
+                    )
+        return self._executor
+
+    def enqueue(self, kind, params, user_id):
+        """Создает задачу и ставит ее в очередь. Возвращает объект Job."""
+        if kind not in self._handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+
+        self.cleanup()
+
+        job = Job(kind=kind, params=json.dumps(params), status='queued', created_by=user_id,
+                  owner_pid=os.getpid())
+        db.session.add(job)
+        db.session.flush()
+        self._active.add(job.id)  # до commit: другие потоки не должны счесть задачу потерянной
+        try:
+            db.session.commit()
+        except Exception:
+            self._active.discard(job.id)
+            raise
+
+        self._get_executor().submit(self._run, job.id)
+        return job
+
+    def _update(self, job_id, **fields):
+        Job.query.filter_by(id=job_id).update(fields)
+        db.session.commit()
+
+    def _run(self, job_id):
+        try:
+            self._execute(job_id)
+        finally:
+            self._active.discard(job_id)
+
+    def _execute(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(Job, job_id)
+            if job is None:
+                return
+            handler = self._handlers[job.kind]
+            params = json.loads(job.params or '{}')
+            self._update(job_id, status='running', started_at=datetime.utcnow())
+
+            results_dir = self.app.config['JOB_RESULTS_DIR']
+            os.makedirs(results_dir, exist_ok=True)
+            path = os.path.join(results_dir, f'job_{job_id}.bin')
+
+            def progress(value):
+                self._update(job_id, progress=max(0, min(100, int(value))))
+
+            try:
+                with open(path, 'wb') as out:
+                    result_name = handler(params, out, progress)
+            except Exception as e:
+                db.session.rollback()
+                self._remove(path)
+                self._update(job_id, status='failed', error=str(e)[:1000], finished_at=datetime.utcnow())
+                self.app.logger.exception('Job %s (%s) failed', job_id, job.kind)
+                return
+
+            self._update(job_id, status='done', progress=100, result_path=path,
+                         result_name=result_name, finished_at=datetime.utcnow())
+
+    def is_lost(self, job):
+        """Незавершенная задача, которую уже никто не выполнит: процесс-владелец завершился
+        (или pid занят новым процессом этого же сервера, в очереди которого задачи нет)"""
+        if job.status not in ACTIVE_STATUSES or job.owner_pid is None:
+            return False
+        if job.owner_pid == os.getpid():
+            return job.id not in self._active
+        return not process_alive(job.owner_pid)
+
+    def fail_if_lost(self, job):
+        """Помечает потерянную задачу ошибочной; True, если так и было"""
+        if not self.is_lost(job):
+            return False
+        updated = Job.query.filter(Job.id == job.id, Job.status.in_(ACTIVE_STATUSES)).update(
+            {'status': 'failed', 'error': 'Задача прервана: процесс сервера перезапущен',
+             'finished_at': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+        db.session.refresh(job)
+        return bool(updated)
+
+    def cleanup(self):
+        """Удаляет старые задачи с файлами результатов; зависшие задачи помечает как ошибочные"""
+        now = datetime.utcnow()
+        expire_before = now - timedelta(seconds=self.app.config['JOB_RESULT_TTL'])
+        stale_before = now - timedelta(seconds=self.app.config['JOB_STALE_AFTER'])
+
+        expired = Job.query.filter(Job.created_at < expire_before).all()
+        for job in expired:
+            if job.result_path:
+                self._remove(job.result_path)
+            db.session.delete(job)
+
+        # Задачи, потерянные при перезапуске процесса
+        for job in Job.query.filter(Job.status.in_(ACTIVE_STATUSES)).all():
+            self.fail_if_lost(job)
+
+        # Задачи без владельца (созданные до owner_pid) или зависшие в живом процессе
+        Job.query.filter(
+            Job.status.in_(ACTIVE_STATUSES),
+            Job.created_at < stale_before
+        ).update({'status': 'failed', 'error': 'Задача прервана', 'finished_at': now},
+                 synchronize_session=False)
+        db.session.commit()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def job_status(job):
+    """Состояние задачи для JSON ответа"""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,92 @@
+"""
+Keyset-пагинация (постраничный вывод по ключу сортировки вместо OFFSET)
+Страница начинается после/перед последней строкой соседней страницы,
+поэтому стоимость запроса не растет с номером страницы
+"""
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    """Курсор для ссылки: значения ключа сортировки строки в base64"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _is_key_value(value):
+    # bool - подкласс int, но в ключах сортировки его не бывает
+    return value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool))
+
+
+def decode_cursor(cursor, size=None):
+    """Значения ключа из курсора; None, если курсор поврежден.
+
+    size - число колонок сортировки: курсор другой длины или со значениями
+    не скалярных типов считается отсутствующим.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        return None
+    return values if all(_is_key_value(value) for value in values) else None
+
+
+def keyset_query(query, sort_columns, per_page, after=None, before=None, descending=False):
+    """Запрос страницы: условие по курсору, порядок и LIMIT per_page + 1.
+
+    Возвращает (запрос, примененный курсор или None, идем ли назад).
+    """
+    sort_key = tuple_(*sort_columns)
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+
+    if cursor is not None and len(cursor) == len(sort_columns):
+        # Назад по возрастанию - то же, что вперед по убыванию.
+        # Отдельное условие на первую колонку позволяет SQLite начать чтение
+        # индекса с курсора, даже если колонка - выражение (coalesce)
+        after_cursor = sort_key < tuple_(*cursor) if backwards != descending else sort_key > tuple_(*cursor)
+        if cursor[0] is not None:
+            after_cursor = (sort_columns[0] <= cursor[0] if backwards != descending
+                            else sort_columns[0] >= cursor[0]) & after_cursor
+        query = query.filter(after_cursor)
+    else:
+        cursor = None
+
+    if backwards != descending:
+        query = query.order_by(*[column.desc() for column in sort_columns])
+    else:
+        query = query.order_by(*sort_columns)
+
+    # Лишняя строка показывает, есть ли еще страница в этом направлении
+    return query.limit(per_page + 1), cursor, backwards
+
+
+def keyset_page(query, sort_columns, key, per_page, after=None, before=None, descending=False):
+    """Одна страница запроса.
+
+    sort_columns - выражения сортировки; последнее должно быть уникальным (id).
+    key(row) - значения этих выражений для строки результата.
+    after/before - курсоры соседних страниц (значения ключа).
+    Возвращает (строки, курсор следующей страницы, курсор предыдущей страницы).
+    """
+    query, cursor, backwards = keyset_query(query, sort_columns, per_page, after, before, descending)
+    rows = query.all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    first, last = encode_cursor(key(rows[0])), encode_cursor(key(rows[-1]))
+    if backwards:
+        return rows, last, first if has_more else None
+    return rows, last if has_more else None, first if cursor is not None else None
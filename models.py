@@ -36,6 +36,11 @@ class Circle(db.Model):
     
     # Связь со студентами
     students = db.relationship('Student', backref='circle', lazy=True)
+    
+    __table_args__ = (
+        # Кружки преподавателя (дашборд, права доступа)
+        db.Index('ix_circles_teacher_id', 'teacher_id'),
+    )
 
 
 class Student(db.Model):
@@ -64,6 +69,14 @@ class Student(db.Model):
     
     # Связь с посещениями
     attendances = db.relationship('Attendance', backref='student', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # Ученики кружка (поиск по circle_id) и группы, отсортированные по ФИО
+        db.Index('ix_students_circle_group_full_name', 'circle_id', 'group_number', 'full_name'),
+        # Общий список учеников по ФИО и по классу (keyset-пагинация в админке)
+        db.Index('ix_students_full_name', 'full_name'),
+        db.Index('ix_students_grade_full_name', db.func.coalesce(grade, ''), 'full_name'),
+    )
 
 
 class Schedule(db.Model):
@@ -80,6 +93,10 @@ class Schedule(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     circle = db.relationship('Circle', backref='schedules')
+    
+    __table_args__ = (
+        db.Index('ix_schedules_circle_id', 'circle_id'),
+    )
 
 
 class Attendance(db.Model):
@@ -98,6 +115,93 @@ class Attendance(db.Model):
     circle = db.relationship('Circle', backref='attendances')
     marker = db.relationship('User', backref='marked_attendances')
     
-    # Уникальное ограничение: один студент - одна дата
-    __table_args__ = (db.UniqueConstraint('student_id', 'date', name='_student_date_uc'),)
+    __table_args__ = (
+        # Уникальное ограничение: один студент - одна дата
+        db.UniqueConstraint('student_id', 'date', name='_student_date_uc'),
+        # Покрывающий индекс для сетки журнала за месяц: (student_id, date, status)
+        # по кружку читаются из индекса без обращения к таблице
+        db.Index('ix_attendances_circle_date_student_status', 'circle_id', 'date', 'student_id', 'status'),
+    )
+
+
+class AttendanceDaily(db.Model):
+    """Сводка посещаемости по кружку за день (обновляется вместе с отметками)"""
+    __tablename__ = 'attendance_daily'
+    
+    circle_id = db.Column(db.Integer, db.ForeignKey('circles.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    excused = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        # Дашборд читает сводку по диапазону дат
+        db.Index('ix_attendance_daily_date', 'date'),
+    )
+
+
+class Job(db.Model):
+    """Фоновые задачи (тяжелые экспорты)"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # тип задачи, например 'attendance_pdf'
+    params = db.Column(db.Text)  # параметры в JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    error = db.Column(db.Text)
+    result_path = db.Column(db.String(500))
+    result_name = db.Column(db.String(200))  # имя файла для скачивания
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    owner_pid = db.Column(db.Integer)  # процесс сервера, в пуле которого выполняется задача
+    
+    __table_args__ = (
+        # Очистка старых задач
+        db.Index('ix_jobs_status_created_at', 'status', 'created_at'),
+    )
+
+
+# Индексы, убранные из моделей (лишняя стоимость записи), удаляются из старых баз
+OBSOLETE_INDEXES = [
+    'ix_attendances_date_status_circle',  # итоги дашборда читаются из attendance_daily
+    'ix_students_circle_full_name',
+]
+
+
+def create_missing_columns():
+    """Добавляет в существующие таблицы колонки, появившиеся в моделях позже.
+
+    db.create_all() не меняет уже созданные таблицы; новые колонки должны
+    допускать NULL, тогда ALTER TABLE ADD COLUMN не трогает старые строки.
+    """
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {row[1] for row in connection.execute(db.text(f'PRAGMA table_info({table.name})'))}
+            if not existing:
+                continue  # таблицы еще нет, ее создаст create_all
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=connection.dialect)
+                    connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def create_missing_indexes():
+    """Создает индексы, объявленные в моделях, которых еще нет в существующей БД.
+    
+    db.create_all() не добавляет индексы к уже созданным таблицам,
+    поэтому для старых баз индексы досоздаются отдельно.
+    """
+    with db.engine.begin() as connection:
+        # Индексы по выражениям инспектор SQLAlchemy не видит, поэтому
+        # существующие индексы берутся из sqlite_master, а не checkfirst
+        existing = set(connection.execute(db.text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+        for name in OBSOLETE_INDEXES:
+            connection.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
 
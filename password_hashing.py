@@ -0,0 +1,158 @@
+"""
+Хэширование и проверка паролей в ограниченном пуле потоков
+Всплеск входов встает в очередь и не занимает все ядра, нужные отметкам;
+метод и стоимость хэша настраиваются, старые хэши обновляются при входе
+"""
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Сколько последних замеров хранится для распределения задержек
+LATENCY_SAMPLES = 1000
+
+
+class HasherBusy(RuntimeError):
+    """Очередь проверки паролей переполнена или ожидание слишком долгое"""
+
+
+@lru_cache(maxsize=None)
+def canonical_method(method):
+    """Полное имя метода с параметрами, как оно записывается в хэш: 'pbkdf2' -> 'pbkdf2:sha256:600000'"""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0
+
+
+class PasswordHasher:
+    """Пул процесса для хэширования паролей.
+
+    hashlib (scrypt, pbkdf2) отпускает GIL, поэтому потоки пула считают хэши
+    параллельно, а их число ограничивает нагрузку на процессор. Потоки запросов
+    ждут результат в очереди не дольше PASSWORD_HASH_TIMEOUT.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._samples = {'wait': deque(maxlen=LATENCY_SAMPLES), 'hash': deque(maxlen=LATENCY_SAMPLES),
+                         'login': deque(maxlen=LATENCY_SAMPLES)}
+        self._stats = Counter()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['password_hasher'] = self
+
+    @property
+    def method(self):
+        return self.app.config['PASSWORD_HASH_METHOD']
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.app.config['PASSWORD_HASH_WORKERS'], thread_name_prefix='hash'
+                    )
+        return self._executor
+
+    def _run(self, func, *args):
+        """Выполняет func в пуле и ждет результат; HasherBusy при переполнении очереди"""
+        with self._lock:
+            if self._pending >= self.app.config['PASSWORD_HASH_QUEUE']:
+                self._stats['rejected'] += 1
+                raise HasherBusy('password hash queue is full')
+            self._pending += 1
+
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._samples['wait'].append(started - submitted)
+                    self._samples['hash'].append(finished - started)
+
+        future = self._get_executor().submit(task)
+        try:
+            return future.result(timeout=self.app.config['PASSWORD_HASH_TIMEOUT'])
+        except TimeoutError:
+            future.cancel()
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise HasherBusy('password hash queue timeout')
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        """Хэш пароля текущим методом"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """Хэши списка паролей (массовое создание преподавателей, импорт).
+
+        В очереди пула одновременно не больше PASSWORD_HASH_WORKERS задач списка,
+        поэтому проверки паролей при входе встают за ними, а не за всем списком.
+        """
+        passwords = list(passwords)
+        executor = self._get_executor()
+        window = self.app.config['PASSWORD_HASH_WORKERS']
+        hashes = [None] * len(passwords)
+        running = {}
+        for index, password in enumerate(passwords):
+            if len(running) >= window:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    hashes[running.pop(future)] = future.result()
+            running[executor.submit(generate_password_hash, password, self.method)] = index
+        for future, index in running.items():
+            hashes[index] = future.result()
+        with self._lock:
+            self._stats['bulk_hashes'] += len(passwords)
+        return hashes
+
+    def verify(self, password_hash, password):
+        """Проверка пароля"""
+        with self._lock:
+            self._stats['verifications'] += 1
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Хэш создан другим методом или с другой стоимостью"""
+        return password_hash.split('$', 1)[0] != canonical_method(self.method)
+
+    def observe_login(self, elapsed, outcome):
+        """Учитывает длительность обработки входа (outcome: ok, failed, busy)"""
+        with self._lock:
+            self._samples['login'].append(elapsed)
+            self._stats[f'login_{outcome}'] += 1
+
+    def stats(self):
+        """Счетчики и распределение задержек (мс) по последним замерам"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            result = dict(self._stats)
+            result['pending'] = self._pending
+        result['method'] = canonical_method(self.method)
+        result['workers'] = self.app.config['PASSWORD_HASH_WORKERS']
+        for name, values in samples.items():
+            result[f'{name}_ms'] = {
+                'count': len(values),
+                'p50': round(percentile(values, 0.5) * 1000, 1),
+                'p90': round(percentile(values, 0.9) * 1000, 1),
+                'p99': round(percentile(values, 0.99) * 1000, 1),
+                'max': round(max(values, default=0) * 1000, 1),
+            }
+        return result
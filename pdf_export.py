@@ -0,0 +1,302 @@
+"""
+Построение PDF документов (журнал посещаемости, расписание кружков)
+Шрифты регистрируются и стили создаются один раз на процесс
+"""
+import os
+import threading
+from datetime import datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# Шрифты с поддержкой кириллицы: (обычный, жирный)
+FONT_PATHS = [
+    # macOS
+    ('/System/Library/Fonts/Supplemental/Arial Unicode.ttf', None),
+    ('/Library/Fonts/Arial Unicode.ttf', None),
+    # Ubuntu/Linux
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
+]
+
+# Символы отметок в журнале по коду статуса (attendance_matrix.STATUSES)
+CELL_MARKS = ['-', '✓', '✗', 'У']
+
+PRIMARY = colors.HexColor('#0d6efd')
+GRID = colors.HexColor('#dee2e6')
+STRIPE = colors.HexColor('#f8f9fa')
+
+_lock = threading.Lock()
+_fonts = None
+_styles = None
+
+
+def get_fonts():
+    """Регистрирует шрифт с кириллицей (один раз) и возвращает (обычный, жирный)"""
+    global _fonts
+    if _fonts is None:
+        with _lock:
+            if _fonts is None:
+                fonts = ('Helvetica', 'Helvetica-Bold')
+                for regular_path, bold_path in FONT_PATHS:
+                    if not os.path.exists(regular_path):
+                        continue
+                    try:
+                        pdfmetrics.registerFont(TTFont('CyrillicFont', regular_path))
+                        bold_name = 'CyrillicFont'
+                        if bold_path and os.path.exists(bold_path):
+                            pdfmetrics.registerFont(TTFont('CyrillicFont-Bold', bold_path))
+                            bold_name = 'CyrillicFont-Bold'
+                        fonts = ('CyrillicFont', bold_name)
+                        break
+                    except Exception:
+                        continue
+                _fonts = fonts
+    return _fonts
+
+
+def get_styles():
+    """Стили абзацев (создаются один раз)"""
+    global _styles
+    if _styles is None:
+        font_name, font_name_bold = get_fonts()
+        base = getSampleStyleSheet()
+        styles = {
+            'title': ParagraphStyle('CustomTitle', parent=base['Heading1'], fontName=font_name_bold,
+                                    fontSize=18, textColor=PRIMARY, spaceAfter=8, alignment=1),
+            'journal_title': ParagraphStyle('JournalTitle', parent=base['Heading1'], fontName=font_name_bold,
+                                            fontSize=16, textColor=PRIMARY, spaceAfter=6, alignment=1),
+            'heading': ParagraphStyle('CustomHeading', parent=base['Heading2'], fontName=font_name_bold,
+                                      fontSize=14, textColor=PRIMARY, spaceAfter=4),
+            'normal': ParagraphStyle('CustomNormal', parent=base['Normal'], fontName=font_name, fontSize=10),
+            'journal_normal': ParagraphStyle('JournalNormal', parent=base['Normal'], fontName=font_name, fontSize=9),
+            'cell': ParagraphStyle('CellNormal', fontName=font_name, fontSize=7, leading=8, alignment=1),
+            'cell_left': ParagraphStyle('CellLeft', fontName=font_name, fontSize=7, leading=8),
+        }
+        _styles = styles
+    return _styles
+
+
+def _journal_document(out):
+    return SimpleDocTemplate(out, pagesize=landscape(A4),
+                             rightMargin=10*mm, leftMargin=10*mm,
+                             topMargin=15*mm, bottomMargin=15*mm)
+
+
+def render_attendance_journal(out, circle_name, period_title, grid):
+    """Пишет PDF журнала посещаемости кружка за месяц в файловый объект out.
+
+    period_title: подпись периода, например 'Сентябрь 2025'
+    grid: строки журнала из attendance_grid.build_journal_grid
+    """
+    _journal_document(out).build(journal_story(circle_name, period_title, grid))
+
+
+def render_journal_bytes(journal):
+    """Строит журнал в памяти; точка входа для пула процессов.
+
+    journal: (circle_name, period_title, grid)
+    """
+    out = BytesIO()
+    render_attendance_journal(out, *journal)
+    return out.getvalue()
+
+
+def render_journals_merged(out, journals):
+    """Пишет все журналы одним PDF, каждый кружок с новой страницы"""
+    story = []
+    for index, journal in enumerate(journals):
+        if index:
+            story.append(PageBreak())
+        story.extend(journal_story(*journal))
+    _journal_document(out).build(story)
+
+
+def render_journals_merged_bytes(journals):
+    """Объединенный PDF в памяти; точка входа для пула процессов"""
+    out = BytesIO()
+    render_journals_merged(out, journals)
+    return out.getvalue()
+
+
+def journal_story(circle_name, period_title, grid):
+    """Элементы документа журнала одного кружка.
+
+    Ячейки отметок и итогов - обычные строки, Paragraph только для ФИО.
+    """
+    font_name, font_name_bold = get_fonts()
+    styles = get_styles()
+
+    story = [
+        Paragraph("Журнал посещаемости", styles['journal_title']),
+        Paragraph(f"Кружок: {escape(circle_name)}", styles['journal_normal']),
+        Paragraph(period_title, styles['journal_normal']),
+        Spacer(1, 6*mm),
+    ]
+
+    columns = grid['columns']
+    if grid['rows'] and columns:
+        header_row = ['ФИО']
+        for column in columns:
+            header_row.append(f"{column['day']:02d}\n{column['weekday']}")
+        header_row += ['Всего', '%']
+        table_data = [header_row]
+
+        for student in grid['rows']:
+            student_name = student['name']
+            if student['grade']:
+                student_name += f" ({student['grade']})"
+            row = [Paragraph(escape(student_name), styles['cell_left'])]
+            row.extend(CELL_MARKS[code] for code in student['cells'])
+
+            # Итоги посчитаны в матрице посещаемости
+            row.append(f"{student['present']}/{student['total']}")
+            row.append(f"{student['percent']}%" if student['total'] else '-')
+            table_data.append(row)
+
+        col_widths = [60*mm] + [15*mm] * len(columns) + [20*mm, 15*mm]
+        table = Table(table_data, colWidths=col_widths, repeatRows=1)
+        table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('LEADING', (0, 1), (-1, -1), 8),
+            # Заголовок и итоги жирным
+            ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
+            ('FONTNAME', (-2, 1), (-1, -1), font_name_bold),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('LEADING', (0, 0), (-1, 0), 9),
+            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('TOPPADDING', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('GRID', (0, 0), (-1, -1), 0.5, GRID),
+            ('LINEBELOW', (0, 0), (-1, 0), 2, PRIMARY),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, STRIPE]),
+            ('LEFTPADDING', (0, 0), (-1, -1), 4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 1), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),  # ФИО слева
+        ]))
+        story.append(table)
+
+        # Легенда
+        story.append(Spacer(1, 4*mm))
+        story.append(Paragraph("✓ - Присутствовал, ✗ - Отсутствовал, У - Уважительная", styles['journal_normal']))
+    else:
+        story.append(Paragraph("Нет данных для отображения", styles['journal_normal']))
+
+    return story
+
+
+def render_schedule(out, circles_schedules, days_order):
+    """Пишет PDF расписания всех кружков в файловый объект out"""
+    font_name, font_name_bold = get_fonts()
+    styles = get_styles()
+
+    doc = SimpleDocTemplate(out, pagesize=landscape(A4),
+                            rightMargin=15*mm, leftMargin=15*mm,
+                            topMargin=15*mm, bottomMargin=15*mm)
+
+    story = [
+        Paragraph("Расписание кружков", styles['title']),
+        Paragraph(f"Дата экспорта: {datetime.now().strftime('%d.%m.%Y %H:%M')}", styles['normal']),
+        Spacer(1, 8*mm),
+    ]
+
+    for index, circle_data in enumerate(circles_schedules):
+        circle = circle_data['circle']
+        schedule_dict = circle_data['schedule_dict']
+        sorted_times = circle_data['sorted_times']
+
+        # Заголовок кружка
+        circle_title = escape(circle.name)
+        if circle.direction:
+            circle_title += f" ({escape(circle.direction)})"
+        story.append(Paragraph(circle_title, styles['heading']))
+        story.append(Paragraph(f"<b>Преподаватель:</b> {escape(circle_data['teacher'])}", styles['normal']))
+        story.append(Spacer(1, 6*mm))
+
+        if sorted_times:
+            table_data = [['Время'] + list(days_order)]
+
+            for time_slot in sorted_times:
+                row = [time_slot]
+                for day in days_order:
+                    items = schedule_dict.get(day, {}).get(time_slot)
+                    if not items:
+                        row.append('—')
+                        continue
+                    # Ячейка с группами и кабинетами - единственное место с разметкой
+                    cell_parts = []
+                    for item in items:
+                        parts = []
+                        if item['group']:
+                            parts.append(f"<b>Гр. {escape(item['group'])}</b>")
+                        if item['room']:
+                            room_info = f"Каб. {escape(item['room'])}"
+                            if item['floor']:
+                                room_info += f"<br/>({escape(item['floor'])})"
+                            parts.append(room_info)
+                        cell_parts.append("<br/>".join(parts))
+                    row.append(Paragraph("<br/><br/>".join(cell_parts), styles['cell']))
+                table_data.append(row)
+
+            table = Table(table_data, colWidths=[28*mm] + [32*mm] * len(days_order))
+            table.setStyle(TableStyle([
+                ('FONTNAME', (0, 0), (-1, -1), font_name),
+                ('FONTSIZE', (0, 1), (-1, -1), 7),
+                # Заголовок таблицы и колонка времени
+                ('FONTNAME', (0, 0), (-1, 0), font_name_bold),
+                ('FONTNAME', (0, 1), (0, -1), font_name_bold),
+                ('FONTSIZE', (0, 1), (0, -1), 8),
+                ('BACKGROUND', (0, 0), (-1, 0), PRIMARY),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('FONTSIZE', (0, 0), (-1, 0), 9),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('TOPPADDING', (0, 0), (-1, 0), 12),
+                # Данные таблицы
+                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+                ('GRID', (0, 0), (-1, -1), 1, GRID),
+                ('LINEBELOW', (0, 0), (-1, 0), 2, PRIMARY),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, STRIPE]),
+                ('LEFTPADDING', (0, 0), (-1, -1), 8),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+                ('TOPPADDING', (0, 1), (-1, -1), 8),
+                ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+                # Выделение колонки времени
+                ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#e7f3ff')),
+                ('LINEAFTER', (0, 0), (0, -1), 1.5, PRIMARY),
+            ]))
+            story.append(table)
+        else:
+            story.append(Paragraph("Расписание не заполнено", styles['normal']))
+
+        story.append(Spacer(1, 10*mm))
+
+        # Разрыв страницы между кружками (кроме последнего)
+        if index < len(circles_schedules) - 1:
+            story.append(PageBreak())
+
+    doc.build(story)
+
+
+def render_schedule_bytes(circles_schedules, days_order):
+    """PDF расписания в памяти; точка входа для пула процессов"""
+    out = BytesIO()
+    render_schedule(out, circles_schedules, days_order)
+    return out.getvalue()
@@ -0,0 +1,42 @@
+"""
+Скрипт массового создания преподавателей и сброса паролей
+python provision_teachers.py список.xlsx [-o учетные_данные.xlsx] [--no-reset]
+"""
+import argparse
+
+from app import create_app
+from teacher_provisioning import (
+    ProvisioningError, read_roster, provision_teachers, write_credentials_csv, write_credentials_xlsx
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовое создание преподавателей')
+    parser.add_argument('roster', help='CSV или Excel файл с колонками ФИО, Логин, Пароль')
+    parser.add_argument('-o', '--output', default='teachers_credentials.xlsx',
+                        help='файл с учетными данными (.xlsx или .csv)')
+    parser.add_argument('--no-reset', action='store_true',
+                        help='не менять пароли существующим преподавателям')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        with open(args.roster, 'rb') as f:
+            try:
+                credentials = provision_teachers(read_roster(f, args.roster), reset_existing=not args.no_reset)
+            except ProvisioningError as e:
+                raise SystemExit(f'✗ {e}')
+
+    with open(args.output, 'wb') as out:
+        if args.output.lower().endswith('.csv'):
+            write_credentials_csv(credentials, out)
+        else:
+            write_credentials_xlsx(credentials, out)
+
+    created = sum(1 for c in credentials if c['action'] == 'создан')
+    print(f"✓ Создано: {created}, сброшено паролей: {len(credentials) - created}")
+    print(f"✓ Учетные данные сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+"""
+Скрипт пересчета сводной таблицы посещаемости (attendance_daily)
+Нужен после первого развертывания и после прямых изменений таблицы посещений
+"""
+from app import create_app
+from models import db
+from attendance_rollup import rebuild_daily_rollup
+
+app = create_app()
+
+with app.app_context():
+    db.create_all()
+    rows = rebuild_daily_rollup()
+    print(f"✓ Сводка посещаемости пересчитана: {rows} строк (кружок × день)")
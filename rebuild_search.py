@@ -0,0 +1,17 @@
+"""
+Скрипт перестройки поискового индекса учеников (students_fts)
+Нужен после прямых изменений таблицы учеников в обход приложения
+"""
+from app import create_app
+from models import db
+from student_search import create_search_index, rebuild_search_index
+
+app = create_app()
+
+with app.app_context():
+    db.create_all()
+    if not create_search_index():
+        rebuild_search_index()
+    db.session.commit()
+    count = db.session.execute(db.text('SELECT count(*) FROM students_fts')).scalar()
+    print(f"✓ Поисковый индекс учеников перестроен: {count} учеников")
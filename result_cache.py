@@ -0,0 +1,113 @@
+"""
+Кэш результатов вычислений (дашборд администратора, данные вошедших пользователей)
+TTL, явная инвалидация при изменении данных и single-flight пересчет
+"""
+import threading
+import time
+from collections import Counter
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'stale')
+
+    def __init__(self, value, expires_at, stale=False):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale = stale
+
+
+class ResultCache:
+    """Потокобезопасный кэш в памяти процесса.
+
+    Пересчет значения по ключу выполняет только один поток. Пока он идет,
+    остальные потоки получают устаревшее значение, а если его еще нет -
+    ждут окончания пересчета.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self._generation = 0
+        self._stats = Counter()
+
+    def get_or_compute(self, key, compute, ttl):
+        """Возвращает значение по ключу, при необходимости вычисляя его через compute()"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.stale and entry.expires_at > time.monotonic():
+                self._stats['hits'] += 1
+                return entry.value
+
+            event = self._inflight.get(key)
+            if event is not None and entry is not None:
+                # Пересчет уже идет - отдаем устаревшее значение
+                self._stats['stale_hits'] += 1
+                return entry.value
+
+            if event is None:
+                event = self._inflight[key] = threading.Event()
+                generation = self._generation
+                self._stats['misses'] += 1
+                leader = True
+            else:
+                self._stats['waits'] += 1
+                leader = False
+
+        if not leader:
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry.value
+            # Пересчет в ведущем потоке завершился ошибкой - считаем сами
+            return compute()
+
+        try:
+            started = time.perf_counter()
+            value = compute()
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                # Если данные изменились во время пересчета, значение сразу устаревшее
+                stale = generation != self._generation
+                now = time.monotonic()
+                # Заодно выбрасываем давно истекшие значения (например, за прошлые дни)
+                for old_key in [k for k, e in self._entries.items() if e.expires_at + ttl < now]:
+                    del self._entries[old_key]
+                self._entries[key] = _Entry(value, now + ttl, stale)
+                self._stats['recomputes'] += 1
+                self._stats['recompute_ms'] += int(elapsed * 1000)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def invalidate(self):
+        """Помечает все значения устаревшими (они еще отдаются во время пересчета)"""
+        with self._lock:
+            self._generation += 1
+            for entry in self._entries.values():
+                entry.stale = True
+            self._stats['invalidations'] += 1
+
+    def discard(self, key):
+        """Удаляет одно значение; устаревшим оно уже не отдается"""
+        with self._lock:
+            # Пересчет, начатый до удаления, не должен сохранить старые данные как свежие
+            self._generation += 1
+            self._entries.pop(key, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        """Счетчики попаданий/промахов"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        for name in ('hits', 'stale_hits', 'misses', 'waits', 'recomputes', 'invalidations'):
+            stats.setdefault(name, 0)
+        requests_total = stats['hits'] + stats['stale_hits'] + stats['misses'] + stats['waits']
+        stats['hit_rate'] = round(
+            (stats['hits'] + stats['stale_hits']) / requests_total * 100 if requests_total else 0, 1
+        )
+        return stats
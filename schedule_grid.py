@@ -0,0 +1,104 @@
+"""
+Построение сетки расписания (день недели × время) для всех кружков
+Используется страницей расписания и экспортом расписания в PDF
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from models import db, User, Circle, Schedule
+
+# Дни недели на казахском
+DAYS_ORDER = ['Дүйсенбі', 'Сейсенбі', 'Сәрсенбі', 'Бейсенбі', 'Жұма', 'Сенбі']
+
+# Номер дня недели (date.weekday()) по казахскому названию
+DAY_NUMBERS = {day: number for number, day in enumerate(DAYS_ORDER)}
+
+
+def month_bounds(year, month):
+    """Первый и последний день месяца"""
+    first_day = date(year, month, 1)
+    if month == 12:
+        last_day = date(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        last_day = date(year, month + 1, 1) - timedelta(days=1)
+    return first_day, last_day
+
+
+def lesson_dates(first_day, last_day, schedule_days):
+    """Даты в диапазоне, приходящиеся на дни недели с занятиями"""
+    dates = []
+    current_date = first_day
+    while current_date <= last_day:
+        if current_date.weekday() in schedule_days:
+            dates.append(current_date)
+        current_date += timedelta(days=1)
+    return dates
+
+
+def parse_time(time_str):
+    """Парсит время начала из строки типа '9:00-10:20' или '8:30 -10:00'"""
+    if not time_str:
+        return (0, 0)
+    time_part = time_str.split('-')[0].strip()
+    try:
+        parts = time_part.replace(' ', '').split(':')
+        if len(parts) == 2:
+            return (int(parts[0]), int(parts[1]))
+    except ValueError:
+        pass
+    return (0, 0)
+
+
+def build_schedule_grid():
+    """Возвращает список кружков с расписанием, сгруппированным по дням и времени.
+
+    Два запроса независимо от числа кружков: кружки вместе с именем
+    преподавателя и все записи расписания.
+    """
+    circles = db.session.query(
+        Circle.id, Circle.name, Circle.direction, User.full_name.label('teacher_name')
+    ).outerjoin(User, Circle.teacher_id == User.id).order_by(Circle.name).all()
+
+    schedules = db.session.query(
+        Schedule.circle_id, Schedule.day_of_week, Schedule.group_number,
+        Schedule.time_slot, Schedule.room, Schedule.floor
+    ).order_by(Schedule.circle_id, Schedule.id).all()
+
+    schedules_by_circle = defaultdict(list)
+    for schedule in schedules:
+        schedules_by_circle[schedule.circle_id].append(schedule)
+
+    circles_schedules = []
+    for circle in circles:
+        schedules = schedules_by_circle.get(circle.id)
+        if not schedules:
+            continue
+
+        # Группируем по дням и времени
+        schedule_dict = {}
+        for schedule in schedules:
+            day = schedule.day_of_week
+            if not day:
+                continue
+
+            time_slot = schedule.time_slot or ''
+            schedule_dict.setdefault(day, {}).setdefault(time_slot, []).append({
+                'group': schedule.group_number or '',
+                'room': schedule.room or '',
+                'floor': schedule.floor or '',
+                'time': time_slot,
+            })
+
+        # Все временные слоты кружка
+        all_times = set()
+        for day_schedules in schedule_dict.values():
+            all_times.update(day_schedules.keys())
+
+        circles_schedules.append({
+            'circle': circle,
+            'schedule_dict': schedule_dict,
+            'sorted_times': sorted(all_times, key=parse_time),
+            'teacher': circle.teacher_name or 'Не назначен'
+        })
+
+    return circles_schedules
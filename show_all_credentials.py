@@ -1,9 +1,11 @@
 """
 Скрипт показа всех учетных данных пользователей системы
 """
-from app import app
+from app import create_app
 from models import db, User
 
+app = create_app()
+
 with app.app_context():
     # Получаем всех пользователей
     admins = User.query.filter_by(role='admin').order_by(User.username).all()
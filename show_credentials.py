@@ -1,11 +1,11 @@
 """
 Скрипт для отображения логинов и паролей преподавателей по кружкам
 """
-from app import app, db
+from app import create_app, db
 from models import Circle, User
 
 
-def show_credentials():
+def show_credentials(app):
     """Показать таблицу с кружками и учетными данными"""
     
     with app.app_context():
@@ -84,5 +84,5 @@ def show_credentials():
 
 
 if __name__ == '__main__':
-    show_credentials()
+    show_credentials(create_app())
 
@@ -1,9 +1,11 @@
 """
 Скрипт показа учетных данных всех преподавателей
 """
-from app import app
+from app import create_app
 from models import db, User
 
+app = create_app()
+
 with app.app_context():
     teachers = User.query.filter_by(role='teacher').order_by(User.full_name).all()
     
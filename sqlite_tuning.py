@@ -0,0 +1,74 @@
+"""
+Настройка соединений SQLite: PRAGMA на каждое соединение и параметры пула
+Значения по умолчанию рассчитаны на несколько процессов gunicorn с потоками
+"""
+import os
+
+from sqlalchemy import event
+
+# PRAGMA по умолчанию; каждую можно переопределить в app.config (ключ SQLITE_<ИМЯ>)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',       # читатели не блокируют писателя и наоборот
+    'synchronous': 'NORMAL',     # в режиме WAL безопасно, fsync только при checkpoint
+    'busy_timeout': 5000,        # мс ожидания блокировки вместо "database is locked"
+    'cache_size': -20000,        # отрицательное значение - размер в КиБ (~20 МБ)
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_config_from_env():
+    """Настройки SQLite и пула из переменных окружения"""
+    config = {'SQLITE_TUNING': os.environ.get('SQLITE_TUNING', '1') == '1'}
+    for name, default in SQLITE_PRAGMAS.items():
+        value = os.environ.get(f'SQLITE_{name.upper()}')
+        if value is not None:
+            config[f'SQLITE_{name.upper()}'] = type(default)(value)
+    return config
+
+
+def engine_options(pool_size, busy_timeout=SQLITE_PRAGMAS['busy_timeout']):
+    """SQLALCHEMY_ENGINE_OPTIONS для файловой SQLite.
+
+    Соединений в пуле - не меньше, чем потоков, одновременно работающих с БД
+    в одном процессе (потоки сервера + потоки фоновых задач).
+    """
+    return {
+        'pool_size': pool_size,
+        'max_overflow': pool_size,
+        'pool_timeout': 30,
+        # Ожидание блокировки на уровне драйвера (секунды) совпадает с busy_timeout
+        'connect_args': {'timeout': busy_timeout / 1000},
+    }
+
+
+def init_sqlite(app, engine):
+    """Вешает установку PRAGMA на событие connect движка приложения"""
+    if engine.dialect.name != 'sqlite' or not app.config.get('SQLITE_TUNING', True):
+        return
+
+    pragmas = {
+        name: app.config.get(f'SQLITE_{name.upper()}', default)
+        for name, default in SQLITE_PRAGMAS.items()
+    }
+    if engine.url.database in (None, '', ':memory:'):
+        pragmas.pop('journal_mode')  # WAL недоступен для БД в памяти
+        pragmas.pop('mmap_size')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    # Соединения, открытые до регистрации обработчика, пересоздаются
+    engine.dispose()
+
+
+def current_pragmas(connection):
+    """Фактические значения PRAGMA соединения (для проверки настроек)"""
+    return {
+        name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        for name in SQLITE_PRAGMAS
+    }
@@ -0,0 +1,178 @@
+"""
+Полнотекстовый поиск учеников (SQLite FTS5)
+ФИО, ИИН, школа, ФИО и телефон заявителя; казахские буквы и регистр
+сводятся к русским строчным и в индексе, и в запросе
+"""
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from models import db, Student
+
+# Казахские буквы -> близкие русские (плюс ё -> е): "Әлихан" ищется и как "алихан"
+KAZAKH_FOLD = str.maketrans('әғқңөұүһіё', 'агкноуухие')
+
+SEARCH_TABLE = 'students_fts'
+SEARCH_COLUMNS = ('full_name', 'iin', 'school', 'applicant_name', 'phones')
+
+# Таблицы проиндексированы в этих БД (по URL движка); отсутствие не кэшируется,
+# чтобы индекс, созданный другим процессом, сразу начал обновляться
+_ready = set()
+
+
+def fold(value):
+    """Нормализация текста для индекса и запроса: регистр и казахские буквы"""
+    return (value or '').lower().translate(KAZAKH_FOLD)
+
+
+def phone_variants(phone):
+    """Варианты цифр телефона для поиска по началу: полный, без кода страны, без кода оператора.
+
+    '+7 (701) 123-45-67' -> '77011234567 7011234567 1234567'
+    """
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits[0] == '8':
+        digits = '7' + digits[1:]
+    variants = [digits]
+    if len(digits) > 10:
+        variants.append(digits[-10:])
+    if len(digits) > 7:
+        variants.append(digits[-7:])
+    return ' '.join(v for v in variants if v)
+
+
+def document(student):
+    """Значения колонок индекса для ученика (объект или строка запроса)"""
+    return {
+        'rowid': student.id,
+        'full_name': fold(student.full_name),
+        'iin': student.iin or '',
+        'school': fold(student.school),
+        'applicant_name': fold(student.applicant_name),
+        'phones': phone_variants(student.applicant_phone),
+    }
+
+
+def match_query(query):
+    """Строка FTS5 MATCH: все слова запроса как префиксы; None, если искать нечего"""
+    if re.fullmatch(r'[\d\s()+\-]+', query or '') and len(re.sub(r'\D', '', query)) >= 3:
+        # Телефон или ИИН, набранный с пробелами/скобками - одно число
+        tokens = [phone_variants(query).split()[0]]
+    else:
+        tokens = re.findall(r'\w+', fold(query))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _index_exists(connection):
+    url = str(connection.engine.url)
+    if url in _ready:
+        return True
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}
+    ).first() is not None
+    if exists:
+        _ready.add(url)
+    return exists
+
+
+def create_search_index():
+    """Создает таблицу FTS5 и заполняет ее, если ее еще нет. Коммит выполняет вызывающий код."""
+    connection = db.session.connection()
+    if _index_exists(connection):
+        return False
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        f"{', '.join(SEARCH_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    rebuild_search_index()
+    return True
+
+
+def rebuild_search_index():
+    """Полная перестройка индекса по таблице учеников. Возвращает число учеников."""
+    db.session.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+    rows = db.session.query(
+        Student.id, Student.full_name, Student.iin, Student.school,
+        Student.applicant_name, Student.applicant_phone
+    ).yield_per(1000)
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(document(row))
+        if len(batch) == 1000:
+            _insert(db.session.connection(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        _insert(db.session.connection(), batch)
+        count += len(batch)
+    return count
+
+
+def _insert(connection, documents):
+    connection.execute(text(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)}) "
+        f"VALUES (:rowid, {', '.join(':' + c for c in SEARCH_COLUMNS)})"
+    ), documents)
+
+
+def _delete(connection, student_ids):
+    connection.execute(
+        text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid'),
+        [{'rowid': student_id} for student_id in student_ids]
+    )
+
+
+def index_students(students, connection=None):
+    """Обновляет записи индекса для учеников (после массовой вставки/изменения)"""
+    connection = connection or db.session.connection()
+    students = list(students)
+    if not students or not _index_exists(connection):
+        return
+    _delete(connection, [s.id for s in students])
+    _insert(connection, [document(s) for s in students])
+
+
+def unindex_students(student_ids, connection=None):
+    """Удаляет учеников из индекса (после массового удаления запросом)"""
+    connection = connection or db.session.connection()
+    student_ids = list(student_ids)
+    if student_ids and _index_exists(connection):
+        _delete(connection, student_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_after_flush(session, flush_context):
+    """Синхронизация индекса с изменениями учеников через ORM в той же транзакции"""
+    changed = [obj for obj in list(session.new) + list(session.dirty) if isinstance(obj, Student)]
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Student)]
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    if deleted:
+        unindex_students(deleted, connection)
+    if changed:
+        index_students(changed, connection)
+
+
+def search_students(query, limit=10):
+    """Ученики по запросу, лучшие совпадения первыми"""
+    match = match_query(query)
+    if match is None:
+        return []
+    # БД, созданная до появления поиска: индекс строится при первом запросе
+    if create_search_index():
+        db.session.commit()
+    return db.session.execute(text(f"""
+        SELECT s.id, s.full_name, s.iin, s.school, s.group_number, s.circle_id,
+               c.name AS circle_name
+        FROM {SEARCH_TABLE} f
+        JOIN students s ON s.id = f.rowid
+        LEFT JOIN circles c ON c.id = s.circle_id
+        WHERE {SEARCH_TABLE} MATCH :match
+        ORDER BY f.rank
+        LIMIT :limit
+    """), {'match': match, 'limit': limit}).all()
@@ -0,0 +1,245 @@
+"""
+Массовое создание преподавателей и сброс паролей
+Список из CSV/Excel, хэши паролей в пуле приложения, запись одной транзакцией
+"""
+import csv
+import io
+import re
+import secrets
+
+from flask import current_app
+
+from models import db, User
+
+# Заголовки колонок списка (регистр не важен)
+COLUMN_ALIASES = {
+    'full_name': ('фио', 'full_name', 'имя преподавателя', 'преподаватель'),
+    'username': ('логин', 'username', 'login'),
+    'password': ('пароль', 'password'),
+}
+
+# Без похожих символов (0/O, 1/l/I), чтобы пароль легко продиктовать
+PASSWORD_ALPHABET = 'abcdefghjkmnpqrstuvwxyz23456789'
+PASSWORD_LENGTH = 8
+
+CYRILLIC_TO_LATIN = {
+    # Русские буквы
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+
+    # Казахские специфичные буквы
+    'ә': 'a', 'і': 'i', 'ң': 'n', 'ғ': 'g', 'ү': 'u', 'ұ': 'u', 'қ': 'k', 'ө': 'o', 'һ': 'h',
+
+    # Заглавные
+    'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Е': 'E', 'Ё': 'Yo',
+    'Ж': 'Zh', 'З': 'Z', 'И': 'I', 'Й': 'Y', 'К': 'K', 'Л': 'L', 'М': 'M',
+    'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R', 'С': 'S', 'Т': 'T', 'У': 'U',
+    'Ф': 'F', 'Х': 'H', 'Ц': 'Ts', 'Ч': 'Ch', 'Ш': 'Sh', 'Щ': 'Shch',
+    'Ъ': '', 'Ы': 'Y', 'Ь': '', 'Э': 'E', 'Ю': 'Yu', 'Я': 'Ya',
+
+    'Ә': 'A', 'І': 'I', 'Ң': 'N', 'Ғ': 'G', 'Ү': 'U', 'Ұ': 'U', 'Қ': 'K', 'Ө': 'O', 'Һ': 'H',
+}
+
+
+class ProvisioningError(ValueError):
+    """Ошибка в загруженном списке преподавателей"""
+
+
+def transliterate_to_latin(text):
+    """Транслитерация казахского/русского в латиницу"""
+    return ''.join(CYRILLIC_TO_LATIN.get(char, char) for char in text)
+
+
+def username_base(full_name):
+    """Логин из фамилии латиницей: 'Қасымов Ерлан' -> 'kasymov'"""
+    parts = full_name.strip().split()
+    username = re.sub(r'[^a-z]', '', transliterate_to_latin(parts[0]).lower()) if parts else ''
+    return username or 'teacher'
+
+
+def unique_username(base, taken):
+    """Первый свободный логин вида base, base1, base2...; добавляет его в taken"""
+    username = base
+    counter = 1
+    while username in taken:
+        username = f'{base}{counter}'
+        counter += 1
+    taken.add(username)
+    return username
+
+
+def generate_password():
+    return ''.join(secrets.choice(PASSWORD_ALPHABET) for _ in range(PASSWORD_LENGTH))
+
+
+def hash_passwords(passwords):
+    """Хэши паролей методом из настроек в ограниченном пуле приложения (PasswordHasher)"""
+    return current_app.extensions['password_hasher'].hash_many(passwords)
+
+
+def _normalize_header(header):
+    header = str(header or '').strip().lower()
+    for field, aliases in COLUMN_ALIASES.items():
+        if header in aliases:
+            return field
+    return None
+
+
+def _rows_from_table(table):
+    """Строки списка из таблицы (первая строка - заголовки)"""
+    table = iter(table)
+    headers = [_normalize_header(h) for h in next(table, [])]
+    if 'full_name' not in headers:
+        raise ProvisioningError('В файле нет колонки "ФИО"')
+
+    rows = []
+    for values in table:
+        row = {
+            field: str(value).strip()
+            for field, value in zip(headers, values)
+            if field and value is not None and str(value).strip()
+        }
+        if row.get('full_name'):
+            rows.append(row)
+    return rows
+
+
+def _read_xlsx(stream):
+    """Строки первого листа Excel"""
+    # openpyxl загружается только при импорте Excel
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            return list(workbook.active.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+    except Exception as e:  # zipfile, XML-парсер и openpyxl сообщают о поврежденном файле по-разному
+        raise ProvisioningError('Не удалось прочитать файл Excel: файл поврежден или это не .xlsx') from e
+
+
+def _decode_csv(data):
+    """Текст CSV: UTF-8 (с BOM или без), иначе cp1251 - так сохраняет Excel в русской Windows"""
+    for encoding in ('utf-8-sig', 'cp1251'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    raise ProvisioningError('Не удалось определить кодировку CSV: сохраните файл в UTF-8')
+
+
+def read_roster(stream, filename):
+    """Читает список преподавателей из CSV или Excel (.xlsx).
+
+    Колонки: ФИО (обязательно), Логин и Пароль (необязательно).
+    Нечитаемый файл - ProvisioningError с понятным сообщением.
+    """
+    if filename.lower().endswith('.xlsx'):
+        return _rows_from_table(_read_xlsx(stream))
+
+    if filename.lower().endswith('.csv'):
+        text = stream.read()
+        if isinstance(text, bytes):
+            text = _decode_csv(text)
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+        except csv.Error:
+            # Одна колонка или разделитель не угадывается - обычный CSV через запятую
+            dialect = csv.excel
+        return _rows_from_table(csv.reader(io.StringIO(text), dialect))
+
+    raise ProvisioningError('Поддерживаются файлы .csv и .xlsx')
+
+
+def provision_teachers(rows, reset_existing=True):
+    """Создает преподавателей и сбрасывает пароли существующим одной транзакцией.
+
+    Существующий преподаватель ищется по логину, а если логин не указан -
+    по ФИО (если такое ФИО одно). Пароль без значения генерируется.
+    Возвращает список учетных данных: full_name, username, password, action.
+    """
+    users_by_username = {u.username: u for u in User.query.all()}
+    teachers_by_name = {}
+    for user in users_by_username.values():
+        if user.role == 'teacher':
+            teachers_by_name.setdefault(user.full_name.strip().lower(), []).append(user)
+    # Логины, указанные в списке явно, заняты до подбора логинов остальным строкам
+    rows = list(rows)
+    taken = set(users_by_username) | {row['username'] for row in rows if row.get('username')}
+
+    planned = []  # (пользователь или None, ФИО, логин, пароль)
+    seen = set()
+    for number, row in enumerate(rows, start=2):
+        full_name = row['full_name']
+        username = row.get('username')
+        if username:
+            user = users_by_username.get(username)
+            if user is not None and user.role != 'teacher':
+                raise ProvisioningError(f'Строка {number}: логин {username} занят администратором')
+        else:
+            matches = teachers_by_name.get(full_name.lower(), [])
+            user = matches[0] if len(matches) == 1 else None
+            username = user.username if user else unique_username(username_base(full_name), taken)
+
+        if username in seen:
+            raise ProvisioningError(f'Строка {number}: логин {username} встречается повторно')
+        seen.add(username)
+
+        if user is not None and not reset_existing:
+            continue
+        planned.append((user, full_name, username, row.get('password') or generate_password()))
+
+    hashes = hash_passwords([password for *_, password in planned])
+
+    credentials = []
+    for (user, full_name, username, password), password_hash in zip(planned, hashes):
+        if user is None:
+            db.session.add(User(
+                username=username,
+                password=password_hash,
+                plain_password=password,
+                full_name=full_name,
+                role='teacher'
+            ))
+            action = 'создан'
+        else:
+            user.password = password_hash
+            user.plain_password = password
+            action = 'пароль сброшен'
+        credentials.append({
+            'full_name': full_name, 'username': username, 'password': password, 'action': action
+        })
+    db.session.commit()
+    return credentials
+
+
+CREDENTIALS_HEADERS = ('ФИО', 'Логин', 'Пароль', 'Действие')
+
+
+def write_credentials_xlsx(credentials, out):
+    """Лист с учетными данными для раздачи преподавателям"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Учетные данные')
+    sheet.column_dimensions['A'].width = 40
+    sheet.column_dimensions['B'].width = 20
+    sheet.column_dimensions['C'].width = 14
+    sheet.column_dimensions['D'].width = 18
+    sheet.append(CREDENTIALS_HEADERS)
+    for item in credentials:
+        sheet.append([item['full_name'], item['username'], item['password'], item['action']])
+    workbook.save(out)
+
+
+def write_credentials_csv(credentials, out):
+    """То же в CSV (кодировка с BOM, чтобы Excel открыл кириллицу)"""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(CREDENTIALS_HEADERS)
+    for item in credentials:
+        writer.writerow([item['full_name'], item['username'], item['password'], item['action']])
+    out.write(text.getvalue().encode('utf-8-sig'))